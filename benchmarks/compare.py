@@ -0,0 +1,55 @@
+"""Compare two benchmark result files.
+
+    python benchmarks/compare.py before.json after.json [--threshold 10]
+
+Prints time and peak RSS per case and duration, and exits non-zero when a
+case got slower than the threshold (percent).
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import click
+
+
+def _index(path: Path) -> dict[tuple[str, str], dict]:
+    report = json.loads(path.read_text())
+    return {(record["case"], record["duration"]): record for record in report["results"]}
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+@click.command()
+@click.argument("before", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("after", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--threshold", type=float, default=10.0, show_default=True, help="Slowdown (%) reported as a regression.")
+def main(before: Path, after: Path, threshold: float) -> None:
+    """Show per-case changes between two benchmark runs."""
+    old = _index(before)
+    new = _index(after)
+    regressions = 0
+    click.echo(f"{'case':<16} {'dur':>5} {'before':>10} {'after':>10} {'time':>8} {'rss MB':>14}")
+    for key in sorted(set(old) & set(new)):
+        prev, cur = old[key], new[key]
+        change = _change(prev["seconds"], cur["seconds"])
+        rss_prev = prev["peak_rss_mb"].get("self", 0)
+        rss_cur = cur["peak_rss_mb"].get("self", 0)
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        click.echo(
+            f"{key[0]:<16} {key[1]:>5} {prev['seconds']:>9.3f}s {cur['seconds']:>9.3f}s {change:>+7.1f}% "
+            f"{rss_prev:>6.0f}->{rss_cur:<6.0f}{flag}"
+        )
+    for key in sorted(set(old) ^ set(new)):
+        click.echo(f"{key[0]:<16} {key[1]:>5} only in {'before' if key in old else 'after'}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Benchmark clipod over synthetic long-form episodes.
+
+    python benchmarks/run.py --durations 10m,1h,3h -o results.json
+
+Each case runs in a fresh process with an empty cache and work dir, so render
+and loudness caches never hit and peak RSS belongs to that case alone (the
+``children`` figure is the largest ffmpeg it waited for). Results are written
+as JSON; compare two runs with ``benchmarks/compare.py``.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator
+
+import click
+
+import synth
+
+FORMAT_VERSION = 1
+
+
+def _peak_rss_mb() -> dict:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {}
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+class Context:
+    def __init__(self, data_dir: Path, scratch: Path, seconds: int, ffmpeg: str, dynamic_loudnorm: bool) -> None:
+        self.data_dir = data_dir
+        self.scratch = scratch
+        self.seconds = seconds
+        self.ffmpeg = ffmpeg
+        self.dynamic_loudnorm = dynamic_loudnorm
+        self.voice = synth.voice(data_dir, seconds)
+        self.bgm = synth.bgm(data_dir)
+
+    def layout_file(self) -> Path:
+        path = self.scratch / "bgm_layout.json"
+        path.write_text(json.dumps(synth.layout(self.bgm, self.seconds), indent=2))
+        return path
+
+    def selection_file(self) -> Path:
+        # The middle half of the episode.
+        path = self.scratch / "selection.json"
+        path.write_text(json.dumps({"start": self.seconds / 4, "end": self.seconds * 3 / 4}))
+        return path
+
+
+def _case_mix_bgm(engine: str) -> Callable[[Context], Iterator[tuple[str, Callable[[], None]]]]:
+    def case(ctx: Context):
+        from clipod import bgm
+
+        layout = synth.layout(ctx.bgm, ctx.seconds)
+        output = ctx.scratch / "mixed.wav"
+        yield "", lambda: bgm.mix_bgm(ctx.voice, layout, output, ffmpeg=ctx.ffmpeg, engine=engine)
+
+    return case
+
+
+def _case_export(ctx: Context):
+    from clipod.commands.export import export_audio
+
+    layout = ctx.layout_file()
+    output = ctx.scratch / "episode.mp3"
+    yield "", lambda: export_audio(
+        ctx.voice, output, layout=layout, ffmpeg=ctx.ffmpeg, dynamic_loudnorm=ctx.dynamic_loudnorm, quiet=True
+    )
+
+
+def _case_process(jobs: int | None) -> Callable[[Context], Iterator[tuple[str, Callable[[], None]]]]:
+    def case(ctx: Context):
+        from clipod.commands.process import process_audio
+
+        output = ctx.scratch / "processed.wav"
+        yield "", lambda: process_audio(
+            ctx.voice, output, ffmpeg=ctx.ffmpeg, dynamic_loudnorm=ctx.dynamic_loudnorm, quiet=True, jobs=jobs
+        )
+
+    return case
+
+
+def _case_trim(ctx: Context):
+    from clipod.commands.trim import trim_command
+
+    args = [str(ctx.voice), str(ctx.scratch / "trimmed.wav"), "-s", str(ctx.selection_file()), "--ffmpeg", ctx.ffmpeg]
+    yield "", lambda: trim_command.main(args, standalone_mode=False)
+
+
+def _case_mix(ctx: Context):
+    from clipod.commands.mix import mix_command
+
+    take = synth.take(ctx.data_dir, 30)
+    args = [str(ctx.voice), str(ctx.scratch / "full.wav"), "--intro", str(take), "--outro", str(take)]
+    yield "", lambda: mix_command.main(args + ["--ffmpeg", ctx.ffmpeg], standalone_mode=False)
+
+
+def _multipart(fields: dict[str, str], file_path: Path) -> tuple[str, int, Callable[[], Iterator[bytes]]]:
+    boundary = uuid.uuid4().hex
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_path.name}"\r\n'
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def body() -> Iterator[bytes]:
+        yield head
+        with open(file_path, "rb") as handle:
+            while chunk := handle.read(1024 * 1024):
+                yield chunk
+        yield tail
+
+    length = len(head) + file_path.stat().st_size + len(tail)
+    return f"multipart/form-data; boundary={boundary}", length, body
+
+
+class _Client:
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.project = ""
+
+    def request(self, method: str, path: str, body=None, headers: dict | None = None) -> bytes:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=3600)
+        headers = dict(headers or {})
+        if self.project:
+            headers["X-Clipod-Project"] = self.project
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = b""
+            while chunk := response.read(1024 * 1024):
+                # Only keep small bodies; /api/auto streams the whole episode.
+                if len(data) < 64 * 1024:
+                    data += chunk
+            if response.status >= 400:
+                raise RuntimeError(f"{method} {path} -> {response.status}: {data[:200]!r}")
+            return data
+        finally:
+            conn.close()
+
+    def post_json(self, path: str, payload: dict) -> bytes:
+        return self.request("POST", path, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+    def post_file(self, path: str, file_path: Path, fields: dict[str, str] | None = None) -> bytes:
+        content_type, length, body = _multipart(fields or {}, file_path)
+        return self.request("POST", path, body(), {"Content-Type": content_type, "Content-Length": str(length)})
+
+
+def _case_server(ctx: Context):
+    from http.server import ThreadingHTTPServer
+
+    from clipod.web import server as web_server
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), web_server.RequestHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = _Client(httpd.server_address[1])
+        client.project = json.loads(client.post_json("/api/projects", {"name": "bench"}))["id"]
+        take = synth.take(ctx.data_dir)
+        middle = ctx.seconds / 2
+        yield "upload", lambda: client.post_file("/api/upload", ctx.voice)
+        yield "delete", lambda: client.post_json("/api/delete", {"start": middle - 30, "end": middle - 20})
+        yield "punch", lambda: client.post_file(
+            "/api/punch", take, {"start": str(middle + 20), "end": str(middle + 25)}
+        )
+        # The first read after edits renders the edit list, then streams the file.
+        yield "auto", lambda: client.request("GET", "/api/auto")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+CASES: dict[str, Callable[[Context], Iterator[tuple[str, Callable[[], None]]]]] = {
+    "mix_bgm_ffmpeg": _case_mix_bgm("ffmpeg"),
+    "mix_bgm_numpy": _case_mix_bgm("numpy"),
+    "export": _case_export,
+    "process": _case_process(None),
+    "process_parallel": _case_process(os.cpu_count()),
+    "trim": _case_trim,
+    "mix": _case_mix,
+    "server": _case_server,
+}
+
+
+def _run_case(name: str, seconds: int, data_dir: str, ffmpeg: str, dynamic_loudnorm: bool) -> list[dict]:
+    """Run one case in this (fresh) process and return one record per step."""
+    scratch = Path(tempfile.mkdtemp(prefix=f"clipod-bench-{name}-"))
+    # Point caches and the web work dir at the scratch dir before clipod is imported.
+    os.environ["CLIPOD_CACHE_DIR"] = str(scratch / "cache")
+    os.environ["TMPDIR"] = str(scratch)
+    tempfile.tempdir = None
+    try:
+        ctx = Context(Path(data_dir), scratch, seconds, ffmpeg, dynamic_loudnorm)
+        input_mb = ctx.voice.stat().st_size / (1024 * 1024)
+        records = []
+        for step, func in CASES[name](ctx):
+            with open(os.devnull, "w") as quiet, redirect_stdout(quiet):
+                started = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - started
+            records.append(
+                {
+                    "case": f"{name}.{step}" if step else name,
+                    "duration": synth.format_duration(seconds),
+                    "audio_seconds": seconds,
+                    "seconds": round(elapsed, 4),
+                    "realtime_factor": round(seconds / elapsed, 1) if elapsed else None,
+                    "input_mb_per_s": round(input_mb / elapsed, 1) if elapsed else None,
+                    "peak_rss_mb": _peak_rss_mb(),
+                }
+            )
+        return records
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _environment(ffmpeg: str) -> dict:
+    try:
+        from importlib.metadata import version
+
+        clipod_version = version("clipod")
+    except Exception:
+        clipod_version = None
+    try:
+        banner = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True, check=False).stdout
+        ffmpeg_version = banner.splitlines()[0] if banner else None
+    except FileNotFoundError:
+        ffmpeg_version = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "clipod": clipod_version,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ffmpeg": ffmpeg_version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+@click.command()
+@click.option("--durations", "-d", default="10m", show_default=True, help="Comma-separated episode lengths (e.g. 10m,1h,3h).")
+@click.option("--cases", "-c", default=",".join(CASES), show_default=True, help="Comma-separated cases to run.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False, path_type=Path), help="Write results JSON here.")
+@click.option(
+    "--data-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=lambda: Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "clipod-bench",
+    help="Where synthetic episodes are generated and kept.  [default: ~/.cache/clipod-bench]",
+)
+@click.option("--ffmpeg", default="ffmpeg", show_default=True, help="ffmpeg executable name or path.")
+@click.option("--dynamic-loudnorm", is_flag=True, help="Export with single-pass loudnorm.")
+def main(durations: str, cases: str, output: Path | None, data_dir: Path, ffmpeg: str, dynamic_loudnorm: bool) -> None:
+    """Time clipod commands and web routes over synthetic episodes."""
+    seconds_list = [synth.parse_duration(text) for text in durations.split(",") if text.strip()]
+    names = [name.strip() for name in cases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise click.BadParameter(f"Unknown cases: {', '.join(unknown)}", param_hint="--cases")
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for seconds in seconds_list:
+        click.echo(f"Generating {synth.format_duration(seconds)} episode in {data_dir}")
+        synth.voice(data_dir, seconds)
+    synth.bgm(data_dir)
+    synth.take(data_dir)
+    synth.take(data_dir, 30)
+
+    results = []
+    spawn = multiprocessing.get_context("spawn")
+    for seconds in seconds_list:
+        for name in names:
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                records = pool.submit(_run_case, name, seconds, str(data_dir), ffmpeg, dynamic_loudnorm).result()
+            for record in records:
+                click.echo(
+                    f"{record['duration']:>5} {record['case']:<16} {record['seconds']:>9.3f}s "
+                    f"{record['realtime_factor'] or 0:>8.1f}x  rss {record['peak_rss_mb'].get('self', 0):.0f} MB"
+                )
+            results.extend(records)
+
+    report = {"format": FORMAT_VERSION, "environment": _environment(ffmpeg), "results": results}
+    if output:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2) + "\n")
+        click.echo(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
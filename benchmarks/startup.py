@@ -0,0 +1,74 @@
+"""Guard the CLI's import budget.
+
+    python benchmarks/startup.py [--budget-ms 300] [--runs 5]
+
+Each scenario runs ``clipod ...`` in a fresh interpreter and checks that the
+listed modules were not imported (audio backends, numpy and the web server stay
+out of commands until they are used) and that ``clipod --help`` starts within
+the budget. Exits non-zero on any breach.
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+# argv -> modules that must not be imported to run it.
+SCENARIOS: dict[tuple[str, ...], tuple[str, ...]] = {
+    ("--help",): ("sounddevice", "numpy", "clipod.commands.record", "clipod.web.server"),
+    ("trim", "--help"): ("sounddevice", "numpy", "clipod.commands.record", "clipod.web.server"),
+    ("export", "--help"): ("sounddevice", "numpy", "clipod.commands.record", "clipod.web.server"),
+    ("process", "--help"): ("sounddevice", "numpy", "clipod.commands.record", "clipod.web.server"),
+}
+
+_PROBE = """
+import contextlib, io, json, sys
+from clipod.cli import cli
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        cli.main(sys.argv[1:], prog_name="clipod", standalone_mode=False)
+    except SystemExit:
+        pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _imported(argv: tuple[str, ...]) -> set[str]:
+    result = subprocess.run([sys.executable, "-c", _PROBE, *argv], capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def _startup_ms(runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "clipod.cli", "--help"], capture_output=True, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+@click.command()
+@click.option("--budget-ms", type=float, default=300.0, show_default=True, help="Median `clipod --help` wall time allowed.")
+@click.option("--runs", type=click.IntRange(min=1), default=5, show_default=True, help="Timed runs of `clipod --help`.")
+def main(budget_ms: float, runs: int) -> None:
+    """Check which modules each command imports and how long startup takes."""
+    failures = 0
+    for argv, forbidden in SCENARIOS.items():
+        loaded = sorted(_imported(argv) & set(forbidden))
+        status = "ok" if not loaded else f"FAIL imports {', '.join(loaded)}"
+        failures += bool(loaded)
+        click.echo(f"clipod {' '.join(argv):<16} {status}")
+    median = _startup_ms(runs)
+    over = median > budget_ms
+    failures += over
+    click.echo(f"clipod --help          {median:.0f} ms (budget {budget_ms:.0f} ms){'  FAIL' if over else ''}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Deterministic synthetic episodes for the benchmarks.
+
+Voice is a harmonic buzz gated into syllables and pauses; BGM is a slow
+chord with tremolo. Both are generated block by block from a fixed seed, so
+the same duration always yields byte-identical files and multi-hour WAVs never
+sit in memory. Files are cached by name under the data directory.
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+from clipod.wavfile import WavWriter
+
+SAMPLE_RATE = 44100
+BLOCK_SECONDS = 10
+SEED = 20240601
+BGM_SECONDS = 180
+
+
+def parse_duration(text: str) -> int:
+    """``"10m"``, ``"1h"``, ``"90s"`` or plain seconds -> seconds."""
+    text = text.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def format_duration(seconds: int) -> str:
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+def _voice_block(index: int, frames: int) -> np.ndarray:
+    rng = np.random.default_rng([SEED, index])
+    t = (np.arange(frames) + index * BLOCK_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    envelope = np.zeros(frames)
+    pos = 0
+    while pos < frames:
+        talk = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        end = min(frames, pos + talk)
+        envelope[pos:end] = np.hanning(talk)[: end - pos]
+        # Mostly short gaps between syllables, sometimes a sentence pause.
+        gap = rng.uniform(0.4, 1.5) if rng.random() < 0.08 else rng.uniform(0.03, 0.15)
+        pos = end + int(gap * SAMPLE_RATE)
+    f0 = rng.uniform(95.0, 190.0)
+    vibrato = 1.0 + 0.03 * np.sin(2 * math.pi * 4.5 * t)
+    signal = sum(np.sin(2 * math.pi * k * f0 * vibrato * t) / k for k in range(1, 6))
+    signal = 0.25 * signal * envelope + rng.normal(0.0, 0.002, frames)
+    return signal
+
+
+def _bgm_block(index: int, frames: int) -> np.ndarray:
+    t = (np.arange(frames) + index * BLOCK_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    chord = sum(np.sin(2 * math.pi * freq * t) for freq in (220.0, 277.18, 329.63, 440.0))
+    tremolo = 0.6 + 0.4 * np.sin(2 * math.pi * 0.25 * t)
+    return 0.12 * chord * tremolo
+
+
+def _write(path: Path, seconds: int, channels: int, block) -> Path:
+    if path.exists():
+        return path
+    tmp_path = path.with_name(f".{path.name}.partial")
+    total = seconds * SAMPLE_RATE
+    block_frames = BLOCK_SECONDS * SAMPLE_RATE
+    with WavWriter(tmp_path, SAMPLE_RATE, channels) as writer:
+        for index in range(math.ceil(total / block_frames)):
+            frames = min(block_frames, total - index * block_frames)
+            samples = block(index, frames)
+            pcm = np.clip(samples * 32767.0, -32768, 32767).astype("<i2")
+            if channels > 1:
+                pcm = np.repeat(pcm[:, None], channels, axis=1)
+            writer.write(np.ascontiguousarray(pcm))
+    tmp_path.replace(path)
+    return path
+
+
+def voice(data_dir: Path, seconds: int) -> Path:
+    return _write(data_dir / f"voice_{format_duration(seconds)}.wav", seconds, 1, _voice_block)
+
+
+def bgm(data_dir: Path, seconds: int = BGM_SECONDS) -> Path:
+    return _write(data_dir / f"bgm_{format_duration(seconds)}.wav", seconds, 2, _bgm_block)
+
+
+def take(data_dir: Path, seconds: int = 5) -> Path:
+    """A short voice take for punch-in benchmarks."""
+    return _write(data_dir / f"take_{format_duration(seconds)}.wav", seconds, 1, _voice_block)
+
+
+def layout(bgm_path: Path, seconds: int) -> dict:
+    """BGM under the intro, a mid-episode bed and the outro."""
+    bed = min(BGM_SECONDS, max(10, seconds // 10))
+    segments = [
+        {"file": str(bgm_path), "start": 0.0, "end": float(min(30, seconds)), "volume": 0.3},
+        {"file": str(bgm_path), "start": seconds / 2, "end": seconds / 2 + bed, "volume": 0.2},
+        {"file": str(bgm_path), "start": float(max(0, seconds - 30)), "end": float(seconds), "volume": 0.3},
+    ]
+    return {"segments": [seg for seg in segments if seg["end"] > seg["start"]]}
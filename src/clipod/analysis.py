@@ -0,0 +1,210 @@
+"""Silence and voice-activity detection over memory-mapped WAV files.
+
+Frame features (RMS level in dBFS and zero-crossing rate, 20 ms frames) are
+computed in bounded NumPy blocks and cached next to the audio like the peaks
+pyramid; classifying them into speech/silence intervals is cheap, so callers
+can retune thresholds without rescanning the file.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping, Optional
+
+import numpy as np
+
+from clipod import wavfile
+from clipod.sidecar import SidecarCache
+
+FRAME_SECONDS = 0.02
+# Silences shorter than this inside speech are bridged (breaths, plosives).
+MIN_SILENCE_SECONDS = 0.3
+# Speech bursts shorter than this are treated as noise (clicks, bumps).
+MIN_SPEECH_SECONDS = 0.1
+# Automatic threshold: this far above the noise floor, clamped to a sane range.
+FLOOR_MARGIN_DB = 15.0
+THRESHOLD_RANGE_DB = (-60.0, -30.0)
+# Quiet but noisy frames (fricatives like "s"/"f") still count as speech.
+FRICATIVE_MARGIN_DB = 10.0
+FRICATIVE_ZCR = 0.25
+_BLOCK_FRAMES = 8192
+_SILENT_DB = -100.0
+
+
+@dataclass(frozen=True)
+class Features:
+    sample_rate: int
+    frames: int
+    hop: int
+    rms_db: np.ndarray
+    zcr: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+
+@dataclass(frozen=True)
+class Analysis:
+    duration: float
+    frame_seconds: float
+    threshold_db: float
+    speech: tuple[tuple[float, float], ...]
+    silences: tuple[tuple[float, float], ...]
+
+    def speech_bounds(self) -> Optional[tuple[float, float]]:
+        """Start of the first and end of the last speech interval."""
+        if not self.speech:
+            return None
+        return self.speech[0][0], self.speech[-1][1]
+
+    def pauses(self, min_seconds: float) -> list[tuple[float, float]]:
+        """Silences of at least ``min_seconds`` between speech (head/tail excluded)."""
+        bounds = self.speech_bounds()
+        if bounds is None:
+            return []
+        return [
+            (start, end)
+            for start, end in self.silences
+            if end - start >= min_seconds and start > bounds[0] and end < bounds[1]
+        ]
+
+    def to_dict(self, min_pause: Optional[float] = None) -> dict:
+        body = {
+            "duration": self.duration,
+            "frame_seconds": self.frame_seconds,
+            "threshold_db": round(self.threshold_db, 2),
+            "speech": [[round(start, 3), round(end, 3)] for start, end in self.speech],
+            "silences": [[round(start, 3), round(end, 3)] for start, end in self.silences],
+        }
+        if min_pause is not None:
+            body["pauses"] = [[round(start, 3), round(end, 3)] for start, end in self.pauses(min_pause)]
+        return body
+
+
+def compute(audio: Path) -> Features:
+    """Scan ``audio`` once in bounded blocks and return per-frame features."""
+    info = wavfile.read_info(audio)
+    samples = wavfile.memmap(info)
+    hop = max(1, round(info.sample_rate * FRAME_SECONDS))
+    count = (info.frames + hop - 1) // hop
+    rms_db = np.full(count, _SILENT_DB, dtype=np.float32)
+    zcr = np.zeros(count, dtype=np.float32)
+    block_frames = hop * _BLOCK_FRAMES
+    for frame_start in range(0, count, _BLOCK_FRAMES):
+        sample_start = frame_start * hop
+        block = wavfile.to_float(info, samples[sample_start : sample_start + block_frames])
+        mono = block.mean(axis=1) if block.ndim > 1 and block.shape[1] > 1 else block.reshape(len(block))
+        n = len(mono)
+        pad = (-n) % hop
+        if pad:
+            mono = np.concatenate([mono, np.zeros(pad, dtype=mono.dtype)])
+        shaped = mono.reshape(-1, hop)
+        # The last frame of the file is averaged over its real length only.
+        lengths = np.full(len(shaped), hop, dtype=np.float32)
+        lengths[-1] = hop - pad
+        power = np.einsum("ij,ij->i", shaped, shaped) / lengths
+        stop = frame_start + len(shaped)
+        rms_db[frame_start:stop] = 10.0 * np.log10(np.maximum(power, 1e-10))
+        signs = np.signbit(shaped)
+        zcr[frame_start:stop] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / lengths
+    del samples
+    return Features(sample_rate=info.sample_rate, frames=info.frames, hop=hop, rms_db=rms_db, zcr=zcr)
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the ``True`` runs in ``mask``."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(
+    features: Features,
+    threshold_db: Optional[float] = None,
+    min_silence: float = MIN_SILENCE_SECONDS,
+    min_speech: float = MIN_SPEECH_SECONDS,
+) -> tuple[np.ndarray, float]:
+    """Per-frame speech flags and the threshold used.
+
+    Without ``threshold_db`` the threshold sits :data:`FLOOR_MARGIN_DB` above
+    the noise floor (10th percentile of frame levels).
+    """
+    frame_seconds = features.hop / features.sample_rate
+    rms_db = features.rms_db
+    if threshold_db is None:
+        floor = float(np.percentile(rms_db, 10)) if len(rms_db) else _SILENT_DB
+        threshold_db = float(np.clip(floor + FLOOR_MARGIN_DB, *THRESHOLD_RANGE_DB))
+    fricative = (rms_db > threshold_db - FRICATIVE_MARGIN_DB) & (features.zcr > FRICATIVE_ZCR)
+    speech = (rms_db > threshold_db) | fricative
+    starts, ends = _runs(~speech)
+    short = (ends - starts) * frame_seconds < min_silence
+    # Bridge short gaps, but keep leading/trailing silence whatever its length.
+    short &= (starts > 0) & (ends < len(speech))
+    for start, end in zip(starts[short], ends[short]):
+        speech[start:end] = True
+    starts, ends = _runs(speech)
+    for start, end in zip(starts, ends):
+        if (end - start) * frame_seconds < min_speech:
+            speech[start:end] = False
+    return speech, threshold_db
+
+
+def classify(
+    features: Features,
+    threshold_db: Optional[float] = None,
+    min_silence: float = MIN_SILENCE_SECONDS,
+    min_speech: float = MIN_SPEECH_SECONDS,
+) -> Analysis:
+    """Speech/silence intervals from ``features`` (see :func:`speech_mask`)."""
+    speech, threshold_db = speech_mask(features, threshold_db, min_silence, min_speech)
+    frame_seconds = features.hop / features.sample_rate
+    duration = features.duration
+
+    def intervals(mask: np.ndarray) -> tuple[tuple[float, float], ...]:
+        run_starts, run_ends = _runs(mask)
+        return tuple(
+            (float(start * frame_seconds), float(min(duration, end * frame_seconds)))
+            for start, end in zip(run_starts, run_ends)
+        )
+
+    return Analysis(
+        duration=duration,
+        frame_seconds=frame_seconds,
+        threshold_db=threshold_db,
+        speech=intervals(speech),
+        silences=intervals(~speech),
+    )
+
+
+def _encode(features: Features) -> dict[str, np.ndarray]:
+    meta = np.array([features.sample_rate, features.frames, features.hop], dtype=np.int64)
+    return {"meta": meta, "rms_db": features.rms_db, "zcr": features.zcr}
+
+
+def _decode(data: Mapping[str, np.ndarray]) -> Features:
+    meta = data["meta"]
+    return Features(
+        sample_rate=int(meta[0]), frames=int(meta[1]), hop=int(meta[2]), rms_db=data["rms_db"], zcr=data["zcr"]
+    )
+
+
+_CACHE = SidecarCache("vad", 1, compute, _encode, _decode)
+
+
+def cache_path(audio: Path) -> Path:
+    return _CACHE.path(audio)
+
+
+def features(audio: Path) -> Features:
+    """Return the features for ``audio``, rescanning when mtime/size changed."""
+    return _CACHE.get(audio)
+
+
+def analyze(
+    audio: Path,
+    threshold_db: Optional[float] = None,
+    min_silence: float = MIN_SILENCE_SECONDS,
+    min_speech: float = MIN_SPEECH_SECONDS,
+) -> Analysis:
+    """Speech/silence intervals for the WAV file ``audio``."""
+    return classify(features(audio), threshold_db=threshold_db, min_silence=min_silence, min_speech=min_speech)
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import json
-import shutil
-import subprocess
-import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable, Iterable
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from clipod import cache, fsutil, metrics, wavfile
+
+if TYPE_CHECKING:
+    from clipod.ducking import Ducking, Envelope
 
 
 class LayoutError(ValueError):
@@ -87,9 +89,49 @@ def _parse_segments(layout: dict, base_dir: Path) -> list[BgmSegment]:
     return segments
 
 
-def _build_filter(segments: Iterable[BgmSegment]) -> tuple[str, str]:
+def _parse_ducking(layout: dict) -> Ducking | None:
+    """Ducking settings from the layout's optional ``"ducking"`` entry."""
+    if layout.get("ducking") in (None, False):
+        return None
+    from clipod import ducking
+
+    try:
+        return ducking.parse(layout["ducking"])
+    except ducking.DuckingError as exc:
+        raise LayoutError(str(exc)) from exc
+
+
+def _ducking_envelope(main: Path, layout: dict) -> tuple[Envelope, int] | None:
+    """The cached ducking envelope for ``main`` and the mix sample rate, if enabled."""
+    settings = _parse_ducking(layout)
+    if settings is None:
+        return None
+    from clipod import ducking
+
+    info = wavfile.probe(main)
+    if info is None:
+        raise LayoutError("Ducking requires a PCM WAV main file.")
+    return ducking.envelope_for(main, settings), info.sample_rate
+
+
+def _build_filter(
+    segments: Iterable[BgmSegment],
+    post_filter: str | None = None,
+    envelope_input: int | None = None,
+    sample_rate: int | None = None,
+    normalize: bool = True,
+) -> tuple[str, str]:
+    """amix graph for ``segments``; ``envelope_input`` is the ducking envelope's input index.
+
+    ``normalize=False`` sums the inputs at their own levels instead of letting
+    ``amix`` scale them by the number of active inputs.
+    """
+    segments = list(segments)
     filter_parts: list[str] = []
     mix_inputs = ["[0:a]"]
+    if envelope_input is not None:
+        duck_labels = "".join(f"[duck{idx}]" for idx in range(len(segments)))
+        filter_parts.append(f"[{envelope_input}:a]aresample={sample_rate},asplit={len(segments)}{duck_labels}")
     for idx, seg in enumerate(segments):
         duration = seg.duration
         if duration <= 0:
@@ -109,14 +151,164 @@ def _build_filter(segments: Iterable[BgmSegment]) -> tuple[str, str]:
         chain.append(f"volume={seg.volume}")
         chain.append(f"adelay={delay_ms}:all=1")
         label = f"[bgm{idx}]"
-        filter_parts.append(",".join(chain) + label)
+        if envelope_input is None:
+            filter_parts.append(",".join(chain) + label)
+        else:
+            # The envelope spans the voice timeline, which adelay aligns the segment to.
+            filter_parts.append(",".join(chain) + f"[seg{idx}]")
+            filter_parts.append(f"[seg{idx}][duck{idx}]amultiply{label}")
         mix_inputs.append(label)
     filter_parts.append(
-        f"{''.join(mix_inputs)}amix=inputs={len(mix_inputs)}:duration=first:dropout_transition=0[mix]"
+        f"{''.join(mix_inputs)}amix=inputs={len(mix_inputs)}:duration=first:dropout_transition=0"
+        + ("" if normalize else ":normalize=0")
+        + "[mix]"
     )
+    if post_filter:
+        filter_parts.append(f"[mix]{post_filter}[out]")
+        return ";".join(filter_parts), "[out]"
     return ";".join(filter_parts), "[mix]"
 
 
+def _render_graph(
+    main: Path, layout: dict, ffmpeg: str, base_dir: Path | None, post_filter: str | None, normalize: bool = True
+) -> tuple[list[str], str | None, str]:
+    """ffmpeg inputs, the mix graph (``None`` without BGM) and the graph's output label."""
+    if not main.exists():
+        raise LayoutError(f"Main audio not found: {main}")
+    segments = _parse_segments(layout, base_dir or Path.cwd())
+    cmd: list[str] = [ffmpeg, "-y", "-i", str(main)]
+    if not segments:
+        return cmd, None, "[0:a]"
+    for seg in segments:
+        cmd.extend(["-i", str(seg.path)])
+    envelope_input, sample_rate = _envelope_inputs(cmd, main, layout)
+    filter_complex, output_label = _build_filter(segments, post_filter, envelope_input, sample_rate, normalize)
+    return cmd, filter_complex, output_label
+
+
+def build_render_command(
+    main: Path,
+    layout: dict,
+    output: Path,
+    ffmpeg: str = "ffmpeg",
+    base_dir: Path | None = None,
+    post_filter: str | None = None,
+    output_args: Iterable[str] = (),
+    normalize: bool = True,
+) -> list[str]:
+    """Build one ffmpeg command: BGM mix -> ``post_filter`` -> encoder.
+
+    Without BGM segments the main input goes straight through ``post_filter``.
+    ``normalize=False`` keeps the voice at unity gain under the BGM (see
+    :func:`_build_filter`).
+    """
+    cmd, filter_complex, output_label = _render_graph(main, layout, ffmpeg, base_dir, post_filter, normalize)
+    if filter_complex:
+        cmd.extend(["-filter_complex", filter_complex, "-map", output_label])
+    elif post_filter:
+        cmd.extend(["-af", post_filter])
+    cmd.extend(output_args)
+    cmd.append(str(output))
+    return cmd
+
+
+def build_fanout_command(
+    main: Path,
+    layout: dict,
+    outputs: Iterable[tuple[Path, str | None, Iterable[str]]],
+    ffmpeg: str = "ffmpeg",
+    base_dir: Path | None = None,
+    post_filter: str | None = None,
+    normalize: bool = True,
+) -> list[str]:
+    """Like :func:`build_render_command`, but with several ``(output, filter, output_args)``.
+
+    The mix and ``post_filter`` run once; ``asplit`` fans the result out to one
+    branch per output, each through its own filter (``None`` = untouched) and
+    encoder settings.
+    """
+    outputs = list(outputs)
+    cmd, filter_complex, output_label = _render_graph(main, layout, ffmpeg, base_dir, post_filter, normalize)
+    if filter_complex is None:
+        filter_complex = f"[0:a]{post_filter or 'anull'}[out]"
+        output_label = "[out]"
+    split_labels = "".join(f"[part{idx}]" for idx in range(len(outputs)))
+    graph = [filter_complex, f"{output_label}asplit={len(outputs)}{split_labels}"]
+    for idx, (_, branch_filter, _) in enumerate(outputs):
+        graph.append(f"[part{idx}]{branch_filter or 'anull'}[branch{idx}]")
+    cmd.extend(["-filter_complex", ";".join(graph)])
+    for idx, (output, _, output_args) in enumerate(outputs):
+        cmd.extend(["-map", f"[branch{idx}]", *output_args, str(output)])
+    return cmd
+
+
+def build_split_command(
+    main: Path,
+    layout: dict,
+    parts: Iterable[tuple[Path, float, float]],
+    ffmpeg: str = "ffmpeg",
+    base_dir: Path | None = None,
+    post_filter: str | None = None,
+    output_args: Iterable[str] = (),
+    normalize: bool = True,
+) -> list[str]:
+    """:func:`build_fanout_command` cutting the timeline into ``(output, start, end)`` parts."""
+    output_args = list(output_args)
+    return build_fanout_command(
+        main,
+        layout,
+        [
+            (output, f"atrim=start={start}:end={end},asetpts=PTS-STARTPTS", output_args)
+            for output, start, end in parts
+        ],
+        ffmpeg=ffmpeg,
+        base_dir=base_dir,
+        post_filter=post_filter,
+        normalize=normalize,
+    )
+
+
+def _envelope_inputs(cmd: list[str], main: Path, layout: dict) -> tuple[int | None, int | None]:
+    """Append the ducking envelope as the next ffmpeg input; its index and the mix rate."""
+    envelope = _ducking_envelope(main, layout)
+    if envelope is None:
+        return None, None
+    cmd.extend(["-i", str(envelope[0].path)])
+    return cmd.count("-i") - 1, envelope[1]
+
+
+ENGINES = ("ffmpeg", "numpy")
+# Bump when rendering changes so stale cached mixes are not reused.
+RENDER_VERSION = 2
+
+
+def _segments_key(segments: Iterable[BgmSegment], layout: dict | None = None) -> list:
+    keys: list = [
+        [cache.file_digest(seg.path), seg.start, seg.end, seg.offset, seg.volume, seg.fade_in, seg.fade_out]
+        for seg in segments
+    ]
+    settings = _parse_ducking(layout) if layout else None
+    if settings is not None:
+        keys.append(["ducking", *settings.key()])
+    return keys
+
+
+def layout_key(layout: dict, base_dir: Path | None = None) -> list:
+    """Content-addressed description of a layout's segments for cache keys."""
+    return _segments_key(_parse_segments(layout, base_dir or Path.cwd()), layout)
+
+
+def _mix_key(main: Path, segments: list[BgmSegment], output: Path, engine: str, layout: dict) -> str:
+    return cache.key(
+        "bgm", RENDER_VERSION, engine, cache.file_digest(main), _segments_key(segments, layout), output.suffix
+    )
+
+
+def mix_cache_key(main: Path, layout: dict, output: Path, base_dir: Path | None = None, engine: str = "ffmpeg") -> str:
+    """Render-cache key ``mix_bgm`` uses for this main file, layout and engine."""
+    return _mix_key(main, _parse_segments(layout, base_dir or Path.cwd()), output, engine, layout)
+
+
 def mix_bgm(
     main: Path,
     layout: dict,
@@ -124,7 +316,19 @@ def mix_bgm(
     ffmpeg: str = "ffmpeg",
     base_dir: Path | None = None,
     log_command: Callable[[list[str]], None] | None = None,
-) -> None:
+    engine: str = "ffmpeg",
+    render_cache: cache.RenderCache | None = None,
+    runner: Callable[[list[str]], None] | None = None,
+    progress: Callable[[float], None] | None = None,
+) -> bool:
+    """Mix ``layout`` under ``main`` into ``output``.
+
+    ``runner`` replaces ``subprocess.run`` for the ffmpeg engine (e.g. to track
+    progress); ``progress`` receives the completed fraction from the numpy engine.
+    Returns ``True`` when the mix came from ``render_cache``.
+    """
+    if engine not in ENGINES:
+        raise LayoutError(f"Unknown mix engine: {engine}")
     if not main.exists():
         raise LayoutError(f"Main audio not found: {main}")
     base_dir = base_dir or Path.cwd()
@@ -133,24 +337,54 @@ def mix_bgm(
     if not segments:
         if main.resolve() == output.resolve():
             raise LayoutError("Output must differ from input when no BGM segments exist.")
-        shutil.copy2(main, output)
+        fsutil.copy(main, output)
+        return False
+    if render_cache is not None:
+        render_key = _mix_key(main, segments, output, engine, layout)
+
+        def produce(target: Path) -> None:
+            with fsutil.atomic_path(target) as tmp_path:
+                _render_mix(main, segments, tmp_path, ffmpeg, layout, base_dir, log_command, engine, runner, progress)
+
+        return render_cache.render(render_key, output, produce)
+    with fsutil.atomic_path(output) as tmp_path:
+        _render_mix(main, segments, tmp_path, ffmpeg, layout, base_dir, log_command, engine, runner, progress)
+    return False
+
+
+def _render_mix(
+    main: Path,
+    segments: list[BgmSegment],
+    output: Path,
+    ffmpeg: str,
+    layout: dict,
+    base_dir: Path,
+    log_command: Callable[[list[str]], None] | None,
+    engine: str,
+    runner: Callable[[list[str]], None] | None = None,
+    progress: Callable[[float], None] | None = None,
+) -> None:
+    if engine == "numpy":
+        from clipod import mixer
+
+        envelope = _ducking_envelope(main, layout)
+        try:
+            mixer.mix(
+                main, segments, output, ffmpeg=ffmpeg, progress=progress, envelope=envelope[0] if envelope else None
+            )
+        except FileNotFoundError as exc:
+            raise FileNotFoundError("ffmpeg not found. Ensure it is installed and on PATH.") from exc
         return
-    filter_complex, output_label = _build_filter(segments)
-    cmd: list[str] = [ffmpeg, "-y", "-i", str(main)]
-    for seg in segments:
-        cmd.extend(["-i", str(seg.path)])
-    cmd.extend(["-filter_complex", filter_complex, "-map", output_label, str(output)])
-    print(f"MAIN FILE: {main}", file=sys.stderr, flush=True)
-    print(f"OUTPUT FILE: {output}", file=sys.stderr, flush=True)
-    print(f"BGM LAYOUT: {layout}", file=sys.stderr, flush=True)
-    print(f"FULL FFMPEG COMMAND: {' '.join(cmd)}", file=sys.stderr, flush=True)
+    cmd = build_render_command(main, layout, output, ffmpeg=ffmpeg, base_dir=base_dir)
     if log_command:
         log_command(cmd)
+    if runner is not None:
+        try:
+            runner(cmd)
+        except FileNotFoundError as exc:
+            raise FileNotFoundError("ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        return
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(f"RETURN CODE: {result.returncode}", file=sys.stderr, flush=True)
-        print(f"STDERR: {result.stderr}", file=sys.stderr, flush=True)
+        metrics.run(cmd, "mix", check=True, capture_output=True, text=True)
     except FileNotFoundError as exc:
         raise FileNotFoundError("ffmpeg not found. Ensure it is installed and on PATH.") from exc
-    except subprocess.CalledProcessError:
-        raise
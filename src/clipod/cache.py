@@ -0,0 +1,182 @@
+"""Per-user on-disk cache shared by analysis and render stages."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from clipod import fsutil
+
+_DIGEST_CHUNK = 1 << 20
+DEFAULT_RENDER_CACHE_BYTES = 4 * 1024**3
+
+
+def cache_dir() -> Path:
+    """``$CLIPOD_CACHE_DIR``, else ``$XDG_CACHE_HOME/clipod`` (``~/.cache/clipod``)."""
+    override = os.environ.get("CLIPOD_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "clipod"
+
+
+def key(*parts: Any) -> str:
+    """Stable hex digest of JSON-serialisable ``parts`` (paths become strings)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_digests: dict[tuple, str] = {}
+_digests_lock = threading.Lock()
+
+
+def _stat_key(path: Path) -> tuple:
+    stat = path.stat()
+    return (str(path.resolve()), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of the file content, memoised on (inode, size, mtime).
+
+    The memo survives restarts through a small index in the cache directory,
+    so unchanged multi-hour recordings are hashed once.
+    """
+    stamp = _stat_key(path)
+    with _digests_lock:
+        digest = _digests.get(stamp)
+    if digest:
+        return digest
+    index = cache_dir() / "digests" / f"{key(*stamp)}.txt"
+    try:
+        digest = index.read_text().strip()
+    except OSError:
+        digest = ""
+    if len(digest) != 64:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as handle:
+            while True:
+                chunk = handle.read(_DIGEST_CHUNK)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        write_text(index, digest)
+    with _digests_lock:
+        _digests[stamp] = digest
+    return digest
+
+
+def write_text(path: Path, text: str) -> None:
+    """Write ``text`` atomically; cache write failures are not fatal."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_text(text)
+        tmp_path.replace(path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def read_json(path: Path) -> Optional[Any]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: Path, data: Any) -> None:
+    write_text(path, json.dumps(data, sort_keys=True))
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class RenderCache:
+    """Size-bounded LRU directory of rendered artifacts keyed by input hashes.
+
+    Hits are hard-linked into place (copied across filesystems). Targets are
+    always unlinked before a render or a hit, so an ffmpeg ``-y`` truncating its
+    output never rewrites a cached inode.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_RENDER_CACHE_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "RenderCache":
+        """The per-user cache; ``CLIPOD_RENDER_CACHE_MB`` sets its size limit."""
+        limit = os.environ.get("CLIPOD_RENDER_CACHE_MB")
+        try:
+            max_bytes = int(float(limit) * 1024 * 1024) if limit else DEFAULT_RENDER_CACHE_BYTES
+        except ValueError:
+            max_bytes = DEFAULT_RENDER_CACHE_BYTES
+        return cls(cache_dir() / "renders", max_bytes)
+
+    def entry(self, render_key: str, suffix: str = "") -> Path:
+        return self.root / render_key[:2] / f"{render_key}{suffix}"
+
+    def lookup(self, render_key: str, target: Path) -> bool:
+        """Place the cached artifact at ``target``; ``False`` on a miss."""
+        entry = self.entry(render_key, target.suffix)
+        try:
+            os.utime(entry)  # mtime doubles as the LRU timestamp
+        except OSError:
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        try:
+            _link_or_copy(entry, target)
+        except OSError:
+            return False
+        fsutil.fsync_dir(target.parent)
+        return True
+
+    def store(self, render_key: str, source: Path) -> None:
+        entry = self.entry(render_key, source.suffix)
+        tmp_path = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            _link_or_copy(source, tmp_path)
+            tmp_path.replace(entry)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def render(self, render_key: str, target: Path, produce: Callable[[Path], None]) -> bool:
+        """Return ``True`` on a hit; otherwise run ``produce(target)`` and store it."""
+        if self.lookup(render_key, target):
+            return True
+        target.unlink(missing_ok=True)
+        produce(target)
+        self.store(render_key, target)
+        return False
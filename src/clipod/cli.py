@@ -1,27 +1,107 @@
+from __future__ import annotations
+
+import importlib
+from functools import partial
+
 import click
 
+ENTRY_POINT_GROUP = "clipod.commands"
+
+# Built-in commands: name -> ("module:attribute", short help). Modules are only
+# imported when their command runs, so `clipod --help` or `clipod trim` never
+# load audio backends they do not use (record needs PortAudio).
+COMMANDS: dict[str, tuple[str, str]] = {
+    "record": ("clipod.commands.record:record_command", "Record audio from the default microphone into a WAV file."),
+    "process": ("clipod.commands.process:process_command", "Apply denoise, EQ, compression, and loudness normalization."),
+    "web": ("clipod.commands.web:web_command", "Launch the waveform editor web UI."),
+    "trim": ("clipod.commands.trim:trim_command", "Trim audio based on selection.json (or detected silence)."),
+    "mix": ("clipod.commands.mix:mix_command", "Concatenate intro + main + outro."),
+    "bgm": ("clipod.commands.bgm:bgm_command", "Mix BGM segments with a main audio file using a layout JSON."),
+    "export": ("clipod.commands.export:export_command", "Export final audio with optional BGM and loudness normalization."),
+    "batch": ("clipod.commands.batch:batch_command", "Process or export many episodes in parallel."),
+}
+
+
+def _entry_points() -> dict:
+    """Third-party commands registered under the ``clipod.commands`` entry point group."""
+    from importlib.metadata import entry_points
+
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:  # Python < 3.10
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in found}
 
-@click.group()
-def cli() -> None:
-    """Podcast production helper CLI."""
 
+class LazyGroup(click.Group):
+    """Group that resolves built-in and entry-point commands on first use."""
 
-from clipod.commands.record import record_command
-from clipod.commands.process import process_command
-from clipod.commands.web import web_command
-from clipod.commands.trim import trim_command
-from clipod.commands.mix import mix_command
-from clipod.commands.bgm import bgm_command
-from clipod.commands.export import export_command
+    def __init__(self, *args, lazy_commands: dict[str, tuple[str, str]] | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+        self._plugins: dict | None = None
 
+    @property
+    def plugins(self) -> dict:
+        if self._plugins is None:
+            self._plugins = {
+                name: ep
+                for name, ep in _entry_points().items()
+                if name not in self.lazy_commands and name not in self.commands
+            }
+        return self._plugins
 
-cli.add_command(record_command, name="record")
-cli.add_command(process_command, name="process")
-cli.add_command(web_command, name="web")
-cli.add_command(trim_command, name="trim")
-cli.add_command(mix_command, name="mix")
-cli.add_command(bgm_command, name="bgm")
-cli.add_command(export_command, name="export")
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*self.commands, *self.lazy_commands, *self.plugins})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in self.commands:
+            return self.commands[cmd_name]
+        if cmd_name in self.lazy_commands:
+            load = partial(_import_attribute, self.lazy_commands[cmd_name][0])
+        elif cmd_name in self.plugins:
+            load = self.plugins[cmd_name].load
+        else:
+            return None
+        try:
+            command = load()
+        except (ImportError, OSError) as exc:
+            # e.g. `record` on a host without PortAudio: the other commands still work.
+            raise click.ClickException(f"Command '{cmd_name}' is unavailable: {exc}") from exc
+        if not isinstance(command, click.Command):
+            raise click.ClickException(f"Command '{cmd_name}' does not resolve to a click command.")
+        self.commands[cmd_name] = command
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        """List commands from the registry without importing them."""
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                command = self.commands[name]
+                if command.hidden:
+                    continue
+                help_text = command.get_short_help_str(formatter.width - 6 - len(name))
+            elif name in self.lazy_commands:
+                help_text = self.lazy_commands[name][1]
+            else:
+                ep = self.plugins[name]
+                dist = getattr(ep, "dist", None)
+                help_text = f"(plugin from {dist.name})" if dist is not None else f"(plugin: {ep.value})"
+            rows.append((name, help_text))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+
+def _import_attribute(target: str):
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
+def cli() -> None:
+    """Podcast production helper CLI."""
 
 
 @cli.command()
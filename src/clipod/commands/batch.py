@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import click
+
+ACTIONS = ("process", "export")
+DEFAULT_SUFFIXES = {"process": "_processed.wav", "export": ".mp3"}
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    action: str
+    main: Path
+    output: Path
+    layout: Optional[Path] = None
+    sample_rate: int = 44100
+    channels: int = 1
+
+
+@dataclass(frozen=True)
+class JobResult:
+    job: BatchJob
+    seconds: float
+    error: Optional[str] = None
+
+
+def _resolve(base: Path, value: object) -> Path:
+    path = Path(str(value)).expanduser()
+    return path if path.is_absolute() else base / path
+
+
+def load_manifest(path: Path, default_action: str) -> list[BatchJob]:
+    """Read ``[{"main": ..., "output": ..., "layout": ..., "action": ...}, ...]``.
+
+    A ``{"jobs": [...]}`` wrapper is accepted too; relative paths are resolved
+    against the manifest's directory.
+    """
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError) as exc:
+        raise click.ClickException(f"Invalid manifest: {path}") from exc
+    if isinstance(data, dict):
+        data = data.get("jobs")
+    if not isinstance(data, list):
+        raise click.ClickException("Manifest must be a list of jobs or {\"jobs\": [...]}.")
+    base = path.parent
+    jobs = []
+    for idx, entry in enumerate(data, start=1):
+        if not isinstance(entry, dict) or "main" not in entry:
+            raise click.ClickException(f"Manifest job {idx} must be an object with 'main'.")
+        action = entry.get("action", default_action)
+        if action not in ACTIONS:
+            raise click.ClickException(f"Manifest job {idx} has unknown action: {action}")
+        main = _resolve(base, entry["main"])
+        output = entry.get("output")
+        try:
+            jobs.append(
+                BatchJob(
+                    action=action,
+                    main=main,
+                    output=_resolve(base, output) if output else main.with_name(main.stem + DEFAULT_SUFFIXES[action]),
+                    layout=_resolve(base, entry["layout"]) if entry.get("layout") else None,
+                    sample_rate=int(entry.get("sample_rate", 44100)),
+                    channels=int(entry.get("channels", 1)),
+                )
+            )
+        except (TypeError, ValueError) as exc:
+            raise click.ClickException(f"Manifest job {idx} has invalid numeric values.") from exc
+    return jobs
+
+
+def _run_job(job: BatchJob, ffmpeg: str, threads: int, dynamic_loudnorm: bool) -> JobResult:
+    # Imported in the worker: the parent only schedules jobs and never loads the mastering code.
+    from clipod.cache import RenderCache
+    from clipod.commands.export import export_audio
+    from clipod.commands.process import process_audio
+
+    started = time.monotonic()
+    error = None
+    try:
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        if job.action == "process":
+            process_audio(
+                job.main,
+                job.output,
+                sample_rate=job.sample_rate,
+                channels=job.channels,
+                ffmpeg=ffmpeg,
+                dynamic_loudnorm=dynamic_loudnorm,
+                threads=threads,
+                quiet=True,
+            )
+        else:
+            export_audio(
+                job.main,
+                job.output,
+                layout=job.layout,
+                ffmpeg=ffmpeg,
+                dynamic_loudnorm=dynamic_loudnorm,
+                threads=threads,
+                quiet=True,
+                render_cache=RenderCache.default(),
+            )
+    except subprocess.CalledProcessError as exc:
+        tail = (exc.stderr or "").strip().splitlines()[-3:]
+        error = f"ffmpeg exited with {exc.returncode}" + (f": {' | '.join(tail)}" if tail else "")
+    except Exception as exc:  # report every failure in the summary instead of aborting the batch
+        error = f"{type(exc).__name__}: {exc}"
+    return JobResult(job=job, seconds=time.monotonic() - started, error=error)
+
+
+@click.command(name="batch")
+@click.argument("sources", nargs=-1, required=True)
+@click.option(
+    "--manifest",
+    "-m",
+    is_flag=True,
+    help="Treat SOURCES as JSON manifest files instead of audio globs.",
+)
+@click.option(
+    "--action",
+    type=click.Choice(ACTIONS),
+    default="export",
+    show_default=True,
+    help="Stage to run for glob sources (manifest jobs may override it).",
+)
+@click.option(
+    "--layout",
+    "-l",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="BGM layout applied to every glob source when exporting.",
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory for glob outputs (default: next to each source).",
+)
+@click.option("--jobs", "-j", type=click.IntRange(min=1), help="Parallel jobs (default: CPU count).")
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    help="ffmpeg threads per job (default: CPU count / jobs).",
+)
+@click.option("--ffmpeg", default="ffmpeg", show_default=True, help="ffmpeg executable name or path.")
+@click.option(
+    "--dynamic-loudnorm",
+    is_flag=True,
+    help="Use single-pass dynamic loudnorm instead of a cached two-pass linear one.",
+)
+def batch_command(
+    sources: tuple[str, ...],
+    manifest: bool,
+    action: str,
+    layout: Path | None,
+    output_dir: Path | None,
+    jobs: int | None,
+    threads: int | None,
+    ffmpeg: str,
+    dynamic_loudnorm: bool,
+) -> None:
+    """Process or export many episodes in parallel."""
+    batch: list[BatchJob] = []
+    if manifest:
+        for source in sources:
+            batch.extend(load_manifest(Path(source), action))
+    else:
+        for pattern in sources:
+            matches = sorted(glob.glob(os.path.expanduser(pattern), recursive=True)) or [pattern]
+            for match in matches:
+                main = Path(match)
+                if not main.is_file():
+                    raise click.ClickException(f"No audio files match: {pattern}")
+                name = main.stem + DEFAULT_SUFFIXES[action]
+                batch.append(
+                    BatchJob(
+                        action=action,
+                        main=main,
+                        output=(output_dir / name) if output_dir else main.with_name(name),
+                        layout=layout if action == "export" else None,
+                    )
+                )
+    if not batch:
+        raise click.ClickException("No jobs to run.")
+    cpus = os.cpu_count() or 1
+    workers = min(jobs or cpus, len(batch))
+    threads = threads or max(1, cpus // workers)
+    click.echo(f"Running {len(batch)} job(s) on {workers} worker(s), {threads} ffmpeg thread(s) each")
+
+    started = time.monotonic()
+    results: list[JobResult] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, job, ffmpeg, threads, dynamic_loudnorm) for job in batch]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = "ok" if result.error is None else "FAILED"
+            click.echo(f"[{len(results)}/{len(batch)}] {status} {result.job.main} -> {result.job.output} ({result.seconds:.1f}s)")
+            if result.error:
+                click.echo(f"    {result.error}", err=True)
+    wall = time.monotonic() - started
+
+    failures = [result for result in results if result.error]
+    busy = sum(result.seconds for result in results)
+    click.echo(
+        f"Finished {len(results) - len(failures)}/{len(results)} job(s) in {wall:.1f}s wall "
+        f"({busy:.1f}s of job time, {busy / wall if wall else 0:.1f}x parallel speed-up)"
+    )
+    if failures:
+        for result in failures:
+            click.echo(f"  failed: {result.job.main}: {result.error}", err=True)
+        raise click.ClickException(f"{len(failures)} job(s) failed")
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import click
 
-from clipod import bgm
+from clipod import bgm, cache
 
 
 @click.command(name="bgm")
@@ -24,14 +24,34 @@ from clipod import bgm
     help="Output mixed WAV file path.",
 )
 @click.option("--ffmpeg", default="ffmpeg", show_default=True, help="ffmpeg executable name or path.")
-def bgm_command(main: Path, layout: Path, output: Path, ffmpeg: str) -> None:
+@click.option(
+    "--engine",
+    type=click.Choice(bgm.ENGINES),
+    default="ffmpeg",
+    show_default=True,
+    help="Mixing engine: one ffmpeg filter graph, or block-wise NumPy mixing (WAV main only).",
+)
+@click.option("--no-cache", is_flag=True, help="Always re-render instead of reusing a cached mix.")
+@click.option("--duck", is_flag=True, help="Duck BGM under speech (same as \"ducking\": true in the layout).")
+def bgm_command(main: Path, layout: Path, output: Path, ffmpeg: str, engine: str, no_cache: bool, duck: bool) -> None:
     """Mix BGM segments with a main audio file using a layout JSON."""
     try:
         data = bgm.load_layout(layout)
-        bgm.mix_bgm(main=main, layout=data, output=output, ffmpeg=ffmpeg, base_dir=layout.parent)
+        if duck:
+            data.setdefault("ducking", True)
+        hit = bgm.mix_bgm(
+            main=main,
+            layout=data,
+            output=output,
+            ffmpeg=ffmpeg,
+            base_dir=layout.parent,
+            engine=engine,
+            render_cache=None if no_cache else cache.RenderCache.default(),
+        )
     except bgm.LayoutError as exc:
         raise click.ClickException(str(exc)) from exc
     except FileNotFoundError as exc:
         raise click.ClickException(str(exc)) from exc
     except Exception as exc:
         raise click.ClickException(f"Failed to mix BGM: {exc}") from exc
+    click.echo(f"Mixed audio saved to {output}" + (" (cached)" if hit else ""))
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import subprocess
-import tempfile
+from contextlib import ExitStack
+from dataclasses import dataclass
 from pathlib import Path
 
 import click
 
-from clipod import bgm
-from clipod.commands.process import FFMPEG_FILTER
-from clipod.web.server import BGM_LAYOUT_FILE
+from clipod import bgm, cache, edl, fsutil, metrics, selection
+from clipod.commands.process import mastering_filter, thread_args
+from clipod.loudness import LoudnessError
+from clipod.paths import BGM_LAYOUT_FILE, SELECTION_FILE
 
 
 def _resolve_layout(layout: Path | None) -> Path | None:
@@ -19,6 +21,191 @@ def _resolve_layout(layout: Path | None) -> Path | None:
     return None
 
 
+# Encoder settings per distribution format: output suffix, encoder arguments and
+# the option a ``FORMAT:BITRATE`` target overrides. loudnorm resamples to
+# 192 kHz internally, so formats that would keep that rate pin 48 kHz.
+FORMATS: dict[str, tuple[str, list[str], str | None]] = {
+    "mp3": (".mp3", ["-codec:a", "libmp3lame", "-q:a", "2"], "-q:a"),
+    "aac": (".m4a", ["-codec:a", "aac", "-b:a", "192k", "-ar", "48000"], "-b:a"),
+    "opus": (".opus", ["-codec:a", "libopus", "-b:a", "96k"], "-b:a"),
+    "flac": (".flac", ["-codec:a", "flac", "-ar", "48000"], None),
+}
+MP3_ARGS = FORMATS["mp3"][1]
+
+
+@dataclass(frozen=True)
+class Target:
+    output: Path
+    codec_args: tuple[str, ...]
+
+
+def parse_target(spec: str, output: Path) -> Target:
+    """Target from ``FORMAT[:BITRATE][=PATH]``; the path defaults to ``output`` with the format's suffix."""
+    spec, _, path = spec.partition("=")
+    name, _, bitrate = spec.strip().lower().partition(":")
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format {name!r} (choose from {', '.join(FORMATS)}).")
+    suffix, args, rate_option = FORMATS[name]
+    codec_args = list(args)
+    if bitrate:
+        if rate_option is None:
+            raise ValueError(f"Format {name!r} takes no bitrate.")
+        # A bitrate replaces the format's default quality/bitrate option.
+        index = codec_args.index(rate_option)
+        codec_args[index : index + 2] = ["-b:a", bitrate]
+    return Target(Path(path) if path else output.with_suffix(suffix), tuple(codec_args))
+
+
+def export_targets(
+    main: Path,
+    targets: list[Target],
+    layout: Path | None = None,
+    ffmpeg: str = "ffmpeg",
+    dynamic_loudnorm: bool = False,
+    threads: int | None = None,
+    quiet: bool = False,
+    render_cache: cache.RenderCache | None = None,
+    duck: bool = False,
+) -> list[bool]:
+    """Render pending edits, then mix and master ``main`` once and encode every target.
+
+    All targets missing from ``render_cache`` come out of one ffmpeg run that
+    splits the mastered stream per encoder. Returns, per target, whether it
+    came from ``render_cache``.
+    """
+    main = edl.ensure_rendered(main)
+    layout_data = bgm.load_layout(layout) if layout else {"segments": []}
+    if duck:
+        layout_data.setdefault("ducking", True)
+    base_dir = layout.parent if layout else None
+    # Mix, mastering and encoders run in one ffmpeg graph.
+    post_filter = mastering_filter(main, ffmpeg=ffmpeg, dynamic=dynamic_loudnorm)
+    hits = [False] * len(targets)
+    keys: list[str] = []
+    if render_cache is not None:
+        main_digest = cache.file_digest(main)
+        layout_key = bgm.layout_key(layout_data, base_dir)
+        for idx, target in enumerate(targets):
+            keys.append(
+                cache.key(
+                    "export",
+                    bgm.RENDER_VERSION,
+                    main_digest,
+                    layout_key,
+                    post_filter,
+                    list(target.codec_args),
+                    target.output.suffix,
+                )
+            )
+            hits[idx] = render_cache.lookup(keys[idx], target.output)
+    pending = [target for target, hit in zip(targets, hits) if not hit]
+    if not pending:
+        return hits
+    with ExitStack() as stack:
+        outputs = [
+            (stack.enter_context(fsutil.atomic_path(target.output)), [*target.codec_args, *thread_args(threads)])
+            for target in pending
+        ]
+        if len(outputs) == 1:
+            cmd = bgm.build_render_command(
+                main=main,
+                layout=layout_data,
+                output=outputs[0][0],
+                ffmpeg=ffmpeg,
+                base_dir=base_dir,
+                post_filter=post_filter,
+                output_args=outputs[0][1],
+                normalize=False,
+            )
+        else:
+            cmd = bgm.build_fanout_command(
+                main=main,
+                layout=layout_data,
+                outputs=[(tmp_path, None, output_args) for tmp_path, output_args in outputs],
+                ffmpeg=ffmpeg,
+                base_dir=base_dir,
+                post_filter=post_filter,
+                normalize=False,
+            )
+        metrics.run(cmd, "export", check=True, capture_output=quiet, text=quiet)
+    if render_cache is not None:
+        for render_key, target, hit in zip(keys, targets, hits):
+            if not hit:
+                render_cache.store(render_key, target.output)
+    return hits
+
+
+def export_audio(
+    main: Path,
+    output: Path,
+    layout: Path | None = None,
+    ffmpeg: str = "ffmpeg",
+    dynamic_loudnorm: bool = False,
+    threads: int | None = None,
+    quiet: bool = False,
+    render_cache: cache.RenderCache | None = None,
+    duck: bool = False,
+) -> bool:
+    """Export ``main`` as one MP3 (see :func:`export_targets`).
+
+    Returns ``True`` when the result came from ``render_cache``.
+    """
+    return export_targets(
+        main,
+        [Target(output, tuple(MP3_ARGS))],
+        layout=layout,
+        ffmpeg=ffmpeg,
+        dynamic_loudnorm=dynamic_loudnorm,
+        threads=threads,
+        quiet=quiet,
+        render_cache=render_cache,
+        duck=duck,
+    )[0]
+
+
+def export_chapters(
+    main: Path,
+    directory: Path,
+    ranges: list[selection.Range],
+    layout: Path | None = None,
+    ffmpeg: str = "ffmpeg",
+    dynamic_loudnorm: bool = False,
+    threads: int | None = None,
+    quiet: bool = False,
+    duck: bool = False,
+) -> list[Path]:
+    """Mix and master ``main`` once, then encode each range to ``directory``.
+
+    One ffmpeg graph splits the mastered timeline into every chapter, so the
+    decode, mix and loudness pass are shared. Returns the outputs in range order.
+    """
+    main = edl.ensure_rendered(main)
+    layout_data = bgm.load_layout(layout) if layout else {"segments": []}
+    if duck:
+        layout_data.setdefault("ducking", True)
+    base_dir = layout.parent if layout else None
+    post_filter = mastering_filter(main, ffmpeg=ffmpeg, dynamic=dynamic_loudnorm)
+    outputs = [directory / selection.output_name(idx, item, ".mp3") for idx, item in enumerate(ranges, start=1)]
+    directory.mkdir(parents=True, exist_ok=True)
+    with ExitStack() as stack:
+        parts = [
+            (stack.enter_context(fsutil.atomic_path(output)), item.start, item.end)
+            for item, output in zip(ranges, outputs)
+        ]
+        cmd = bgm.build_split_command(
+            main=main,
+            layout=layout_data,
+            parts=parts,
+            ffmpeg=ffmpeg,
+            base_dir=base_dir,
+            post_filter=post_filter,
+            output_args=[*MP3_ARGS, *thread_args(threads)],
+            normalize=False,
+        )
+        metrics.run(cmd, "export", check=True, capture_output=quiet, text=quiet)
+    return outputs
+
+
 @click.command(name="export")
 @click.argument("main", type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.option(
@@ -36,43 +223,94 @@ def _resolve_layout(layout: Path | None) -> Path | None:
     help="Path to bgm_layout.json from the web UI.",
 )
 @click.option("--ffmpeg", default="ffmpeg", show_default=True, help="ffmpeg executable name or path.")
-def export_command(main: Path, output: Path, layout: Path | None, ffmpeg: str) -> None:
-    """Export final audio with optional BGM and loudness normalization."""
+@click.option(
+    "--dynamic-loudnorm",
+    is_flag=True,
+    help="Use single-pass dynamic loudnorm instead of a cached two-pass linear one.",
+)
+@click.option("--no-cache", is_flag=True, help="Always re-render instead of reusing a cached export.")
+@click.option("--duck", is_flag=True, help="Duck BGM under speech (same as \"ducking\": true in the layout).")
+@click.option(
+    "--chapters",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Export every selection range as its own MP3 into this directory, plus manifest.json.",
+)
+@click.option(
+    "--selection",
+    "-s",
+    "selection_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=SELECTION_FILE,
+    show_default=True,
+    help="Selection JSON with the ranges for --chapters.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "formats",
+    multiple=True,
+    help="FORMAT[:BITRATE][=PATH] (mp3, aac, opus, flac); repeat to encode several targets from one mastered stream.",
+)
+def export_command(
+    main: Path,
+    output: Path,
+    layout: Path | None,
+    ffmpeg: str,
+    dynamic_loudnorm: bool,
+    no_cache: bool,
+    duck: bool,
+    chapters: Path | None,
+    selection_path: Path,
+    formats: tuple[str, ...],
+) -> None:
+    """Export final audio with optional BGM and loudness normalization.
+
+    Without --format a single MP3 is written to --output; each --format adds a
+    target next to it (or at its own =PATH).
+    """
+    if formats and chapters is not None:
+        raise click.UsageError("--format and --chapters cannot be combined.")
+    try:
+        targets = [parse_target(spec, output) for spec in formats] or [Target(output, tuple(MP3_ARGS))]
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--format") from exc
+    if len({target.output for target in targets}) < len(targets):
+        raise click.BadParameter("Targets must have distinct output paths; add =PATH.", param_hint="--format")
     layout_path = _resolve_layout(layout)
-    temp_dir = Path(tempfile.mkdtemp(prefix="clipod_export_"))
-    mixed_path = temp_dir / "mixed.wav"
-    source_path = main
+    ranges: list[selection.Range] = []
+    if chapters is not None:
+        try:
+            ranges = selection.load(selection_path)
+        except selection.SelectionError as exc:
+            raise click.ClickException(str(exc)) from exc
     try:
-        if layout_path:
-            data = bgm.load_layout(layout_path)
-            bgm.mix_bgm(main=main, layout=data, output=mixed_path, ffmpeg=ffmpeg, base_dir=layout_path.parent)
-            source_path = mixed_path
-
-        cmd = [
-            ffmpeg,
-            "-y",
-            "-i",
-            str(source_path),
-            "-af",
-            FFMPEG_FILTER,
-            "-codec:a",
-            "libmp3lame",
-            "-q:a",
-            "2",
-            str(output),
-        ]
-        subprocess.run(cmd, check=True)
+        if chapters is not None:
+            outputs = export_chapters(
+                main, chapters, ranges, layout=layout_path, ffmpeg=ffmpeg, dynamic_loudnorm=dynamic_loudnorm, duck=duck
+            )
+        else:
+            hits = export_targets(
+                main,
+                targets,
+                layout=layout_path,
+                ffmpeg=ffmpeg,
+                dynamic_loudnorm=dynamic_loudnorm,
+                render_cache=None if no_cache else cache.RenderCache.default(),
+                duck=duck,
+            )
     except bgm.LayoutError as exc:
         raise click.ClickException(str(exc)) from exc
+    except LoudnessError as exc:
+        raise click.ClickException(f"Loudness measurement failed: {exc}") from exc
+    except edl.EdlError as exc:
+        raise click.ClickException(f"Failed to render edits for {main}: {exc}") from exc
     except FileNotFoundError as exc:
         raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
     except subprocess.CalledProcessError as exc:
         raise click.ClickException(f"ffmpeg export failed with exit code {exc.returncode}") from exc
-    finally:
-        if mixed_path.exists():
-            mixed_path.unlink()
-        try:
-            temp_dir.rmdir()
-        except OSError:
-            pass
-    click.echo(f"Exported audio saved to {output}")
+    if chapters is not None:
+        manifest = selection.write_manifest(chapters, main, list(zip(ranges, outputs)))
+        click.echo(f"Exported {len(outputs)} chapters into {chapters} (manifest: {manifest.name})")
+        return
+    for target, hit in zip(targets, hits):
+        click.echo(f"Exported audio saved to {target.output}" + (" (cached)" if hit else ""))
@@ -6,6 +6,9 @@ from typing import List
 
 import click
 
+from clipod import cache, fsutil, metrics, wavfile
+from clipod.wavfile import WavError
+
 
 def _build_inputs(main: Path, intro: Path | None, outro: Path | None) -> List[str]:
     inputs: List[str] = []
@@ -20,6 +23,51 @@ def _build_inputs(main: Path, intro: Path | None, outro: Path | None) -> List[st
     return inputs
 
 
+def _conformed(path: Path, fmt: wavfile.WavInfo, ffmpeg: str) -> wavfile.WavInfo:
+    """``path`` as a WAV in the sample format of ``fmt``.
+
+    Matching WAV files are used as they are; anything else is converted once
+    with ffmpeg and cached by content, so a stock intro/outro is only decoded
+    the first time.
+    """
+    info = wavfile.probe(path)
+    if info is not None and info.same_format(fmt):
+        return info
+    fmt_key = [fmt.sample_rate, fmt.channels, fmt.sample_width, fmt.format_tag]
+    target = cache.cache_dir() / "conform" / f"{cache.key(cache.file_digest(path), fmt_key)}.wav"
+    cached = wavfile.probe(target) if target.exists() else None
+    if cached is not None:
+        return cached
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = fsutil.temp_path(target)
+    try:
+        cmd = [
+            ffmpeg,
+            "-y",
+            "-i",
+            str(path),
+            "-ar",
+            str(fmt.sample_rate),
+            "-ac",
+            str(fmt.channels),
+            "-c:a",
+            wavfile.ffmpeg_codec(fmt),
+            str(tmp_path),
+        ]
+        metrics.run(cmd, "conform", capture_output=True, text=True)
+        tmp_path.replace(target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return wavfile.read_info(target)
+
+
+def _concat_wav(paths: List[Path], main_info: wavfile.WavInfo, output: Path, ffmpeg: str) -> None:
+    """Join ``paths`` in the main track's sample format by copying PCM bytes."""
+    infos = [_conformed(path, main_info, ffmpeg) for path in paths]
+    with fsutil.atomic_path(output) as tmp_path:
+        wavfile.concat(infos, tmp_path)
+
+
 @click.command(name="mix")
 @click.argument("main", type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
@@ -27,31 +75,48 @@ def _build_inputs(main: Path, intro: Path | None, outro: Path | None) -> List[st
 @click.option("--outro", type=click.Path(exists=True, dir_okay=False, path_type=Path), help="Outro audio file.")
 @click.option("--ffmpeg", default="ffmpeg", show_default=True, help="ffmpeg executable name or path.")
 def mix_command(main: Path, output: Path, intro: Path | None, outro: Path | None, ffmpeg: str) -> None:
-    """Concatenate intro + main + outro using ffmpeg concat filter."""
+    """Concatenate intro + main + outro.
+
+    For a WAV main track and a .wav output the PCM data is joined under one
+    header, converting only inputs in another format; otherwise the ffmpeg
+    concat filter is used.
+    """
     inputs = _build_inputs(main, intro, outro)
+    parts = [p for p in (intro and intro.name, main.name, outro and outro.name) if p]
+    main_info = wavfile.probe(main) if output.suffix.lower() == ".wav" else None
+    if main_info is not None:
+        try:
+            _concat_wav([p for p in (intro, main, outro) if p], main_info, output, ffmpeg)
+        except FileNotFoundError as exc:
+            raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise click.ClickException(f"ffmpeg conversion failed with exit code {exc.returncode}") from exc
+        except (OSError, WavError) as exc:
+            raise click.ClickException(f"Failed to mix into {output}: {exc}") from exc
+        click.echo(f"Mixed {' + '.join(parts)} -> {output}")
+        return
     stream_count = (1 if intro else 0) + 1 + (1 if outro else 0)
 
     # Build concat filter with audio only
     inputs_spec = "".join(f"[{i}:a]" for i in range(stream_count))
     filter_arg = f"{inputs_spec}concat=n={stream_count}:v=0:a=1[outa]"
 
-    cmd = [
-        ffmpeg,
-        "-y",
-        *inputs,
-        "-filter_complex",
-        filter_arg,
-        "-map",
-        "[outa]",
-        str(output),
-    ]
-
     try:
-        subprocess.run(cmd, check=True)
+        with fsutil.atomic_path(output) as tmp_path:
+            cmd = [
+                ffmpeg,
+                "-y",
+                *inputs,
+                "-filter_complex",
+                filter_arg,
+                "-map",
+                "[outa]",
+                str(tmp_path),
+            ]
+            metrics.run(cmd, "concat")
     except FileNotFoundError as exc:
         raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
     except subprocess.CalledProcessError as exc:
         raise click.ClickException(f"ffmpeg mix failed with exit code {exc.returncode}") from exc
 
-    parts = [p for p in (intro and intro.name, main.name, outro and outro.name) if p]
     click.echo(f"Mixed {' + '.join(parts)} -> {output}")
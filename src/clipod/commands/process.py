@@ -5,14 +5,99 @@ from pathlib import Path
 
 import click
 
+from clipod import fsutil, loudness, metrics, wavfile
+from clipod.loudness import LoudnessError
+from clipod.wavfile import WavError
 
-FFMPEG_FILTER = (
+
+MASTERING_FILTER = (
     "afftdn=nf=-25,"
     "highpass=f=80,"
     "equalizer=f=3000:t=h:width_type=q:width=1:g=3,"
-    "acompressor=threshold=-18dB:ratio=3:attack=20:release=200,"
-    "loudnorm=I=-16:LRA=11:TP=-1.5"
+    "acompressor=threshold=-18dB:ratio=3:attack=20:release=200"
 )
+LOUDNORM_FILTER = "loudnorm=I=-16:LRA=11:TP=-1.5"
+FFMPEG_FILTER = f"{MASTERING_FILTER},{LOUDNORM_FILTER}"
+
+
+def mastering_filter(source: Path, ffmpeg: str = "ffmpeg", dynamic: bool = False) -> str:
+    """``FFMPEG_FILTER`` with loudnorm in linear mode from a cached measurement of ``source``."""
+    if dynamic:
+        return FFMPEG_FILTER
+    return loudness.normalized_filter(source, MASTERING_FILTER, LOUDNORM_FILTER, ffmpeg=ffmpeg)
+
+
+def thread_args(threads: int | None) -> list[str]:
+    """ffmpeg options capping codec and filter-graph threads (``None`` = ffmpeg default)."""
+    if not threads:
+        return []
+    return ["-threads", str(threads), "-filter_threads", str(threads)]
+
+
+def _encode(
+    source: Path,
+    output: Path,
+    audio_filter: str,
+    sample_rate: int,
+    channels: int,
+    ffmpeg: str,
+    threads: int | None,
+    quiet: bool,
+) -> None:
+    with fsutil.atomic_path(output) as tmp_path:
+        cmd = [
+            ffmpeg,
+            "-y",
+            "-i",
+            str(source),
+            "-af",
+            audio_filter,
+            "-ar",
+            str(sample_rate),
+            "-ac",
+            str(channels),
+            *thread_args(threads),
+            str(tmp_path),
+        ]
+        metrics.run(cmd, "process", check=True, capture_output=quiet, text=quiet)
+
+
+def process_audio(
+    input: Path,
+    output: Path,
+    sample_rate: int = 44100,
+    channels: int = 1,
+    ffmpeg: str = "ffmpeg",
+    dynamic_loudnorm: bool = False,
+    threads: int | None = None,
+    quiet: bool = False,
+    jobs: int | None = None,
+) -> None:
+    """Run the mastering chain over ``input``; ffmpeg errors propagate.
+
+    With ``jobs`` > 1 a long WAV input is mastered in parallel chunks (see
+    :mod:`clipod.chunked`) and loudnorm then runs once over the stitched result.
+    """
+    if jobs and jobs > 1 and wavfile.probe(input) is not None:
+        from clipod import chunked
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        staged = fsutil.temp_path(output).with_suffix(".mastered.wav")
+        try:
+            if chunked.render(input, staged, MASTERING_FILTER, jobs, ffmpeg=ffmpeg):
+                if dynamic_loudnorm:
+                    final_filter = LOUDNORM_FILTER
+                else:
+                    measurement = loudness.cached_measurement(
+                        input, MASTERING_FILTER, LOUDNORM_FILTER, ffmpeg=ffmpeg, processed=staged
+                    )
+                    final_filter = loudness.linear_filter(LOUDNORM_FILTER, measurement)
+                _encode(staged, output, final_filter, sample_rate, channels, ffmpeg, threads, quiet)
+                return
+        finally:
+            staged.unlink(missing_ok=True)
+    audio_filter = mastering_filter(input, ffmpeg=ffmpeg, dynamic=dynamic_loudnorm)
+    _encode(input, output, audio_filter, sample_rate, channels, ffmpeg, threads, quiet)
 
 
 @click.command(name="process")
@@ -40,28 +125,42 @@ FFMPEG_FILTER = (
     show_default=True,
     help="ffmpeg executable name or path.",
 )
-def process_command(input: Path, output: Path, sample_rate: int, channels: int, ffmpeg: str) -> None:
+@click.option(
+    "--dynamic-loudnorm",
+    is_flag=True,
+    help="Use single-pass dynamic loudnorm instead of a cached two-pass linear one.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Master a long WAV input in this many parallel chunks, split at silences.",
+)
+def process_command(
+    input: Path, output: Path, sample_rate: int, channels: int, ffmpeg: str, dynamic_loudnorm: bool, jobs: int
+) -> None:
     """Apply denoise, EQ, compression, and loudness normalization via ffmpeg."""
     if channels not in (1, 2):
         raise click.BadParameter("Channels must be 1 (mono) or 2 (stereo).")
 
-    cmd = [
-        ffmpeg,
-        "-y",
-        "-i",
-        str(input),
-        "-af",
-        FFMPEG_FILTER,
-        "-ar",
-        str(sample_rate),
-        "-ac",
-        str(channels),
-        str(output),
-    ]
     try:
-        subprocess.run(cmd, check=True)
+        process_audio(
+            input,
+            output,
+            sample_rate=sample_rate,
+            channels=channels,
+            ffmpeg=ffmpeg,
+            dynamic_loudnorm=dynamic_loudnorm,
+            jobs=jobs,
+        )
     except FileNotFoundError as exc:
         raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
+    except LoudnessError as exc:
+        raise click.ClickException(f"Loudness measurement failed: {exc}") from exc
+    except (OSError, WavError) as exc:
+        raise click.ClickException(f"Failed to process {input}: {exc}") from exc
     except subprocess.CalledProcessError as exc:
         raise click.ClickException(f"ffmpeg processing failed with exit code {exc.returncode}") from exc
     click.echo(f"Processed audio saved to {output}")
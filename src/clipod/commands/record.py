@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import sys
+import threading
 import time
 import wave
 from pathlib import Path
@@ -10,10 +11,15 @@ import click
 import numpy as np
 import sounddevice as sd
 
+from clipod import fsutil
+from clipod.wavfile import WavWriter
+
+RING_SECONDS = 10.0
+HEADER_INTERVAL = 2.0
+
 
 def _write_wav(path: Path, data: np.ndarray, sample_rate: int, channels: int) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with wave.open(str(path), "wb") as wf:
+    with fsutil.atomic_path(path) as tmp_path, wave.open(str(tmp_path), "wb") as wf:
         wf.setnchannels(channels)
         wf.setsampwidth(2)  # 16-bit PCM
         wf.setframerate(sample_rate)
@@ -69,13 +75,128 @@ def record_audio(
     click.echo(f"Saved: {output}")
 
 
+class _RingBuffer:
+    """Single-producer/single-consumer frame ring for the audio callback.
+
+    The callback only advances ``_write`` and the writer thread only advances
+    ``_read``, so neither side takes a lock. Frames that do not fit are dropped
+    and counted instead of blocking the audio thread.
+    """
+
+    def __init__(self, frames: int, channels: int, dtype: str = "int16") -> None:
+        self._data = np.zeros((frames, channels), dtype=dtype)
+        self._capacity = frames
+        self._write = 0
+        self._read = 0
+        self.dropped = 0
+
+    def push(self, block: np.ndarray) -> None:
+        count = len(block)
+        free = self._capacity - (self._write - self._read)
+        if count > free:
+            self.dropped += count - free
+            count = free
+        start = self._write % self._capacity
+        first = min(count, self._capacity - start)
+        self._data[start : start + first] = block[:first]
+        self._data[: count - first] = block[first:count]
+        self._write += count
+
+    def pop(self) -> np.ndarray | None:
+        available = self._write - self._read
+        if available <= 0:
+            return None
+        start = self._read % self._capacity
+        first = min(available, self._capacity - start)
+        if first == available:
+            block = self._data[start : start + first].copy()
+        else:
+            block = np.concatenate((self._data[start:], self._data[: available - first]))
+        self._read += available
+        return block
+
+
+def _format_elapsed(seconds: float) -> str:
+    whole = int(seconds)
+    return f"{whole // 3600:02d}:{whole % 3600 // 60:02d}:{whole % 60:02d}"
+
+
+def record_stream(
+    output: Path,
+    sample_rate: int,
+    channels: int,
+    duration: float | None = None,
+) -> None:
+    """Record with constant memory until Ctrl-C (or ``duration`` seconds)."""
+    if duration is not None and duration <= 0:
+        raise click.BadParameter("Duration must be positive.")
+    if channels not in (1, 2):
+        raise click.BadParameter("Channels must be 1 (mono) or 2 (stereo).")
+
+    ring = _RingBuffer(int(RING_SECONDS * sample_rate), channels)
+    overflows = 0
+    max_frames = int(duration * sample_rate) if duration is not None else None
+    data_ready = threading.Event()
+    stopping = threading.Event()
+    writer = WavWriter(output, sample_rate, channels)
+
+    def callback(indata, frames, time_info, status) -> None:
+        nonlocal overflows
+        if status.input_overflow:
+            overflows += 1
+        ring.push(indata)
+        data_ready.set()
+
+    def drain() -> None:
+        last_header = time.monotonic()
+        while True:
+            data_ready.wait(0.5)
+            data_ready.clear()
+            block = ring.pop()
+            if block is not None:
+                if max_frames is not None:
+                    block = block[: max(0, max_frames - writer.frames)]
+                writer.write(block)
+            now = time.monotonic()
+            if now - last_header >= HEADER_INTERVAL:
+                # Keep the file playable if the process dies mid-session.
+                writer.update_header(sync=True)
+                last_header = now
+            if block is None and stopping.is_set():
+                break
+
+    stop_hint = "Ctrl-C to stop" if duration is None else f"{duration:.2f}s, Ctrl-C to stop early"
+    click.echo(f"Recording at {sample_rate} Hz, channels={channels} -> {output} ({stop_hint})")
+    thread = threading.Thread(target=drain, name="clipod-record-writer", daemon=True)
+    thread.start()
+    started = time.monotonic()
+    try:
+        with sd.InputStream(samplerate=sample_rate, channels=channels, dtype="int16", callback=callback):
+            try:
+                while max_frames is None or writer.frames < max_frames:
+                    click.echo(f"\rRecording... {_format_elapsed(time.monotonic() - started)} ", nl=False)
+                    time.sleep(0.25)
+            except KeyboardInterrupt:
+                pass
+    except Exception as exc:  # sounddevice raises various backend errors
+        raise click.ClickException(f"Recording failed: {exc}") from exc
+    finally:
+        stopping.set()
+        data_ready.set()
+        thread.join()
+        writer.close()
+    click.echo(f"\rRecording... {_format_elapsed(writer.frames / sample_rate)} ")
+    click.echo(f"Saved: {output}")
+    click.echo(f"Input overflows: {overflows}, dropped frames: {ring.dropped}")
+
+
 @click.command()
 @click.option(
     "--duration",
     "-d",
     type=float,
-    required=True,
-    help="Recording length in seconds.",
+    default=None,
+    help="Recording length in seconds (omit to record until Ctrl-C).",
 )
 @click.option(
     "--sample-rate",
@@ -101,10 +222,24 @@ def record_audio(
     show_default=True,
     help="Output WAV file path.",
 )
-def record_command(duration: float, sample_rate: int, channels: int, output: Path) -> None:
+@click.option(
+    "--stream/--no-stream",
+    default=None,
+    help="Stream to disk through a ring buffer (default when --duration is omitted).",
+)
+def record_command(
+    duration: float | None, sample_rate: int, channels: int, output: Path, stream: bool | None
+) -> None:
     """Record audio from the default microphone into a WAV file."""
+    if stream is None:
+        stream = duration is None
+    if not stream and duration is None:
+        raise click.BadParameter("--no-stream requires --duration.")
     try:
-        record_audio(output=output, duration=duration, sample_rate=sample_rate, channels=channels)
+        if stream:
+            record_stream(output=output, sample_rate=sample_rate, channels=channels, duration=duration)
+        else:
+            record_audio(output=output, duration=duration, sample_rate=sample_rate, channels=channels)
     except click.ClickException:
         raise
     except Exception as exc:
@@ -1,38 +1,90 @@
 from __future__ import annotations
 
-import json
+import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 
 import click
 
-from clipod.web.server import SELECTION_FILE
+from clipod import fsutil, metrics, selection, wavfile
+from clipod.paths import SELECTION_FILE
+from clipod.wavfile import WavError
 
 
-def _load_selection(selection_path: Path) -> tuple[float, float]:
-    if not selection_path.exists():
-        raise click.ClickException(f"Selection file not found: {selection_path}")
+def _load_ranges(selection_path: Path) -> list[selection.Range]:
     try:
-        data = json.loads(selection_path.read_text())
-        start = float(data["start"])
-        end = float(data["end"])
-    except Exception as exc:
-        raise click.ClickException(f"Invalid selection file: {selection_path}") from exc
-    if start < 0 or end <= start:
-        raise click.ClickException(f"Invalid trim range: start={start}, end={end}")
-    return start, end
+        return selection.load(selection_path)
+    except selection.SelectionError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+
+def _auto_selection(input: Path, pad: float, threshold: float | None) -> tuple[float, float]:
+    """Span from the first to the last detected speech, padded by ``pad`` seconds."""
+    from clipod import analysis
+
+    try:
+        result = analysis.analyze(input, threshold_db=threshold)
+    except (WavError, OSError) as exc:
+        raise click.ClickException(f"--auto needs a WAV input: {exc}") from exc
+    bounds = result.speech_bounds()
+    if bounds is None:
+        raise click.ClickException(f"No speech detected in {input}")
+    return max(0.0, bounds[0] - pad), min(result.duration, bounds[1] + pad)
+
+
+def _frame_range(info: wavfile.WavInfo, start: float, end: float) -> tuple[int, int]:
+    first = int(round(start * info.sample_rate))
+    last = min(info.frames, int(round(end * info.sample_rate)))
+    if last <= first:
+        raise click.ClickException(f"Trim range is outside the audio: start={start}, end={end}")
+    return first, last - first
+
+
+def _extract(info: wavfile.WavInfo, output: Path, start: float, end: float) -> None:
+    first, frames = _frame_range(info, start, end)
+    with fsutil.atomic_path(output) as tmp_path:
+        wavfile.extract(info, tmp_path, first, frames)
+
+
+def _trim_all(input: Path, directory: Path, ranges: list[selection.Range], ffmpeg: str) -> list[Path]:
+    """Write every range to ``directory``; returns the outputs in range order."""
+    info = wavfile.probe(input)
+    suffix = ".wav" if info is not None else input.suffix
+    outputs = [directory / selection.output_name(idx, item, suffix) for idx, item in enumerate(ranges, start=1)]
+    directory.mkdir(parents=True, exist_ok=True)
+    if info is not None:
+        # In-kernel range copies; the pool overlaps their I/O.
+        workers = min(len(ranges), os.cpu_count() or 1, 8)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_extract, info, output, item.start, item.end) for item, output in zip(ranges, outputs)
+            ]
+            for future in futures:
+                future.result()
+        return outputs
+    # One ffmpeg process demuxes the input once and stream-copies every range.
+    with ExitStack() as stack:
+        cmd = [ffmpeg, "-y", "-i", str(input)]
+        for item, output in zip(ranges, outputs):
+            tmp_path = stack.enter_context(fsutil.atomic_path(output))
+            cmd.extend(["-map", "0:a", "-ss", str(item.start), "-to", str(item.end), "-c", "copy", str(tmp_path)])
+        metrics.run(cmd, "trim")
+    return outputs
 
 
 @click.command(name="trim")
 @click.argument("input", type=click.Path(exists=True, dir_okay=False, path_type=Path))
-@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.argument("output", type=click.Path(path_type=Path))
 @click.option(
     "--selection",
     "-s",
+    "selection_path",
     type=click.Path(dir_okay=False, path_type=Path),
     default=SELECTION_FILE,
     show_default=True,
-    help="Path to selection JSON with start/end seconds.",
+    help="Path to selection JSON with start/end seconds (or named ranges).",
 )
 @click.option(
     "--ffmpeg",
@@ -40,25 +92,75 @@ def _load_selection(selection_path: Path) -> tuple[float, float]:
     show_default=True,
     help="ffmpeg executable name or path.",
 )
-def trim_command(input: Path, output: Path, selection: Path, ffmpeg: str) -> None:
-    """Trim audio based on start/end seconds stored in selection.json."""
-    start, end = _load_selection(selection)
+@click.option("--auto", "auto", is_flag=True, help="Cut head/tail silence detected in the audio instead of using a selection.")
+@click.option("--pad", type=float, default=0.25, show_default=True, help="Silence (seconds) kept around speech with --auto.")
+@click.option("--threshold", type=float, help="Speech level in dBFS for --auto (default: from the noise floor).")
+@click.option(
+    "--all",
+    "all_ranges",
+    is_flag=True,
+    help="Write every range in the selection to the OUTPUT directory, plus manifest.json.",
+)
+def trim_command(
+    input: Path,
+    output: Path,
+    selection_path: Path,
+    ffmpeg: str,
+    auto: bool,
+    pad: float,
+    threshold: float | None,
+    all_ranges: bool,
+) -> None:
+    """Trim audio based on start/end seconds stored in selection.json (or detected silence).
+
+    Without --all only the first range of a multi-range selection is used.
+    """
+    if all_ranges:
+        if auto:
+            raise click.UsageError("--all and --auto cannot be combined.")
+        ranges = _load_ranges(selection_path)
+        try:
+            outputs = _trim_all(input, output, ranges, ffmpeg)
+        except FileNotFoundError as exc:
+            raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except (OSError, WavError) as exc:
+            raise click.ClickException(f"Failed to trim {input}: {exc}") from exc
+        except subprocess.CalledProcessError as exc:
+            raise click.ClickException(f"ffmpeg trim failed with exit code {exc.returncode}") from exc
+        manifest = selection.write_manifest(output, input, list(zip(ranges, outputs)))
+        click.echo(f"Trimmed {len(outputs)} ranges into {output} (manifest: {manifest.name})")
+        return
+    if auto:
+        start, end = _auto_selection(input, max(0.0, pad), threshold)
+    else:
+        first_range = _load_ranges(selection_path)[0]
+        start, end = first_range.start, first_range.end
     duration = end - start
-    cmd = [
-        ffmpeg,
-        "-y",
-        "-ss",
-        str(start),
-        "-t",
-        str(duration),
-        "-i",
-        str(input),
-        "-c",
-        "copy",
-        str(output),
-    ]
+    info = wavfile.probe(input) if output.suffix.lower() == ".wav" else None
+    if info is not None:
+        # PCM in and out: an exact frame range copied behind a new header.
+        try:
+            _extract(info, output, start, end)
+        except (OSError, WavError) as exc:
+            raise click.ClickException(f"Failed to trim {input}: {exc}") from exc
+        click.echo(f"Trimmed audio saved to {output} (start={start:.2f}s, end={end:.2f}s)")
+        return
     try:
-        subprocess.run(cmd, check=True)
+        with fsutil.atomic_path(output) as tmp_path:
+            cmd = [
+                ffmpeg,
+                "-y",
+                "-ss",
+                str(start),
+                "-t",
+                str(duration),
+                "-i",
+                str(input),
+                "-c",
+                "copy",
+                str(tmp_path),
+            ]
+            metrics.run(cmd, "trim")
     except FileNotFoundError as exc:
         raise click.ClickException("ffmpeg not found. Ensure it is installed and on PATH.") from exc
     except subprocess.CalledProcessError as exc:
@@ -5,6 +5,7 @@ from pathlib import Path
 
 import click
 
+from clipod import metrics
 from clipod.web import server as web_server
 
 
@@ -12,21 +13,60 @@ from clipod.web import server as web_server
 @click.argument("audio_file", type=click.Path(exists=True, dir_okay=False, path_type=Path), required=False)
 @click.option("--port", "-p", type=int, default=8000, show_default=True, help="Port to serve the editor on.")
 @click.option("--open/--no-open", "open_browser", default=True, show_default=True, help="Open browser automatically.")
-def web_command(audio_file: Path | None, port: int, open_browser: bool) -> None:
+@click.option(
+    "--max-upload-mb",
+    type=click.IntRange(min=1),
+    default=web_server.MAX_UPLOAD_BYTES // (1024 * 1024),
+    show_default=True,
+    help="Largest accepted upload (recordings, punch-ins, BGM files).",
+)
+@click.option(
+    "--async",
+    "use_async",
+    is_flag=True,
+    help="Serve with the asyncio front end (non-blocking ffmpeg and file streaming).",
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Append request and ffmpeg timings to this JSON-lines file (also: CLIPOD_TRACE).",
+)
+def web_command(
+    audio_file: Path | None, port: int, open_browser: bool, max_upload_mb: int, use_async: bool, trace: Path | None
+) -> None:
     """Launch the waveform editor web UI."""
     from http.server import ThreadingHTTPServer
 
-    # stash path so server can serve it via /api/auto
+    web_server.MAX_UPLOAD_BYTES = max_upload_mb * 1024 * 1024
+    if trace is not None:
+        metrics.registry.open_trace(str(trace))
+
+    # stash path so server can serve it via /api/auto (the default project)
+    project = web_server.PROJECTS.default
     if audio_file is None:
-        web_server.AUTO_FILE = Path.cwd() / "auto.wav"
-        web_server.AUTO_FILE_READY = False
+        project.auto_file = Path.cwd() / "auto.wav"
+        project.auto_file_ready = False
     else:
-        web_server.AUTO_FILE = audio_file
-        web_server.AUTO_FILE_READY = True
+        project.auto_file = audio_file
+        project.auto_file_ready = True
+
+    url = f"http://localhost:{port}/"
+    if use_async:
+        import asyncio
+
+        from clipod.web import aserver
+
+        click.echo(f"Serving waveform editor at {url} (asyncio)")
+        if open_browser:
+            webbrowser.open(url)
+        try:
+            asyncio.run(aserver.serve(port=port))
+        except KeyboardInterrupt:
+            click.echo("Shutting down...")
+        return
 
     handler = web_server.RequestHandler
     server = ThreadingHTTPServer(("", port), handler)
-    url = f"http://localhost:{port}/"
     click.echo(f"Serving waveform editor at {url}")
     if open_browser:
         webbrowser.open(url)
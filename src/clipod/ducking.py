@@ -0,0 +1,162 @@
+"""BGM ducking from a precomputed gain envelope.
+
+The envelope is derived once from the voice track's speech activity (the
+cached :mod:`clipod.analysis` features): the gain falls to ``depth_db`` over
+``attack`` seconds *before* speech starts (the whole file is known, so there is
+no detector lag) and recovers over ``release`` seconds after it ends. It is
+stored as a low-rate float WAV in the cache, keyed on the voice content and
+the settings, so layout tweaks and re-exports reuse it. The ffmpeg engine
+multiplies each BGM segment by it (``amultiply``); the NumPy engine folds it
+into the segment gain.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from clipod import analysis, cache, wavfile
+
+# Envelope sample rate; ffmpeg resamples it to the mix rate.
+ENVELOPE_RATE = 100
+# Bump when the envelope computation changes so cached envelopes are rebuilt.
+ENVELOPE_VERSION = 1
+
+
+class DuckingError(ValueError):
+    """Invalid ducking settings."""
+
+
+@dataclass(frozen=True)
+class Ducking:
+    depth_db: float = -12.0
+    attack: float = 0.3
+    release: float = 0.8
+    threshold_db: Optional[float] = None
+
+    def key(self) -> list:
+        return [ENVELOPE_VERSION, *asdict(self).values()]
+
+
+def parse(value) -> Optional[Ducking]:
+    """Settings from a layout's ``"ducking"`` entry (``true`` or an object)."""
+    if value in (None, False):
+        return None
+    if value is True:
+        return Ducking()
+    if not isinstance(value, dict):
+        raise DuckingError("Layout 'ducking' must be true/false or an object.")
+    if value.get("enabled") is False:
+        return None
+    try:
+        threshold = value.get("threshold_db")
+        settings = Ducking(
+            depth_db=float(value.get("depth_db", Ducking.depth_db)),
+            attack=float(value.get("attack", Ducking.attack)),
+            release=float(value.get("release", Ducking.release)),
+            threshold_db=None if threshold is None else float(threshold),
+        )
+    except (TypeError, ValueError) as exc:
+        raise DuckingError("Layout 'ducking' has invalid numeric values.") from exc
+    if settings.depth_db > 0:
+        raise DuckingError("Ducking depth_db must be zero or negative.")
+    if settings.attack < 0 or settings.release < 0:
+        raise DuckingError("Ducking attack/release must not be negative.")
+    return settings
+
+
+def _ramp_max(activity: np.ndarray, frames: int, reverse: bool) -> np.ndarray:
+    """``max_k activity[n -/+ k] * (1 - k / (frames + 1))`` for ``k`` in ``0..frames``."""
+    if frames <= 0:
+        return activity
+    ramp = 1.0 - np.arange(frames + 1, dtype=np.float32) / (frames + 1)
+    if reverse:
+        # Look ahead: the gain starts falling before speech does.
+        padded = np.concatenate([activity, np.zeros(frames, dtype=activity.dtype)])
+        windows = sliding_window_view(padded, frames + 1)
+        weights = ramp
+    else:
+        padded = np.concatenate([np.zeros(frames, dtype=activity.dtype), activity])
+        windows = sliding_window_view(padded, frames + 1)
+        weights = ramp[::-1]
+    out = np.empty_like(activity)
+    step = 1 << 16
+    # Chunked so the window x ramp product stays small on multi-hour files.
+    for first in range(0, len(activity), step):
+        out[first : first + step] = (windows[first : first + step] * weights).max(axis=1)
+    return out
+
+
+def compute(voice: Path, settings: Ducking) -> np.ndarray:
+    """Linear BGM gain at :data:`ENVELOPE_RATE` for ``voice`` (a WAV file)."""
+    features = analysis.features(voice)
+    speech, _ = analysis.speech_mask(features, threshold_db=settings.threshold_db)
+    frame_seconds = features.hop / features.sample_rate
+    activity = speech.astype(np.float32)
+    attack = int(math.ceil(settings.attack / frame_seconds))
+    release = int(math.ceil(settings.release / frame_seconds))
+    amount = np.maximum(_ramp_max(activity, attack, reverse=True), _ramp_max(activity, release, reverse=False))
+    # Ramps are linear in dB, which sounds even across the whole depth.
+    gain = np.power(10.0, amount * settings.depth_db / 20.0).astype(np.float32)
+    frame_times = (np.arange(len(gain)) + 0.5) * frame_seconds
+    count = max(1, int(math.ceil(features.duration * ENVELOPE_RATE)))
+    return np.interp(np.arange(count) / ENVELOPE_RATE, frame_times, gain).astype(np.float32)
+
+
+@dataclass(frozen=True)
+class Envelope:
+    path: Path
+    gain: np.ndarray  # float32 at ENVELOPE_RATE
+
+    def at(self, seconds: np.ndarray) -> np.ndarray:
+        """Gain at ``seconds`` (timeline positions), held flat past either end."""
+        # The grid is uniform, so the left neighbour is found by indexing, not searching.
+        last = len(self.gain) - 1
+        position = np.clip(np.asarray(seconds, dtype=np.float64) * ENVELOPE_RATE, 0.0, last)
+        index = np.minimum(position.astype(np.intp), max(last - 1, 0))
+        left = self.gain[index]
+        right = self.gain[np.minimum(index + 1, last)]
+        return left + (right - left) * (position - index).astype(np.float32)
+
+    def frames(self, first: int, count: int, rate: int) -> np.ndarray:
+        """Gain for timeline frames ``[first, first + count)`` of audio at ``rate``."""
+        step, remainder = divmod(rate, ENVELOPE_RATE)
+        if remainder or not step:
+            return self.at(np.arange(first, first + count) / rate)
+        # Each envelope interval spans ``step`` frames: expand it with one shared ramp.
+        start = first // step
+        points = np.arange(start, -(-(first + count) // step))
+        last = len(self.gain) - 1
+        left = self.gain[np.minimum(points, last)]
+        right = self.gain[np.minimum(points + 1, last)]
+        ramp = np.arange(step, dtype=np.float32) / step
+        gain = (left[:, None] + (right - left)[:, None] * ramp).ravel()
+        offset = first - start * step
+        return gain[offset : offset + count]
+
+
+def envelope_for(voice: Path, settings: Ducking) -> Envelope:
+    """Cached envelope WAV for ``voice``; the voice is analysed only on first use."""
+    info = wavfile.read_info(voice)
+    path = cache.cache_dir() / "ducking" / f"{cache.key(cache.file_digest(voice), settings.key(), info.channels)}.wav"
+    cached = wavfile.probe(path) if path.exists() else None
+    if cached is not None and cached.frames:
+        return Envelope(path, wavfile.to_float(cached, wavfile.memmap(cached))[:, 0].copy())
+    gain = compute(voice, settings)
+    # One channel per voice channel, so the mix needs no channel remapping.
+    data = np.ascontiguousarray(np.repeat(gain[:, None], info.channels, axis=1), dtype="<f4")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with wavfile.WavWriter(tmp_path, ENVELOPE_RATE, info.channels, 4, wavfile.WAVE_FORMAT_IEEE_FLOAT) as writer:
+            writer.write(data)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return Envelope(path, gain)
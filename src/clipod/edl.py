@@ -0,0 +1,329 @@
+"""Non-destructive edit decision list over immutable source takes."""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from clipod import fsutil, metrics, wavfile
+
+
+class EdlError(ValueError):
+    """Invalid edit or edit list."""
+
+
+@dataclass(frozen=True)
+class Segment:
+    take: str
+    start: int
+    end: int
+
+    @property
+    def frames(self) -> int:
+        return self.end - self.start
+
+
+def sidecar_path(audio: Path) -> Path:
+    return audio.with_name(f"{audio.stem}.edl.json")
+
+
+def takes_dir(audio: Path) -> Path:
+    return audio.with_name(f"{audio.stem}_takes")
+
+
+def output_path(audio: Path) -> Path:
+    return audio.with_suffix(".wav")
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def decode_command(
+    source: Path,
+    target: Path,
+    fmt: wavfile.WavInfo | None = None,
+    ffmpeg: str = "ffmpeg",
+) -> list[str] | None:
+    """ffmpeg command decoding ``source`` into ``fmt``, or ``None`` if it already matches."""
+    info = wavfile.probe(source)
+    if info is not None and (fmt is None or info.same_format(fmt)):
+        return None
+    cmd = [ffmpeg, "-y", "-i", str(source)]
+    if fmt is not None:
+        cmd.extend(
+            [
+                "-ar",
+                str(fmt.sample_rate),
+                "-ac",
+                str(fmt.channels),
+                "-c:a",
+                wavfile.ffmpeg_codec(fmt),
+            ]
+        )
+    cmd.append(str(target))
+    return cmd
+
+
+def import_take(
+    source: Path,
+    directory: Path,
+    fmt: wavfile.WavInfo | None = None,
+    ffmpeg: str = "ffmpeg",
+) -> tuple[str, wavfile.WavInfo]:
+    """Store ``source`` as an immutable take in ``directory``.
+
+    PCM WAV files already in the project format are hard-linked (copied when
+    linking is impossible); anything else is decoded once with ffmpeg into the
+    project format.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{uuid.uuid4().hex}.wav"
+    target = directory / name
+    cmd = decode_command(source, target, fmt, ffmpeg)
+    if cmd is None:
+        _link_or_copy(source, target)
+        return name, wavfile.read_info(target)
+    try:
+        metrics.run(cmd, "import", check=True, capture_output=True, text=True)
+    except BaseException:
+        if target.exists():
+            target.unlink()
+        raise
+    return name, wavfile.read_info(target)
+
+
+@dataclass
+class EditList:
+    """Ordered segment references plus undo/redo history, persisted as JSON."""
+
+    audio: Path
+    sample_rate: int
+    channels: int
+    sample_width: int
+    format_tag: int
+    segments: list[Segment]
+    undo_stack: list[list[Segment]] = field(default_factory=list)
+    redo_stack: list[list[Segment]] = field(default_factory=list)
+    generation: int = 0
+    rendered_generation: int = 0
+
+    @property
+    def path(self) -> Path:
+        return sidecar_path(self.audio)
+
+    @property
+    def takes(self) -> Path:
+        return takes_dir(self.audio)
+
+    @property
+    def output(self) -> Path:
+        return output_path(self.audio)
+
+    @property
+    def frames(self) -> int:
+        return sum(seg.frames for seg in self.segments)
+
+    @property
+    def info(self) -> wavfile.WavInfo:
+        """Format descriptor for the project (offsets are meaningless)."""
+        return wavfile.WavInfo(
+            path=self.output,
+            sample_rate=self.sample_rate,
+            channels=self.channels,
+            sample_width=self.sample_width,
+            format_tag=self.format_tag,
+            data_offset=0,
+            data_size=self.frames * self.channels * self.sample_width,
+        )
+
+    @classmethod
+    def create(cls, audio: Path, ffmpeg: str = "ffmpeg") -> "EditList":
+        """Start an edit list whose single take is the current ``audio``."""
+        name, info = import_take(audio, takes_dir(audio), ffmpeg=ffmpeg)
+        edit_list = cls(
+            audio=output_path(audio),
+            sample_rate=info.sample_rate,
+            channels=info.channels,
+            sample_width=info.sample_width,
+            format_tag=info.format_tag,
+            segments=[Segment(name, 0, info.frames)] if info.frames else [],
+        )
+        if audio.suffix.lower() != ".wav":
+            # The flat WAV does not exist yet; render it on first use.
+            edit_list.rendered_generation = -1
+        edit_list.save()
+        return edit_list
+
+    @classmethod
+    def load(cls, audio: Path) -> "EditList":
+        path = sidecar_path(audio)
+        try:
+            data = json.loads(path.read_text())
+            fmt = data["format"]
+
+            def parse(entries: list) -> list[Segment]:
+                return [Segment(str(take), int(start), int(end)) for take, start, end in entries]
+
+            return cls(
+                audio=audio,
+                sample_rate=int(fmt["sample_rate"]),
+                channels=int(fmt["channels"]),
+                sample_width=int(fmt["sample_width"]),
+                format_tag=int(fmt["format_tag"]),
+                segments=parse(data["segments"]),
+                undo_stack=[parse(entry) for entry in data.get("undo", [])],
+                redo_stack=[parse(entry) for entry in data.get("redo", [])],
+                generation=int(data.get("generation", 0)),
+                rendered_generation=int(data.get("rendered_generation", 0)),
+            )
+        except (OSError, KeyError, TypeError, ValueError) as exc:
+            raise EdlError(f"Invalid edit list: {path}") from exc
+
+    def save(self) -> None:
+        def dump(segments: list[Segment]) -> list[list]:
+            return [[seg.take, seg.start, seg.end] for seg in segments]
+
+        data = {
+            "format": {
+                "sample_rate": self.sample_rate,
+                "channels": self.channels,
+                "sample_width": self.sample_width,
+                "format_tag": self.format_tag,
+            },
+            "segments": dump(self.segments),
+            "undo": [dump(entry) for entry in self.undo_stack],
+            "redo": [dump(entry) for entry in self.redo_stack],
+            "generation": self.generation,
+            "rendered_generation": self.rendered_generation,
+        }
+        fsutil.write_text(self.path, json.dumps(data))
+
+    def _frame(self, seconds: float) -> int:
+        return max(0, min(self.frames, int(round(seconds * self.sample_rate))))
+
+    def _split(self, frame: int) -> tuple[list[Segment], list[Segment]]:
+        """Split the timeline at ``frame`` into (before, after) segment lists."""
+        before: list[Segment] = []
+        position = 0
+        for idx, seg in enumerate(self.segments):
+            if position + seg.frames <= frame:
+                before.append(seg)
+                position += seg.frames
+                continue
+            cut = frame - position
+            after = self.segments[idx + 1 :]
+            if cut > 0:
+                before.append(Segment(seg.take, seg.start, seg.start + cut))
+                after = [Segment(seg.take, seg.start + cut, seg.end), *after]
+            else:
+                after = [seg, *after]
+            return before, after
+        return before, []
+
+    def _apply(self, segments: list[Segment]) -> None:
+        self.undo_stack.append(self.segments)
+        self.redo_stack.clear()
+        self.segments = segments
+        self.generation += 1
+
+    def delete(self, start: float, end: float) -> None:
+        first, last = self._frame(start), self._frame(end)
+        if last <= first:
+            raise EdlError(f"Invalid delete range: start={start}, end={end}")
+        before, _ = self._split(first)
+        _, after = self._split(last)
+        self._apply(before + after)
+
+    def replace(self, start: float, end: float, take: str, frames: int) -> None:
+        """Replace ``start``..``end`` with the whole of ``take`` (punch-in)."""
+        first, last = self._frame(start), self._frame(end)
+        if last < first:
+            raise EdlError(f"Invalid punch range: start={start}, end={end}")
+        before, _ = self._split(first)
+        _, after = self._split(last)
+        inserted = [Segment(take, 0, frames)] if frames > 0 else []
+        self._apply(before + inserted + after)
+
+    def undo(self) -> bool:
+        if not self.undo_stack:
+            return False
+        self.redo_stack.append(self.segments)
+        self.segments = self.undo_stack.pop()
+        self.generation += 1
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack:
+            return False
+        self.undo_stack.append(self.segments)
+        self.segments = self.redo_stack.pop()
+        self.generation += 1
+        return True
+
+    @property
+    def stale(self) -> bool:
+        return self.rendered_generation != self.generation or not self.output.exists()
+
+    def render(self) -> Path:
+        """Write the flat WAV by copying sample byte ranges out of the takes."""
+        output = self.output
+        tmp_path = output.with_name(f"{output.stem}_render.tmp")
+        infos: dict[str, wavfile.WavInfo] = {}
+        header = wavfile.header_for(self.info, self.info.data_size)
+        try:
+            with open(tmp_path, "wb") as handle:
+                handle.write(header)
+                handle.flush()
+                dst_fd = handle.fileno()
+                for seg in self.segments:
+                    info = infos.get(seg.take)
+                    if info is None:
+                        info = infos[seg.take] = wavfile.read_info(self.takes / seg.take)
+                    with open(info.path, "rb") as source:
+                        wavfile.copy_range(
+                            source.fileno(),
+                            dst_fd,
+                            info.frame_offset(seg.start),
+                            seg.frames * info.block_align,
+                        )
+            fsutil.commit(tmp_path, output)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        self.rendered_generation = self.generation
+        self.save()
+        return output
+
+    def ensure_rendered(self) -> Path:
+        if self.stale:
+            return self.render()
+        return self.output
+
+
+def open_for(audio: Path, ffmpeg: str = "ffmpeg") -> EditList:
+    """Load the edit list for ``audio`` or start a new one from it."""
+    if sidecar_path(audio).exists():
+        return EditList.load(audio)
+    return EditList.create(audio, ffmpeg=ffmpeg)
+
+
+def ensure_rendered(audio: Path) -> Path:
+    """Render ``audio`` from its edit list if one exists and is out of date."""
+    if not sidecar_path(audio).exists():
+        return audio
+    return EditList.load(audio).ensure_rendered()
+
+
+def discard(audio: Path) -> None:
+    """Forget the edit list and takes for ``audio`` (e.g. after a new upload)."""
+    path = sidecar_path(audio)
+    if path.exists():
+        path.unlink()
+    shutil.rmtree(takes_dir(audio), ignore_errors=True)
@@ -0,0 +1,93 @@
+"""Durable atomic writes.
+
+Files are produced under a temporary name next to the target; :func:`commit`
+then fsyncs only that file, renames it over the target and fsyncs the
+directory. A crash leaves either the old or the new file, and the flush cost
+is proportional to what was written (unlike a machine-wide ``os.sync()``).
+Caches (peaks, render cache, digests) skip this on purpose: losing one only
+costs a recompute.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+def temp_path(target: Path) -> Path:
+    """Hidden sibling of ``target``; the suffix is kept so ffmpeg picks the format."""
+    return target.with_name(f".{target.stem}.{os.getpid()}.{threading.get_ident()}.tmp{target.suffix}")
+
+
+def fsync_file(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(directory: Path) -> None:
+    """Persist renames and links in ``directory`` (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def commit(tmp_path: Path, target: Path) -> None:
+    """fsync ``tmp_path``, rename it to ``target`` and fsync the directory."""
+    fsync_file(tmp_path)
+    os.replace(tmp_path, target)
+    fsync_dir(target.parent)
+
+
+@contextmanager
+def atomic_path(target: Path) -> Iterator[Path]:
+    """Yield a temporary path to write; it replaces ``target`` durably on success."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path(target)
+    try:
+        yield tmp_path
+        commit(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_bytes(target: Path, data: bytes) -> None:
+    with atomic_path(target) as tmp_path:
+        tmp_path.write_bytes(data)
+
+
+def write_text(target: Path, text: str) -> None:
+    write_bytes(target, text.encode("utf-8"))
+
+
+def copy(source: Path, target: Path) -> None:
+    with atomic_path(target) as tmp_path:
+        shutil.copy2(source, tmp_path)
+
+
+def install(source: Path, target: Path) -> None:
+    """Move a finished file (e.g. a spooled upload) over ``target`` durably.
+
+    A rename when both are on one filesystem, otherwise a copy then unlink.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fsync_file(source)
+        os.replace(source, target)
+    except OSError:
+        copy(source, target)
+        source.unlink(missing_ok=True)
+        return
+    fsync_dir(target.parent)
@@ -0,0 +1,112 @@
+"""Two-pass EBU R128 normalisation with cached ``loudnorm`` measurements.
+
+The first pass runs the mastering chain plus ``loudnorm=print_format=json`` and
+stores the measured values keyed on the source content hash and the filter
+strings. Later renders apply ``loudnorm`` in linear mode from those values, so
+re-exports of the same voice track never analyse it again.
+"""
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from clipod import cache, metrics
+
+_FIELDS = ("input_i", "input_lra", "input_tp", "input_thresh", "target_offset")
+
+
+class LoudnessError(RuntimeError):
+    """The measurement pass produced no usable loudnorm statistics."""
+
+
+@dataclass(frozen=True)
+class Measurement:
+    input_i: float
+    input_lra: float
+    input_tp: float
+    input_thresh: float
+    target_offset: float
+
+    @property
+    def usable(self) -> bool:
+        # Silent input reports -inf, which linear mode cannot take.
+        return all(math.isfinite(value) for value in asdict(self).values())
+
+
+def _parse(stderr: str) -> Measurement:
+    start = stderr.rfind("{")
+    end = stderr.rfind("}")
+    if start < 0 or end < start:
+        raise LoudnessError("loudnorm did not print measurements")
+    try:
+        data = json.loads(stderr[start : end + 1])
+        return Measurement(**{name: float(data[name]) for name in _FIELDS})
+    except (KeyError, TypeError, ValueError) as exc:
+        raise LoudnessError("loudnorm printed malformed measurements") from exc
+
+
+def _chain(*filters: str) -> str:
+    return ",".join(part for part in filters if part)
+
+
+def measure(source: Path, pre_filter: str, loudnorm: str, ffmpeg: str = "ffmpeg") -> Measurement:
+    """Run the analysis pass over ``source`` (no output is written)."""
+    cmd = [
+        ffmpeg,
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        str(source),
+        "-af",
+        _chain(pre_filter, f"{loudnorm}:print_format=json"),
+        "-f",
+        "null",
+        "-",
+    ]
+    result = metrics.run(cmd, "loudness", check=True, capture_output=True, text=True)
+    return _parse(result.stderr)
+
+
+def cached_measurement(
+    source: Path, pre_filter: str, loudnorm: str, ffmpeg: str = "ffmpeg", processed: Path | None = None
+) -> Measurement:
+    """Measurement for ``source`` through ``pre_filter``, from the cache when possible.
+
+    ``processed`` is ``source`` already run through ``pre_filter`` (e.g. by the
+    chunked renderer); on a miss only ``loudnorm`` analyses it, and the result
+    is cached under ``source`` like a regular measurement.
+    """
+    path = cache.cache_dir() / "loudness" / f"{cache.key(cache.file_digest(source), pre_filter, loudnorm)}.json"
+    data = cache.read_json(path)
+    if isinstance(data, dict):
+        try:
+            return Measurement(**{name: float(data[name]) for name in _FIELDS})
+        except (KeyError, TypeError, ValueError):
+            pass
+    if processed is not None:
+        measurement = measure(processed, "", loudnorm, ffmpeg=ffmpeg)
+    else:
+        measurement = measure(source, pre_filter, loudnorm, ffmpeg=ffmpeg)
+    cache.write_json(path, asdict(measurement))
+    return measurement
+
+
+def linear_filter(loudnorm: str, measurement: Measurement) -> str:
+    if not measurement.usable:
+        return loudnorm
+    return (
+        f"{loudnorm}"
+        f":measured_I={measurement.input_i}"
+        f":measured_LRA={measurement.input_lra}"
+        f":measured_TP={measurement.input_tp}"
+        f":measured_thresh={measurement.input_thresh}"
+        f":offset={measurement.target_offset}"
+        ":linear=true"
+    )
+
+
+def normalized_filter(source: Path, pre_filter: str, loudnorm: str, ffmpeg: str = "ffmpeg") -> str:
+    """Mastering chain with ``loudnorm`` in linear mode measured on ``source``."""
+    return _chain(pre_filter, linear_filter(loudnorm, cached_measurement(source, pre_filter, loudnorm, ffmpeg)))
@@ -0,0 +1,259 @@
+"""In-process instrumentation: request and ffmpeg metrics plus a JSON-lines trace.
+
+Counters and histograms live in one process-wide :data:`registry` and are
+rendered in the Prometheus text format (``/api/metrics``). When a trace file is
+configured (``CLIPOD_TRACE`` or ``clipod web --trace``) every observation is
+also appended to it as one JSON object per line; failed ffmpeg runs carry the
+tail of their stderr there.
+
+:func:`run` replaces ``subprocess.run`` for ffmpeg: the child is reaped with
+``os.wait4`` so its own CPU time is recorded next to the wall time.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import IO, Any, Optional, Sequence
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FFMPEG_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Characters of stderr kept on the trace event of a failed ffmpeg run.
+STDERR_TAIL_CHARS = 4000
+
+_ID_SEGMENT_RE = re.compile(r"^[0-9a-f]{12,}$")
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            rows.append((_format_value(bound), total))
+        rows.append(("+Inf", self.count))
+        return rows
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: dict[tuple[str, str, str], int] = {}
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.bytes_in: dict[tuple[str], int] = {}
+        self.bytes_out: dict[tuple[str], int] = {}
+        self.ffmpeg_runs: dict[tuple[str, str], int] = {}
+        self.ffmpeg_wall: dict[tuple[str], Histogram] = {}
+        self.ffmpeg_cpu: dict[tuple[str], float] = {}
+        self._trace: Optional[IO[str]] = None
+        path = os.environ.get("CLIPOD_TRACE")
+        if path:
+            self.open_trace(path)
+
+    def open_trace(self, path: str) -> None:
+        """Append JSON-lines events to ``path`` from now on."""
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+            self._trace = open(path, "a", buffering=1, encoding="utf-8")
+
+    def _emit(self, event: dict[str, Any]) -> None:
+        # Called with the lock held, so lines from concurrent threads never interleave.
+        if self._trace is None:
+            return
+        try:
+            self._trace.write(json.dumps(event, separators=(",", ":"), default=str) + "\n")
+        except (OSError, ValueError):
+            pass
+
+    def observe_request(
+        self, route: str, method: str, status: int, seconds: float, bytes_in: int, bytes_out: int
+    ) -> None:
+        with self._lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((route, method), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.bytes_in[(route,)] = self.bytes_in.get((route,), 0) + bytes_in
+            self.bytes_out[(route,)] = self.bytes_out.get((route,), 0) + bytes_out
+            self._emit(
+                {
+                    "ts": time.time(),
+                    "type": "request",
+                    "route": route,
+                    "method": method,
+                    "status": status,
+                    "seconds": round(seconds, 6),
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                }
+            )
+
+    def observe_ffmpeg(
+        self,
+        label: str,
+        cmd: Sequence[str],
+        seconds: float,
+        cpu_seconds: Optional[float],
+        returncode: int,
+        stderr: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            key = (label, str(returncode))
+            self.ffmpeg_runs[key] = self.ffmpeg_runs.get(key, 0) + 1
+            self.ffmpeg_wall.setdefault((label,), Histogram(FFMPEG_BUCKETS)).observe(seconds)
+            if cpu_seconds is not None:
+                self.ffmpeg_cpu[(label,)] = self.ffmpeg_cpu.get((label,), 0.0) + cpu_seconds
+            event = {
+                "ts": time.time(),
+                "type": "ffmpeg",
+                "label": label,
+                "seconds": round(seconds, 6),
+                "cpu_seconds": None if cpu_seconds is None else round(cpu_seconds, 6),
+                "returncode": returncode,
+                "cmd": list(cmd),
+            }
+            if returncode and stderr:
+                event["stderr"] = stderr[-STDERR_TAIL_CHARS:]
+            self._emit(event)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            _counter(lines, "clipod_http_requests_total", "HTTP requests by route, method and status.",
+                     ("route", "method", "status"), self.requests)
+            _histogram(lines, "clipod_http_request_duration_seconds", "HTTP request latency.",
+                       ("route", "method"), self.latency)
+            _counter(lines, "clipod_http_request_bytes_total", "Request body bytes received.",
+                     ("route",), self.bytes_in)
+            _counter(lines, "clipod_http_response_bytes_total", "Response bytes sent.",
+                     ("route",), self.bytes_out)
+            _counter(lines, "clipod_ffmpeg_runs_total", "ffmpeg invocations by label and exit code.",
+                     ("label", "exit_code"), self.ffmpeg_runs)
+            _histogram(lines, "clipod_ffmpeg_wall_seconds", "ffmpeg wall-clock time.",
+                       ("label",), self.ffmpeg_wall)
+            _counter(lines, "clipod_ffmpeg_cpu_seconds_total", "ffmpeg user+system CPU time.",
+                     ("label",), self.ffmpeg_cpu)
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _counter(lines: list[str], name: str, help_text: str, names: Sequence[str], values: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(names, key)} {_format_value(value)}")
+
+
+def _histogram(lines: list[str], name: str, help_text: str, names: Sequence[str], values: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(values.items()):
+        for bound, count in histogram.cumulative():
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(names, key, le)} {count}")
+        lines.append(f"{name}_sum{_labels(names, key)} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(names, key)} {histogram.count}")
+
+
+registry = Registry()
+
+
+def route_label(path: str) -> str:
+    """Collapse ids in API paths (``/api/jobs/<id>/events`` -> ``/api/jobs/:id/events``)."""
+    if not path.startswith("/api/"):
+        return "static"
+    return "/".join(":id" if _ID_SEGMENT_RE.match(part) else part for part in path.split("/"))
+
+
+def wait(proc: subprocess.Popen) -> tuple[int, Optional[float]]:
+    """Reap ``proc``, returning its exit code and CPU seconds (``None`` if unknown)."""
+    wait4 = getattr(os, "wait4", None)
+    if wait4 is not None and proc.returncode is None:
+        try:
+            _, status, usage = wait4(proc.pid, 0)
+        except ChildProcessError:
+            pass  # reaped concurrently (e.g. by Popen.poll); fall through
+        else:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return proc.returncode, usage.ru_utime + usage.ru_stime
+    return proc.wait(), None
+
+
+def _read_all(stream: IO, out: list) -> None:
+    out.append(stream.read())
+
+
+def run(
+    cmd: Sequence[str],
+    label: str,
+    check: bool = True,
+    capture_output: bool = False,
+    text: bool = False,
+) -> subprocess.CompletedProcess:
+    """``subprocess.run`` for ffmpeg that records wall time, CPU time and exit status."""
+    pipe = subprocess.PIPE if capture_output else None
+    started = time.perf_counter()
+    proc = subprocess.Popen(list(cmd), stdout=pipe, stderr=pipe, text=text)
+    stdout: list = []
+    stderr: list = []
+    # Drain the pipes on threads so the child can be reaped with wait4
+    # (Popen.communicate would reap it with waitpid and lose the rusage).
+    readers = [
+        threading.Thread(target=_read_all, args=(stream, out), daemon=True)
+        for stream, out in ((proc.stdout, stdout), (proc.stderr, stderr))
+        if stream is not None
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        returncode, cpu_seconds = wait(proc)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.join()
+        for stream in (proc.stdout, proc.stderr):
+            if stream is not None:
+                stream.close()
+    result = subprocess.CompletedProcess(
+        list(cmd), returncode, stdout[0] if stdout else None, stderr[0] if stderr else None
+    )
+    errors = result.stderr.decode("utf-8", errors="replace") if isinstance(result.stderr, bytes) else result.stderr
+    registry.observe_ffmpeg(label, cmd, time.perf_counter() - started, cpu_seconds, returncode, errors)
+    if check:
+        result.check_returncode()
+    return result
@@ -0,0 +1,223 @@
+"""Block-based NumPy BGM mixer equivalent to the ffmpeg graph in ``bgm``.
+
+The voice is streamed in fixed-size blocks, each BGM segment is decoded only
+while it is audible, and ``amix`` semantics (``duration=first``, output scaled
+by ``1 / active inputs``) are reproduced so results match the ffmpeg engine.
+"""
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+
+from clipod import wavfile
+from clipod.bgm import BgmSegment, LayoutError
+from clipod.ducking import Envelope
+
+BLOCK_FRAMES = 1 << 16
+
+
+class _FfmpegReader:
+    """Sequential float32 PCM reader decoding one segment through ffmpeg."""
+
+    def __init__(self, seg: BgmSegment, sample_rate: int, channels: int, ffmpeg: str) -> None:
+        self.channels = channels
+        self.cmd = [
+            ffmpeg,
+            "-v",
+            "error",
+            "-ss",
+            str(seg.offset),
+            "-t",
+            str(seg.duration),
+            "-i",
+            str(seg.path),
+            "-f",
+            "f32le",
+            "-ac",
+            str(channels),
+            "-ar",
+            str(sample_rate),
+            "-",
+        ]
+        self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, frames: int) -> np.ndarray:
+        assert self.proc.stdout is not None
+        data = self.proc.stdout.read(frames * self.channels * 4)
+        usable = len(data) - len(data) % (self.channels * 4)
+        return np.frombuffer(data[:usable], dtype="<f4").reshape(-1, self.channels)
+
+    def close(self) -> None:
+        if self.proc.stdout is not None:
+            self.proc.stdout.close()
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+            return
+        if self.proc.returncode:
+            raise subprocess.CalledProcessError(self.proc.returncode, self.cmd)
+
+
+class _WavReader:
+    """Reader for WAV sources already at the mix sample rate (no subprocess)."""
+
+    def __init__(self, seg: BgmSegment, info: wavfile.WavInfo, channels: int) -> None:
+        self.info = info
+        self.channels = channels
+        self.samples = wavfile.memmap(info)
+        self.position = int(round(seg.offset * info.sample_rate))
+
+    def read(self, frames: int) -> np.ndarray:
+        block = wavfile.to_float(self.info, self.samples[self.position : self.position + frames])
+        self.position += len(block)
+        if block.shape[1] == self.channels:
+            return block
+        if self.channels == 1:
+            return block.mean(axis=1, keepdims=True)
+        if block.shape[1] == 1:
+            return np.repeat(block, self.channels, axis=1)
+        return block[:, : self.channels]
+
+    def close(self) -> None:
+        del self.samples
+
+
+@dataclass
+class _Placement:
+    seg: BgmSegment
+    start: int
+    length: int
+    fade_in: float
+    fade_out: float
+    reader: object | None = None
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length
+
+
+def _placements(segments: Iterable[BgmSegment], sample_rate: int) -> list[_Placement]:
+    placements = []
+    for seg in segments:
+        duration = seg.duration
+        if duration <= 0:
+            raise LayoutError("Segment duration must be positive.")
+        # adelay works in whole milliseconds; mirror that for sample alignment.
+        delay_ms = int(round(seg.start * 1000))
+        placements.append(
+            _Placement(
+                seg=seg,
+                start=delay_ms * sample_rate // 1000,
+                length=int(round(duration * sample_rate)),
+                fade_in=min(seg.fade_in, duration),
+                fade_out=min(seg.fade_out, duration),
+            )
+        )
+    placements.sort(key=lambda item: item.start)
+    return placements
+
+
+def _open_reader(place: _Placement, sample_rate: int, channels: int, ffmpeg: str):
+    info = wavfile.probe(place.seg.path)
+    if info is not None and info.sample_rate == sample_rate:
+        return _WavReader(place.seg, info, channels)
+    return _FfmpegReader(place.seg, sample_rate, channels, ffmpeg)
+
+
+def _gain(place: _Placement, first: int, count: int, sample_rate: int) -> np.ndarray:
+    t = (np.arange(first, first + count, dtype=np.float64) - place.start) / sample_rate
+    gain = np.full(count, place.seg.volume, dtype=np.float64)
+    if place.fade_in > 0:
+        gain *= np.clip(t / place.fade_in, 0.0, 1.0)
+    if place.fade_out > 0:
+        gain *= np.clip((place.seg.duration - t) / place.fade_out, 0.0, 1.0)
+    return gain.astype(np.float32)
+
+
+def mix(
+    main: Path,
+    segments: list[BgmSegment],
+    output: Path,
+    ffmpeg: str = "ffmpeg",
+    progress: Callable[[float], None] | None = None,
+    envelope: Envelope | None = None,
+) -> None:
+    """Mix ``segments`` over ``main`` (a PCM WAV) into a 16-bit WAV ``output``.
+
+    ``progress`` is called with the completed fraction after every block; an
+    exception it raises aborts the mix. ``envelope`` ducks every segment.
+    """
+    info = wavfile.probe(main)
+    if info is None:
+        raise LayoutError("The numpy engine requires a PCM WAV main file.")
+    rate = info.sample_rate
+    channels = info.channels
+    placements = _placements(segments, rate)
+    out_info = wavfile.WavInfo(output, rate, channels, 2, wavfile.WAVE_FORMAT_PCM, 0, 0)
+    passthrough = info.same_format(out_info)
+    voice = wavfile.memmap(info)
+    pending = list(placements)
+    active: list[_Placement] = []
+    try:
+        with wavfile.WavWriter(output, rate, channels) as writer, open(main, "rb") as source:
+            position = 0
+            while position < info.frames:
+                count = min(BLOCK_FRAMES, info.frames - position)
+                block_end = position + count
+                while pending and pending[0].start < block_end:
+                    active.append(pending.pop(0))
+                # amix counts a BGM input until its stream ends; adelay pads it
+                # with silence before it starts, so future segments count too.
+                ends = np.sort(np.array([p.end for p in placements if p.end > position], dtype=np.int64))
+                if not active and len(ends) == 0 and passthrough:
+                    # Nothing left to mix: the rest of the voice is copied verbatim.
+                    writer.copy_from(
+                        source.fileno(),
+                        info.frame_offset(position),
+                        (info.frames - position) * info.block_align,
+                    )
+                    break
+                out = wavfile.to_float(info, voice[position:block_end])
+                if active:
+                    out = out.copy()
+                for place in list(active):
+                    lo = max(position, place.start)
+                    hi = min(block_end, place.end)
+                    if hi > lo:
+                        if place.reader is None:
+                            place.reader = _open_reader(place, rate, channels, ffmpeg)
+                        data = place.reader.read(hi - lo)
+                        if len(data) < hi - lo:
+                            # Source ran out early: the amix input ends here.
+                            place.length = lo + len(data) - place.start
+                        if len(data):
+                            gain = _gain(place, lo, len(data), rate)
+                            if envelope is not None:
+                                gain *= envelope.frames(lo, len(data), rate)
+                            out[lo - position : lo - position + len(data)] += data * gain[:, None]
+                    if place.end <= block_end:
+                        active.remove(place)
+                        if place.reader is not None:
+                            place.reader.close()
+                            place.reader = None
+                if len(ends):
+                    ends = np.sort(np.array([p.end for p in placements if p.end > position], dtype=np.int64))
+                    frames = np.arange(position, block_end, dtype=np.int64)
+                    inputs = 1 + len(ends) - np.searchsorted(ends, frames, side="right")
+                    out = out / inputs[:, None].astype(np.float32)
+                writer.write(wavfile.from_float(out_info, out))
+                position = block_end
+                if progress is not None:
+                    progress(position / info.frames)
+    finally:
+        del voice
+        for place in active:
+            if place.reader is not None:
+                try:
+                    place.reader.close()
+                except subprocess.CalledProcessError:
+                    pass
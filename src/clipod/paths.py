@@ -0,0 +1,12 @@
+"""Default editor state files shared by the web UI and the CLI.
+
+Kept free of heavy imports so commands can default to them without loading
+the web server.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+WEB_ROOT = Path(__file__).parent / "web"
+SELECTION_FILE = WEB_ROOT / "selection.json"
+BGM_LAYOUT_FILE = WEB_ROOT / "bgm_layout.json"
@@ -0,0 +1,154 @@
+"""Multi-resolution min/max waveform peaks with an on-disk cache."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Mapping
+
+import numpy as np
+
+from clipod import wavfile
+from clipod.sidecar import SidecarCache
+
+BASE_SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+TILE_SIZE = 2048
+_BLOCK_PEAKS = 4096
+
+
+@dataclass(frozen=True)
+class PeakPyramid:
+    sample_rate: int
+    channels: int
+    frames: int
+    mins: tuple[np.ndarray, ...]
+    maxs: tuple[np.ndarray, ...]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def samples_per_peak(self, level: int) -> int:
+        return BASE_SAMPLES_PER_PEAK * LEVEL_FACTOR**level
+
+    def describe(self) -> dict:
+        levels = []
+        for level, mins in enumerate(self.mins):
+            count = len(mins)
+            levels.append(
+                {
+                    "level": level,
+                    "samples_per_peak": self.samples_per_peak(level),
+                    "peaks": count,
+                    "tiles": (count + TILE_SIZE - 1) // TILE_SIZE,
+                }
+            )
+        return {
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "frames": self.frames,
+            "duration": self.duration,
+            "tile_size": TILE_SIZE,
+            "levels": levels,
+        }
+
+    def tiles(self, level: int, first: int, count: int) -> dict:
+        if level < 0 or level >= len(self.mins):
+            raise ValueError(f"Invalid peaks level: {level}")
+        if first < 0 or count < 1:
+            raise ValueError("Invalid tile range")
+        start = first * TILE_SIZE
+        end = start + count * TILE_SIZE
+        return {
+            "level": level,
+            "samples_per_peak": self.samples_per_peak(level),
+            "tile_size": TILE_SIZE,
+            "start": start,
+            "min": self.mins[level][start:end].astype(np.float64).round(4).tolist(),
+            "max": self.maxs[level][start:end].astype(np.float64).round(4).tolist(),
+        }
+
+
+def compute(audio: Path) -> PeakPyramid:
+    """Scan ``audio`` once in bounded blocks and build the full pyramid."""
+    info = wavfile.read_info(audio)
+    samples = wavfile.memmap(info)
+    peak_count = (info.frames + BASE_SAMPLES_PER_PEAK - 1) // BASE_SAMPLES_PER_PEAK
+    mins = np.zeros(peak_count, dtype=np.float32)
+    maxs = np.zeros(peak_count, dtype=np.float32)
+    block_frames = BASE_SAMPLES_PER_PEAK * _BLOCK_PEAKS
+    for peak_start in range(0, peak_count, _BLOCK_PEAKS):
+        frame_start = peak_start * BASE_SAMPLES_PER_PEAK
+        block = wavfile.to_float(info, samples[frame_start : frame_start + block_frames])
+        n = len(block)
+        whole = n // BASE_SAMPLES_PER_PEAK
+        if whole:
+            shaped = block[: whole * BASE_SAMPLES_PER_PEAK].reshape(whole, -1)
+            mins[peak_start : peak_start + whole] = shaped.min(axis=1)
+            maxs[peak_start : peak_start + whole] = shaped.max(axis=1)
+        if n % BASE_SAMPLES_PER_PEAK:
+            tail = block[whole * BASE_SAMPLES_PER_PEAK :]
+            mins[peak_start + whole] = tail.min()
+            maxs[peak_start + whole] = tail.max()
+    del samples
+    level_mins = [mins]
+    level_maxs = [maxs]
+    while len(level_mins[-1]) > TILE_SIZE:
+        level_mins.append(_reduce(level_mins[-1], np.minimum))
+        level_maxs.append(_reduce(level_maxs[-1], np.maximum))
+    return PeakPyramid(
+        sample_rate=info.sample_rate,
+        channels=info.channels,
+        frames=info.frames,
+        mins=tuple(level_mins),
+        maxs=tuple(level_maxs),
+    )
+
+
+def _reduce(values: np.ndarray, op) -> np.ndarray:
+    pad = (-len(values)) % LEVEL_FACTOR
+    if pad:
+        values = np.concatenate([values, np.repeat(values[-1:], pad)])
+    return op.reduce(values.reshape(-1, LEVEL_FACTOR), axis=1)
+
+
+def _encode(pyramid: PeakPyramid) -> dict[str, np.ndarray]:
+    arrays: dict[str, np.ndarray] = {
+        "meta": np.array([pyramid.sample_rate, pyramid.channels, pyramid.frames], dtype=np.int64),
+    }
+    for level, (mins, maxs) in enumerate(zip(pyramid.mins, pyramid.maxs)):
+        arrays[f"min{level}"] = mins
+        arrays[f"max{level}"] = maxs
+    return arrays
+
+
+def _decode(data: Mapping[str, np.ndarray]) -> PeakPyramid | None:
+    meta = data["meta"]
+    mins = []
+    maxs = []
+    level = 0
+    while f"min{level}" in data:
+        mins.append(data[f"min{level}"])
+        maxs.append(data[f"max{level}"])
+        level += 1
+    if not mins:
+        return None
+    return PeakPyramid(
+        sample_rate=int(meta[0]),
+        channels=int(meta[1]),
+        frames=int(meta[2]),
+        mins=tuple(mins),
+        maxs=tuple(maxs),
+    )
+
+
+_CACHE = SidecarCache("peaks", 1, compute, _encode, _decode)
+
+
+def cache_path(audio: Path) -> Path:
+    return _CACHE.path(audio)
+
+
+def load(audio: Path) -> PeakPyramid:
+    """Return the pyramid for ``audio``, rebuilding it when mtime/size changed."""
+    return _CACHE.get(audio)
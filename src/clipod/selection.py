@@ -0,0 +1,103 @@
+"""Named time ranges in ``selection.json`` (chapters, clips) and output manifests.
+
+The file holds ``{"file": ..., "ranges": [{"name", "start", "end"}, ...]}``.
+The first range is mirrored as top-level ``start``/``end`` so single-range
+readers keep working, and files that only have ``start``/``end`` read as one
+range named ``selection``.
+"""
+from __future__ import annotations
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+from clipod import fsutil
+
+DEFAULT_NAME = "selection"
+_UNSAFE_RE = re.compile(r"[^\w.-]+")
+
+
+class SelectionError(ValueError):
+    """Missing or invalid selection file."""
+
+
+@dataclass(frozen=True)
+class Range:
+    name: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "start": self.start, "end": self.end}
+
+
+def _range(entry: Any, index: int) -> Range:
+    if not isinstance(entry, dict):
+        raise SelectionError(f"Range {index} must be an object.")
+    try:
+        start = float(entry["start"])
+        end = float(entry["end"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise SelectionError(f"Range {index} needs numeric start/end.") from exc
+    if start < 0 or end <= start:
+        raise SelectionError(f"Invalid trim range: start={start}, end={end}")
+    name = str(entry.get("name") or (DEFAULT_NAME if index == 1 else f"{DEFAULT_NAME}{index}"))
+    return Range(name, start, end)
+
+
+def parse(data: Any) -> list[Range]:
+    """Ranges from parsed selection JSON (new or single-range format)."""
+    if not isinstance(data, dict):
+        raise SelectionError("Selection must be a JSON object.")
+    if "ranges" in data:
+        if not isinstance(data["ranges"], list) or not data["ranges"]:
+            raise SelectionError("Selection 'ranges' must be a non-empty list.")
+        return [_range(entry, idx) for idx, entry in enumerate(data["ranges"], start=1)]
+    return [_range(data, 1)]
+
+
+def load(path: Path) -> list[Range]:
+    if not path.exists():
+        raise SelectionError(f"Selection file not found: {path}")
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError) as exc:
+        raise SelectionError(f"Invalid selection file: {path}") from exc
+    return parse(data)
+
+
+def to_dict(ranges: Iterable[Range], file_name: str = "") -> dict:
+    ranges = list(ranges)
+    body: dict = {"file": file_name, "ranges": [item.to_dict() for item in ranges]}
+    if ranges:
+        body["start"] = ranges[0].start
+        body["end"] = ranges[0].end
+    return body
+
+
+def output_name(index: int, item: Range, suffix: str) -> str:
+    """``01_intro.wav``-style name: ordered and filesystem-safe."""
+    slug = _UNSAFE_RE.sub("_", item.name).strip("._") or DEFAULT_NAME
+    return f"{index:02d}_{slug}{suffix}"
+
+
+def write_manifest(directory: Path, source: Path, outputs: list[tuple[Range, Path]]) -> Path:
+    """Write ``manifest.json`` listing every rendered range next to the outputs."""
+    manifest = {
+        "source": str(source),
+        "created": time.time(),
+        "outputs": [
+            {**item.to_dict(), "duration": round(item.duration, 6), "file": path.name}
+            for item, path in outputs
+        ],
+    }
+    path = directory / "manifest.json"
+    fsutil.write_text(path, json.dumps(manifest, indent=2))
+    return path
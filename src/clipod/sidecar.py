@@ -0,0 +1,92 @@
+"""Per-file NumPy caches stored next to the audio they describe.
+
+Each cache is a ``.<name>.<suffix>.npz`` sidecar stamped with the source's
+mtime/size and the cache's format version, so edited files and format changes
+both trigger a rebuild. Results are also memoised in process.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Generic, Mapping, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+_STAMP_KEY = "_sidecar"
+
+
+class SidecarCache(Generic[T]):
+    """Compute-once cache of ``compute(audio)`` kept in an ``.npz`` sidecar.
+
+    ``encode`` turns a result into named arrays and ``decode`` rebuilds it from
+    the loaded arrays; bump ``version`` whenever either changes.
+    """
+
+    def __init__(
+        self,
+        suffix: str,
+        version: int,
+        compute: Callable[[Path], T],
+        encode: Callable[[T], dict[str, np.ndarray]],
+        decode: Callable[[Mapping[str, np.ndarray]], Optional[T]],
+    ) -> None:
+        self.suffix = suffix
+        self.version = version
+        self._compute = compute
+        self._encode = encode
+        self._decode = decode
+        self._memo: dict[Path, tuple[tuple[int, int], T]] = {}
+        self._memo_lock = threading.Lock()
+        self._path_locks: dict[Path, threading.Lock] = {}
+
+    def path(self, audio: Path) -> Path:
+        return audio.with_name(f".{audio.name}.{self.suffix}.npz")
+
+    def get(self, audio: Path) -> T:
+        """Return the result for ``audio``, recomputing when mtime/size or the version changed."""
+        audio = Path(audio).resolve()
+        with self._memo_lock:
+            lock = self._path_locks.setdefault(audio, threading.Lock())
+        with lock:
+            stamp = _stamp(audio)
+            cached = self._memo.get(audio)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            target = self.path(audio)
+            result = self._load(target, stamp)
+            if result is None:
+                result = self._compute(audio)
+                self._save(target, result, stamp)
+            with self._memo_lock:
+                self._memo[audio] = (stamp, result)
+            return result
+
+    def _save(self, path: Path, result: T, stamp: tuple[int, int]) -> None:
+        arrays = self._encode(result)
+        arrays[_STAMP_KEY] = np.array([stamp[0], stamp[1], self.version], dtype=np.int64)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as handle:
+                np.savez(handle, **arrays)
+            tmp_path.replace(path)
+        except OSError:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _load(self, path: Path, stamp: tuple[int, int]) -> Optional[T]:
+        try:
+            with np.load(path) as data:
+                saved = data[_STAMP_KEY]
+                if [int(value) for value in saved] != [stamp[0], stamp[1], self.version]:
+                    return None
+                return self._decode(data)
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def _stamp(audio: Path) -> tuple[int, int]:
+    stat = audio.stat()
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,405 @@
+"""WAV/RF64 header parsing and incremental writing helpers."""
+from __future__ import annotations
+
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_RIFF_LIMIT = 0xFFFFFFFF
+# A JUNK chunk of this size is reserved by streaming writers so the header can
+# be rewritten in place as RF64 once the data outgrows the 4 GiB RIFF limit.
+_DS64_CHUNK_SIZE = 28
+
+
+class WavError(ValueError):
+    """Unsupported or malformed WAV file."""
+
+
+@dataclass(frozen=True)
+class WavInfo:
+    path: Path
+    sample_rate: int
+    channels: int
+    sample_width: int
+    format_tag: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.block_align
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def same_format(self, other: "WavInfo") -> bool:
+        return (
+            self.sample_rate == other.sample_rate
+            and self.channels == other.channels
+            and self.sample_width == other.sample_width
+            and self.format_tag == other.format_tag
+        )
+
+    def frame_offset(self, frame: int) -> int:
+        """Absolute byte offset of ``frame`` within the file."""
+        frame = max(0, min(frame, self.frames))
+        return self.data_offset + frame * self.block_align
+
+
+def read_info(path: Path) -> WavInfo:
+    """Parse the RIFF/RF64 header of ``path`` without reading sample data."""
+    try:
+        handle = open(path, "rb")
+    except OSError as exc:
+        raise WavError(f"Cannot open WAV file: {path}") from exc
+    with handle:
+        file_size = os.fstat(handle.fileno()).st_size
+        head = handle.read(12)
+        if len(head) < 12 or head[8:12] != b"WAVE" or head[:4] not in (b"RIFF", b"RF64"):
+            raise WavError(f"Not a WAV file: {path}")
+        is_rf64 = head[:4] == b"RF64"
+        ds64_data_size: int | None = None
+        fmt: tuple[int, int, int, int] | None = None
+        while True:
+            chunk = handle.read(8)
+            if len(chunk) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"ds64":
+                payload = handle.read(chunk_size)
+                if len(payload) >= 16:
+                    ds64_data_size = struct.unpack("<Q", payload[8:16])[0]
+            elif chunk_id == b"fmt ":
+                payload = handle.read(chunk_size)
+                if len(payload) < 16:
+                    raise WavError(f"Truncated fmt chunk: {path}")
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", payload[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(payload) >= 26:
+                    format_tag = struct.unpack("<H", payload[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise WavError(f"data chunk before fmt chunk: {path}")
+                data_offset = handle.tell()
+                if is_rf64 and chunk_size == _RIFF_LIMIT and ds64_data_size is not None:
+                    data_size = ds64_data_size
+                else:
+                    data_size = chunk_size
+                # Streaming writers (and crashed recordings) can leave a stale size.
+                data_size = min(data_size, file_size - data_offset)
+                format_tag, channels, sample_rate, bits = fmt
+                if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+                    raise WavError(f"Unsupported WAV encoding 0x{format_tag:04x}: {path}")
+                if channels < 1 or sample_rate < 1 or bits % 8:
+                    raise WavError(f"Unsupported WAV layout: {path}")
+                return WavInfo(
+                    path=Path(path),
+                    sample_rate=sample_rate,
+                    channels=channels,
+                    sample_width=bits // 8,
+                    format_tag=format_tag,
+                    data_offset=data_offset,
+                    data_size=data_size,
+                )
+            else:
+                handle.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+                continue
+            if chunk_size & 1:
+                handle.seek(1, os.SEEK_CUR)
+    raise WavError(f"Missing data chunk: {path}")
+
+
+def probe(path: Path) -> WavInfo | None:
+    """Return header info for PCM/float WAV files, ``None`` for anything else."""
+    try:
+        return read_info(path)
+    except WavError:
+        return None
+
+
+def build_header(
+    sample_rate: int,
+    channels: int,
+    sample_width: int,
+    format_tag: int = WAVE_FORMAT_PCM,
+    data_size: int = 0,
+    reserve_ds64: bool = False,
+) -> bytes:
+    """Build a canonical WAV header for ``data_size`` bytes of sample data.
+
+    With ``reserve_ds64`` the header always carries a 36-byte JUNK/ds64 chunk, so
+    its length does not change when the data later crosses the RIFF size limit.
+    """
+    block_align = channels * sample_width
+    fmt = struct.pack(
+        "<HHIIHH",
+        format_tag,
+        channels,
+        sample_rate,
+        sample_rate * block_align,
+        block_align,
+        sample_width * 8,
+    )
+    fmt_chunk = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    large = 4 + (8 + _DS64_CHUNK_SIZE) + len(fmt_chunk) + 8 + data_size > _RIFF_LIMIT
+    if large:
+        riff_size = 4 + (8 + _DS64_CHUNK_SIZE) + len(fmt_chunk) + 8 + data_size
+        ds64 = struct.pack("<QQQI", riff_size, data_size, data_size // block_align, 0)
+        return (
+            b"RF64"
+            + struct.pack("<I", _RIFF_LIMIT)
+            + b"WAVE"
+            + b"ds64"
+            + struct.pack("<I", len(ds64))
+            + ds64
+            + fmt_chunk
+            + b"data"
+            + struct.pack("<I", _RIFF_LIMIT)
+        )
+    junk = b""
+    if reserve_ds64:
+        junk = b"JUNK" + struct.pack("<I", _DS64_CHUNK_SIZE) + bytes(_DS64_CHUNK_SIZE)
+    riff_size = 4 + len(junk) + len(fmt_chunk) + 8 + data_size
+    return (
+        b"RIFF"
+        + struct.pack("<I", riff_size)
+        + b"WAVE"
+        + junk
+        + fmt_chunk
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def header_for(info: WavInfo, data_size: int) -> bytes:
+    return build_header(info.sample_rate, info.channels, info.sample_width, info.format_tag, data_size)
+
+
+class WavWriter:
+    """Append-only WAV writer whose header can be refreshed while recording."""
+
+    def __init__(
+        self,
+        path: Path,
+        sample_rate: int,
+        channels: int,
+        sample_width: int = 2,
+        format_tag: int = WAVE_FORMAT_PCM,
+    ) -> None:
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.format_tag = format_tag
+        self.data_size = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle: BinaryIO = open(self.path, "wb")
+        self._handle.write(self._header())
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.block_align
+
+    def _header(self) -> bytes:
+        return build_header(
+            self.sample_rate,
+            self.channels,
+            self.sample_width,
+            self.format_tag,
+            self.data_size,
+            reserve_ds64=True,
+        )
+
+    def fileno(self) -> int:
+        return self._handle.fileno()
+
+    def write(self, data) -> None:
+        """Append raw interleaved sample bytes (or a NumPy array in file dtype)."""
+        view = memoryview(data).cast("B")
+        self._handle.write(view)
+        self.data_size += len(view)
+
+    def copy_from(self, src_fd: int, offset: int, count: int) -> None:
+        """Append ``count`` bytes of ``src_fd`` starting at ``offset`` in-kernel."""
+        self._handle.flush()
+        copy_range(src_fd, self._handle.fileno(), offset, count)
+        self._handle.seek(0, os.SEEK_END)
+        self.data_size += count
+
+    def update_header(self, sync: bool = False) -> None:
+        """Rewrite the header for the data written so far."""
+        self._handle.flush()
+        header = self._header()
+        os.pwrite(self._handle.fileno(), header, 0)
+        if sync:
+            os.fsync(self._handle.fileno())
+
+    def close(self) -> None:
+        if self._handle.closed:
+            return
+        self.update_header()
+        self._handle.close()
+
+    def __enter__(self) -> "WavWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def numpy_dtype(info: WavInfo) -> str:
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        if info.sample_width not in (4, 8):
+            raise WavError(f"Unsupported float width: {info.sample_width * 8} bits")
+        return f"<f{info.sample_width}"
+    if info.sample_width == 1:
+        return "u1"
+    if info.sample_width in (2, 4):
+        return f"<i{info.sample_width}"
+    raise WavError(f"Unsupported PCM width: {info.sample_width * 8} bits")
+
+
+def memmap(info: WavInfo):
+    """Memory-map the sample data of ``info`` as a ``(frames, channels)`` array."""
+    import numpy as np
+
+    if info.sample_width == 3:
+        raw = np.memmap(info.path, dtype="u1", mode="r", offset=info.data_offset, shape=(info.frames * info.block_align,))
+        return raw.reshape(info.frames, info.channels, 3)
+    return np.memmap(
+        info.path,
+        dtype=numpy_dtype(info),
+        mode="r",
+        offset=info.data_offset,
+        shape=(info.frames, info.channels),
+    )
+
+
+def to_float(info: WavInfo, block):
+    """Convert a slice of :func:`memmap` output to float32 in ``[-1, 1]``."""
+    import numpy as np
+
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return np.asarray(block, dtype=np.float32)
+    if info.sample_width == 3:
+        data = np.asarray(block, dtype=np.int32)
+        value = data[..., 0] | (data[..., 1] << 8) | (data[..., 2] << 16)
+        value = np.where(value & 0x800000, value - 0x1000000, value)
+        return value.astype(np.float32) / float(1 << 23)
+    if info.sample_width == 1:
+        return (np.asarray(block, dtype=np.float32) - 128.0) / 128.0
+    scale = float(1 << (info.sample_width * 8 - 1))
+    return np.asarray(block, dtype=np.float32) / scale
+
+
+def from_float(info: WavInfo, block):
+    """Convert float samples back to the sample format described by ``info``."""
+    import numpy as np
+
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return np.ascontiguousarray(block, dtype=numpy_dtype(info))
+    clipped = np.clip(block, -1.0, 1.0)
+    if info.sample_width == 3:
+        value = np.round(clipped * ((1 << 23) - 1)).astype("<i4")
+        return np.ascontiguousarray(value.view("u1").reshape(*value.shape, 4)[..., :3])
+    if info.sample_width == 1:
+        return np.round(clipped * 127.0 + 128.0).astype("u1")
+    peak = float((1 << (info.sample_width * 8 - 1)) - 1)
+    return np.round(clipped * peak).astype(numpy_dtype(info))
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """Append ``count`` bytes from ``src_fd`` at ``offset`` to ``dst_fd``.
+
+    Uses ``os.copy_file_range`` (in-kernel, reflink-capable) when available and
+    falls back to ``os.sendfile`` and finally plain reads.
+    """
+    remaining = count
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        try:
+            while remaining > 0:
+                copied = copy_file_range(src_fd, dst_fd, remaining, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+    sendfile = getattr(os, "sendfile", None)
+    if sendfile is not None:
+        try:
+            while remaining > 0:
+                sent = sendfile(dst_fd, src_fd, offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+    while remaining > 0:
+        chunk = os.pread(src_fd, min(remaining, 1 << 20), offset)
+        if not chunk:
+            raise WavError("Unexpected end of file while copying sample data")
+        os.write(dst_fd, chunk)
+        offset += len(chunk)
+        remaining -= len(chunk)
+
+
+def extract(info: WavInfo, output: Path, first: int, frames: int) -> int:
+    """Write frames ``[first, first + frames)`` of ``info`` to ``output`` without decoding.
+
+    The sample bytes are copied in-kernel (:func:`copy_range`) behind a fresh
+    header; returns the number of frames written.
+    """
+    first = max(0, min(first, info.frames))
+    frames = max(0, min(frames, info.frames - first))
+    with open(info.path, "rb") as source, open(output, "wb") as handle:
+        handle.write(header_for(info, frames * info.block_align))
+        handle.flush()
+        copy_range(source.fileno(), handle.fileno(), info.frame_offset(first), frames * info.block_align)
+    return frames
+
+
+def concat(infos: list[WavInfo], output: Path) -> int:
+    """Join the sample data of same-format ``infos`` under one header; returns frames written."""
+    first = infos[0]
+    for info in infos[1:]:
+        if not info.same_format(first):
+            raise WavError(f"Sample format of {info.path} differs from {first.path}")
+    data_size = sum(info.frames * info.block_align for info in infos)
+    with open(output, "wb") as handle:
+        handle.write(header_for(first, data_size))
+        handle.flush()
+        for info in infos:
+            with open(info.path, "rb") as source:
+                copy_range(source.fileno(), handle.fileno(), info.data_offset, info.frames * info.block_align)
+    return data_size // first.block_align
+
+
+def ffmpeg_codec(info: WavInfo) -> str:
+    """ffmpeg PCM encoder name producing the sample format of ``info``."""
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return f"pcm_f{info.sample_width * 8}le"
+    if info.sample_width == 1:
+        return "pcm_u8"
+    return f"pcm_s{info.sample_width * 8}le"
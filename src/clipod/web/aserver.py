@@ -0,0 +1,595 @@
+"""Asyncio front end for the editor API (``clipod web --async``).
+
+Audio streaming (``/api/auto``), peaks, job events, ``/api/mix`` and the routes
+that take long request bodies (uploads, punch-ins, capture chunks) run on the
+event loop: files go out with ``loop.sendfile``, bodies are parsed as they
+arrive and ffmpeg runs through ``asyncio.create_subprocess_exec``, so a slow
+client or a long conversion never holds a thread. Every other route is bridged
+over a socket pair to the threaded ``RequestHandler`` on a bounded pool, which
+keeps route behaviour identical for the short requests left there.
+"""
+from __future__ import annotations
+
+import asyncio
+import html
+import http.client
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import DEFAULT_ERROR_CONTENT_TYPE, DEFAULT_ERROR_MESSAGE
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from clipod import bgm, edl, fsutil, metrics
+from clipod.bgm import LayoutError, mix_bgm
+from clipod.cache import RenderCache
+from clipod.web import capture, jobs, multipart, projects, server
+from clipod.web.capture import CaptureError
+from clipod.web.server import RouteError
+
+CHUNK_SIZE = 1 << 16
+MAX_HEADER_BYTES = 64 * 1024
+BRIDGE_WORKERS = 32
+# Upper bound on draining an unread request body after a bridged reply.
+BRIDGE_DRAIN_SECONDS = 5.0
+JOB_POLL_SECONDS = 0.25
+
+
+class Request:
+    def __init__(self, method: str, target: str, version: str, headers: http.client.HTTPMessage) -> None:
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        parsed = urlparse(target)
+        self.path = parsed.path
+        self.params = {
+            key: unquote(value) for key, value in (item.split("=", 1) for item in parsed.query.split("&") if "=" in item)
+        }
+
+    @property
+    def project_id(self) -> str:
+        return self.params.get("project") or self.headers.get("X-Clipod-Project", "")
+
+    @property
+    def content_length(self) -> int:
+        try:
+            return max(0, int(self.headers.get("Content-Length", "0")))
+        except ValueError:
+            return 0
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[tuple[Request, bytes]]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    request_line, _, header_block = head.partition(b"\r\n")
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        return None
+    headers = http.client.parse_headers(io.BytesIO(header_block))
+    return Request(method, target, version, headers), head
+
+
+async def _send(
+    writer: asyncio.StreamWriter,
+    status: int,
+    headers: list[tuple[str, str]],
+    body: bytes = b"",
+) -> None:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", "Connection: close"]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+    body = json.dumps(payload).encode("utf-8")
+    await _send(writer, status, [("Content-Type", "application/json"), ("Content-Length", str(len(body)))], body)
+
+
+async def _send_error(writer: asyncio.StreamWriter, code: int, message: str) -> None:
+    # Same body as BaseHTTPRequestHandler.send_error so clients see one format.
+    fields = {"code": code, "message": html.escape(message), "explain": HTTPStatus(code).description}
+    body = (DEFAULT_ERROR_MESSAGE % fields).encode("utf-8", "replace")
+    await _send(writer, code, [("Content-Type", DEFAULT_ERROR_CONTENT_TYPE), ("Content-Length", str(len(body)))], body)
+
+
+class _MeteredWriter:
+    """StreamWriter proxy recording the response status and bytes for metrics."""
+
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+        self.status: Optional[int] = None
+        self.bytes_out = 0
+
+    def write(self, data: bytes) -> None:
+        if self.status is None and data.startswith(b"HTTP/"):
+            self.status = int(data[9:12])
+        self.bytes_out += len(data)
+        self._writer.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self._writer, name)
+
+
+class AsyncServer:
+    def __init__(self, max_bridge_workers: int = BRIDGE_WORKERS) -> None:
+        self._bridge_pool = ThreadPoolExecutor(max_workers=max_bridge_workers, thread_name_prefix="clipod-bridge")
+        self._bridge_server = SimpleNamespace(server_address=("", 0))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            parsed = await _read_request(reader)
+            if parsed is None:
+                return
+            request, head = parsed
+            route = None
+            if request.method in ("GET", "HEAD"):
+                route = {"/api/auto": self._auto, "/api/peaks": self._peaks}.get(request.path)
+                if request.path.startswith("/api/jobs/") and request.path.endswith("/events"):
+                    route = self._job_events
+            elif request.method == "POST":
+                route = {
+                    "/api/mix": self._mix,
+                    "/api/upload": self._upload,
+                    "/api/punch": self._punch,
+                    "/api/record/chunk": self._record_chunk,
+                    "/api/bgm/upload": self._bgm_upload,
+                }.get(request.path)
+            if route is None:
+                # The bridged RequestHandler records its own metrics.
+                await self._bridge(request, head, reader, writer)
+                return
+            metered = _MeteredWriter(writer)
+            started = time.perf_counter()
+            try:
+                await route(request, reader, metered)
+            except RouteError as exc:
+                await _send_error(metered, exc.code, exc.message)
+            finally:
+                if metered.status is not None:
+                    metrics.registry.observe_request(
+                        metrics.route_label(request.path),
+                        request.method,
+                        metered.status,
+                        time.perf_counter() - started,
+                        request.content_length if request.method == "POST" else 0,
+                        metered.bytes_out,
+                    )
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _auto(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        project = server._lookup_project(request.project_id)
+        target = await asyncio.to_thread(server._auto_target, project, request.params.get("file", ""))
+        try:
+            handle = open(target, "rb")
+        except OSError as exc:
+            raise RouteError(500, "Failed to read audio file") from exc
+        with handle:
+            status, headers, offset, count = server._plan_audio_response(
+                project, target, os.fstat(handle.fileno()), request.headers
+            )
+            await _send(writer, status, headers)
+            if request.method == "HEAD" or count == 0 or status not in (200, 206):
+                return
+            # Zero-copy os.sendfile on plain sockets; asyncio falls back to reads.
+            sent = await asyncio.get_running_loop().sendfile(writer.transport, handle, offset, count)
+            writer.bytes_out += sent
+
+    async def _peaks(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        project = server._lookup_project(request.project_id)
+        target = await asyncio.to_thread(server._auto_target, project, request.params.get("file", ""))
+        data = await asyncio.to_thread(server._peaks_body, project, target, request.params)
+        headers = [
+            ("Content-Type", "application/json"),
+            ("Cache-Control", "no-store"),
+            ("Content-Length", str(len(data))),
+        ]
+        await _send(writer, 200, headers, b"" if request.method == "HEAD" else data)
+
+    async def _job_events(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        job = jobs.manager.get(request.path[len("/api/jobs/") : -len("/events")])
+        if job is None:
+            raise RouteError(404, "Job not found")
+        await _send(writer, 200, [("Content-Type", "text/event-stream"), ("Cache-Control", "no-store")])
+        version = -1
+        idle = 0.0
+        while True:
+            if job.version != version:
+                version = job.version
+                state = job.to_dict()
+                writer.write(f"event: status\ndata: {json.dumps(state)}\n\n".encode("utf-8"))
+                await writer.drain()
+                if state["status"] in jobs.TERMINAL:
+                    return
+                idle = 0.0
+            elif idle >= server.JOB_KEEPALIVE_SECONDS:
+                writer.write(b": keep-alive\n\n")
+                await writer.drain()
+                idle = 0.0
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            idle += JOB_POLL_SECONDS
+
+    async def _mix(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if request.content_length > server.MAX_FIELD_BYTES:
+            raise RouteError(413, "Mix request too large")
+        payload = await reader.readexactly(request.content_length)
+        project = server._lookup_project(request.project_id)
+        try:
+            await asyncio.to_thread(project.render_pending)
+        except (server.EdlError, OSError) as exc:
+            raise RouteError(500, f"Failed to render edits: {exc}") from exc
+        try:
+            data = json.loads(payload)
+            output_name = str(data.get("output", "mixed.wav"))
+            engine = str(data.get("engine", "ffmpeg"))
+        except Exception as exc:
+            raise RouteError(400, "Invalid JSON payload") from exc
+        if data.get("background"):
+            job = jobs.manager.submit("mix", lambda job: server._mix_audio(project, data, job))
+            await _send_json(writer, 202, {"status": "accepted", "job": job.id, "events": f"/api/jobs/{job.id}/events"})
+            return
+        # Held across awaits, so taken on a worker thread and released explicitly.
+        await _acquire_read(project.lock)
+        try:
+            result = await self._mix_rendered(project, data, output_name, engine)
+        finally:
+            project.lock.release_read()
+        await _send_json(writer, 200, result)
+
+    async def _mix_rendered(self, project: projects.Project, data: dict, output_name: str, engine: str) -> dict:
+        auto_file = project.auto_file
+        if not auto_file or not auto_file.exists():
+            raise RouteError(404, "Auto audio not found")
+        layout = server._mix_layout(project, bool(data.get("use_bgm", True)))
+        output_path = auto_file.with_name(Path(output_name).name)
+        main_path = auto_file
+        cleanup_path: Optional[Path] = None
+        try:
+            if main_path.suffix.lower() != ".wav":
+                cleanup_path = auto_file.with_name(f"{auto_file.stem}_export.wav")
+                await _run_ffmpeg(["ffmpeg", "-y", "-i", str(auto_file), str(cleanup_path)], "convert")
+                main_path = cleanup_path
+            if engine != "ffmpeg" or not layout.get("segments"):
+                # NumPy mixing and the no-BGM copy are in-process work.
+                cached = await asyncio.to_thread(
+                    mix_bgm,
+                    main=main_path,
+                    layout=layout,
+                    output=output_path,
+                    base_dir=project.base_dir,
+                    engine=engine,
+                    render_cache=RenderCache.default(),
+                )
+            else:
+                cached = await self._mix_ffmpeg(main_path, layout, output_path, project.base_dir)
+        except LayoutError as exc:
+            raise RouteError(400, str(exc)) from exc
+        except FileNotFoundError as exc:
+            raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise RouteError(500, f"ffmpeg mix failed with exit code {exc.returncode}") from exc
+        except OSError as exc:
+            raise RouteError(500, f"Failed to mix audio: {exc}") from exc
+        finally:
+            if cleanup_path is not None:
+                cleanup_path.unlink(missing_ok=True)
+        return {"status": "ok", "output": str(output_path.name), "cached": cached}
+
+    async def _mix_ffmpeg(self, main: Path, layout: dict, output: Path, base_dir: Path) -> bool:
+        """Render the mix with an async ffmpeg; returns ``True`` on a render-cache hit."""
+        render_cache = RenderCache.default()
+        render_key = await asyncio.to_thread(bgm.mix_cache_key, main, layout, output, base_dir)
+        if await asyncio.to_thread(render_cache.lookup, render_key, output):
+            return True
+        tmp_path = fsutil.temp_path(output)
+        # May analyse the voice for a ducking envelope, so it runs off the loop.
+        cmd = await asyncio.to_thread(bgm.build_render_command, main, layout, tmp_path, base_dir=base_dir)
+        try:
+            await _run_ffmpeg(cmd, "mix")
+            await asyncio.to_thread(fsutil.commit, tmp_path, output)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        await asyncio.to_thread(render_cache.store, render_key, output)
+        return False
+
+    async def _upload(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        project = server._lookup_project(request.project_id)
+        if not project.auto_file:
+            raise RouteError(500, "Auto file path not configured")
+        form = await _read_multipart(request, reader)
+        upload = form.files.get("file")
+        if upload is None:
+            form.cleanup()
+            raise RouteError(400, "No file field found")
+        if request.params.get("background") == "1":
+
+            def install(job: jobs.Job) -> dict:
+                try:
+                    return server._install_upload(project, upload, job)
+                finally:
+                    form.cleanup()
+
+            job = jobs.manager.submit("upload", install)
+            await _send_json(writer, 202, {"status": "accepted", "job": job.id, "events": f"/api/jobs/{job.id}/events"})
+            return
+        try:
+            result = await _install_upload(project, upload)
+        finally:
+            form.cleanup()
+        await _send_json(writer, 200, result)
+
+    async def _punch(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        project = server._lookup_project(request.project_id)
+        if not project.has_audio():
+            raise RouteError(404, "Auto audio not found")
+        form = await _read_multipart(request, reader)
+        take: Optional[Path] = None
+        try:
+            punch = form.files.get("file")
+            start_text = form.field_text("start")
+            end_text = form.field_text("end")
+            if punch is None or start_text is None or end_text is None:
+                raise RouteError(400, "Missing punch fields")
+            try:
+                start = float(start_text)
+                end = float(end_text)
+            except ValueError as exc:
+                raise RouteError(400, "Invalid punch range") from exc
+            if start < 0 or end < start:
+                raise RouteError(400, f"Invalid punch range: start={start}, end={end}")
+            if not punch.size:
+                raise RouteError(400, "Empty punch audio")
+            # Decode into the project format up front so the locked import only links the take.
+            fmt = await asyncio.to_thread(server._edit_format, project)
+            source = punch.path
+            decoded = punch.path.with_suffix(".take.wav")
+            cmd = await asyncio.to_thread(edl.decode_command, source, decoded, fmt)
+            if cmd is not None:
+                take = decoded
+                await _run_ffmpeg(cmd, "punch")
+                source = decoded
+            await asyncio.to_thread(server._apply_punch, project, source, start, end)
+        finally:
+            form.cleanup()
+            if take is not None:
+                take.unlink(missing_ok=True)
+        await _send_json(writer, 200, {"status": "ok"})
+
+    async def _record_chunk(
+        self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        session = capture.get(request.params.get("session", ""))
+        if request.content_length > capture.MAX_CHUNK_BYTES:
+            raise RouteError(413, "Capture chunk too large")
+        chunk = await reader.readexactly(request.content_length)
+        if session is None:
+            raise RouteError(404, "Capture session not found")
+        try:
+            # Feeding the decoder may block on its stdin pipe.
+            await asyncio.to_thread(session.append, int(request.params.get("seq", "-1")), chunk)
+        except (CaptureError, ValueError) as exc:
+            raise RouteError(409, str(exc)) from exc
+        await _send_json(writer, 200, {"status": "ok", "decoded": round(session.decoded_seconds, 3)})
+
+    async def _bgm_upload(self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        project = server._lookup_project(request.project_id)
+        if not project.auto_file or not project.auto_file.exists():
+            raise RouteError(404, "Auto audio not found")
+        name = unquote(request.headers.get("X-File-Name", ""))
+        if not name:
+            raise RouteError(400, "Missing X-File-Name header")
+        safe_name = Path(name).name
+        if not safe_name:
+            raise RouteError(400, "Invalid file name")
+        if request.content_length > server.MAX_UPLOAD_BYTES:
+            raise RouteError(413, f"Upload exceeds {server.MAX_UPLOAD_BYTES} bytes")
+        project.bgm_dir.mkdir(parents=True, exist_ok=True)
+        target = project.bgm_dir / safe_name
+        temp_target = project.bgm_dir / f".{safe_name}.upload"
+        try:
+            # Stream without the lock; only the swap excludes readers.
+            with open(temp_target, "wb") as handle:
+                remaining = request.content_length
+                while remaining > 0:
+                    chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise RouteError(400, "Request body ended early")
+                    remaining -= len(chunk)
+                    handle.write(chunk)
+            await asyncio.to_thread(_install_locked, project, temp_target, target)
+        except OSError as exc:
+            raise RouteError(500, f"Failed to save BGM file: {exc}") from exc
+        finally:
+            temp_target.unlink(missing_ok=True)
+        await _send_json(writer, 200, {"status": "ok", "file": str(target.relative_to(project.base_dir))})
+
+    async def _bridge(
+        self,
+        request: Request,
+        head: bytes,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """Serve the request with ``RequestHandler`` on a worker thread via a socket pair."""
+        ours, theirs = socket.socketpair()
+        loop = asyncio.get_running_loop()
+        handled = loop.run_in_executor(self._bridge_pool, self._serve_bridged, theirs)
+        bridge_reader, bridge_writer = await asyncio.open_connection(sock=ours, limit=CHUNK_SIZE)
+
+        async def upload() -> None:
+            bridge_writer.write(head)
+            remaining = request.content_length
+            while remaining > 0:
+                chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                bridge_writer.write(chunk)
+                await bridge_writer.drain()
+            await bridge_writer.drain()
+
+        sender = asyncio.ensure_future(upload())
+        try:
+            while True:
+                chunk = await bridge_reader.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            # The handler may answer (e.g. 413) before reading the whole body.
+            sender.cancel()
+            try:
+                await sender
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+            bridge_writer.close()
+            await handled
+
+    def _serve_bridged(self, sock: socket.socket) -> None:
+        try:
+            server.RequestHandler(sock, ("bridge", 0), self._bridge_server)
+            # Closing with request bytes still unread resets the pair and drops the
+            # reply, so end the reply and drain the rest of the body first.
+            sock.shutdown(socket.SHUT_WR)
+            sock.settimeout(BRIDGE_DRAIN_SECONDS)
+            while sock.recv(CHUNK_SIZE):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def close(self) -> None:
+        self._bridge_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _read_multipart(request: Request, reader: asyncio.StreamReader) -> multipart.MultipartForm:
+    """Parse a multipart body as it arrives, streaming file parts to disk."""
+    content_type = request.headers.get("Content-Type", "")
+    if "multipart/form-data" not in content_type:
+        raise RouteError(400, "Expected multipart/form-data")
+    try:
+        parser = multipart.Parser(content_type, server.WORK_DIR, server.MAX_UPLOAD_BYTES, server.MAX_FIELD_BYTES)
+        try:
+            remaining = request.content_length
+            while remaining > 0 and not parser.done:
+                chunk = await reader.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise multipart.MultipartError("Request body ended early")
+                remaining -= len(chunk)
+                parser.feed(chunk)
+            return parser.close()
+        except BaseException:
+            parser.abort()
+            raise
+    except multipart.PayloadTooLarge as exc:
+        raise RouteError(413, str(exc)) from exc
+    except multipart.MultipartError as exc:
+        raise RouteError(400, str(exc)) from exc
+
+
+async def _install_upload(project: projects.Project, upload: multipart.FilePart) -> dict:
+    """Like ``server._install_upload``, but converts non-WAV uploads with an async ffmpeg first."""
+    filename = upload.filename or "upload.wav"
+    if server._upload_path(project.auto_file, filename).suffix.lower() == ".wav":
+        return await asyncio.to_thread(server._install_upload, project, upload)
+    converted = upload.path.with_suffix(".wav")
+    try:
+        await _run_ffmpeg(["ffmpeg", "-y", "-i", str(upload.path), str(converted)], "upload")
+        wav_upload = multipart.FilePart(upload.name, f"{Path(filename).stem}.wav", converted, converted.stat().st_size)
+        result = await asyncio.to_thread(server._install_upload, project, wav_upload)
+    finally:
+        converted.unlink(missing_ok=True)
+    return {**result, "file": filename}
+
+
+async def _acquire_read(lock: projects.RWLock) -> None:
+    """Take ``lock``'s read side on a worker thread, releasing it if the caller is cancelled meanwhile."""
+    acquiring = asyncio.ensure_future(asyncio.to_thread(lock.acquire_read))
+
+    def release(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            lock.release_read()
+
+    try:
+        await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # The worker still gets the lock after we stop waiting; hand it straight back.
+        acquiring.add_done_callback(release)
+        raise
+
+
+def _install_locked(project: projects.Project, source: Path, target: Path) -> None:
+    with project.lock.write():
+        fsutil.install(source, target)
+
+
+async def _run_ffmpeg(cmd: list[str], label: str) -> None:
+    started = time.perf_counter()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError as exc:
+        raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+    stderr = b""
+    try:
+        _, stderr = await proc.communicate()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        # asyncio's child watcher reaps the process, so its CPU time is unknown here.
+        metrics.registry.observe_ffmpeg(
+            label, cmd, time.perf_counter() - started, None, proc.returncode, stderr.decode("utf-8", errors="replace")
+        )
+    if proc.returncode:
+        raise RouteError(500, f"ffmpeg {label} failed with exit code {proc.returncode}")
+
+
+async def serve(host: str = "", port: int = 8000, ready: Optional[asyncio.Event] = None) -> None:
+    app = AsyncServer()
+    listener = await asyncio.start_server(app.handle, host or None, port, limit=MAX_HEADER_BYTES)
+    try:
+        if ready is not None:
+            ready.set()
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        app.close()
+
+
+def main(port: int = 8000) -> None:
+    print(f"Serving (asyncio) on http://localhost:{port}", file=sys.stderr)
+    try:
+        asyncio.run(serve(port=port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Live capture sessions: browser recorder chunks are decoded as they arrive.
+
+Each session keeps the raw container bytes (``take.<ext>``) and a WAV
+(``take.wav``) that a long-running ffmpeg decoder appends to. The WAV header is
+rewritten periodically, so a crash mid-recording still leaves a playable take
+in the session directory. Sessions nobody has touched for
+:data:`IDLE_TIMEOUT_SECONDS` (a closed tab, a crashed client) are aborted by a
+background reaper, which stops their decoder and removes their files.
+"""
+from __future__ import annotations
+
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from clipod import wavfile
+
+MAX_CHUNK_BYTES = 16 * 1024 * 1024
+# Rewrite the WAV header roughly once per second of 48 kHz stereo audio.
+HEADER_INTERVAL_BYTES = 48000 * 2 * 2
+_READ_SIZE = 1 << 16
+# Sessions without a chunk for this long are aborted.
+IDLE_TIMEOUT_SECONDS = 300.0
+
+MIME_SUFFIXES = {
+    "audio/webm": ".webm",
+    "audio/ogg": ".ogg",
+    "audio/mp4": ".mp4",
+    "audio/mpeg": ".mp3",
+    "audio/wav": ".wav",
+}
+
+
+class CaptureError(ValueError):
+    """Invalid capture session operation."""
+
+
+def suffix_for(mime: str) -> str:
+    return MIME_SUFFIXES.get(mime.split(";", 1)[0].strip().lower(), ".webm")
+
+
+class CaptureSession:
+    def __init__(
+        self,
+        root: Path,
+        mode: str,
+        fmt: wavfile.WavInfo,
+        suffix: str = ".webm",
+        ffmpeg: str = "ffmpeg",
+        project_id: str = "",
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        # The project the take belongs to, whatever project the stop request names.
+        self.project_id = project_id
+        self.last_active = time.monotonic()
+        self.fmt = fmt
+        self.directory = root / self.id
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.raw_path = self.directory / f"take{suffix}"
+        self.wav_path = self.directory / "take.wav"
+        self.next_seq = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._raw = open(self.raw_path, "ab")
+        self._writer = wavfile.WavWriter(
+            self.wav_path, fmt.sample_rate, fmt.channels, fmt.sample_width, fmt.format_tag
+        )
+        raw_format = wavfile.ffmpeg_codec(fmt).removeprefix("pcm_")
+        self._log = open(self.directory / "ffmpeg.log", "wb")
+        self.cmd = [
+            ffmpeg,
+            "-v",
+            "error",
+            "-i",
+            "pipe:0",
+            "-f",
+            raw_format,
+            "-ac",
+            str(fmt.channels),
+            "-ar",
+            str(fmt.sample_rate),
+            "pipe:1",
+        ]
+        try:
+            self._proc = subprocess.Popen(
+                self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._log
+            )
+        except BaseException:
+            self._close_files()
+            raise
+        self._pump = threading.Thread(target=self._drain, name=f"capture-{self.id[:8]}", daemon=True)
+        self._pump.start()
+
+    @property
+    def decoded_seconds(self) -> float:
+        return self._writer.frames / self.fmt.sample_rate
+
+    def _drain(self) -> None:
+        assert self._proc.stdout is not None
+        since_header = 0
+        while True:
+            data = self._proc.stdout.read1(_READ_SIZE)
+            if not data:
+                break
+            self._writer.write(data)
+            since_header += len(data)
+            if since_header >= HEADER_INTERVAL_BYTES:
+                self._writer.update_header()
+                since_header = 0
+
+    def append(self, seq: int, data: bytes) -> None:
+        with self._lock:
+            if self._closed:
+                raise CaptureError("Capture session is closed")
+            if seq != self.next_seq:
+                raise CaptureError(f"Expected chunk {self.next_seq}, got {seq}")
+            self._raw.write(data)
+            self._raw.flush()
+            assert self._proc.stdin is not None
+            try:
+                self._proc.stdin.write(data)
+                self._proc.stdin.flush()
+            except BrokenPipeError as exc:
+                raise CaptureError("Decoder stopped accepting audio") from exc
+            self.next_seq += 1
+            self.last_active = time.monotonic()
+
+    def finish(self) -> wavfile.WavInfo:
+        """Flush the decoder and return the finished take."""
+        with self._lock:
+            if self._closed:
+                raise CaptureError("Capture session is closed")
+            self._closed = True
+            assert self._proc.stdin is not None
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._pump.join()
+            returncode = self._proc.wait()
+            self._close_files()
+        if returncode and not self._writer.frames:
+            raise subprocess.CalledProcessError(returncode, self.cmd)
+        return wavfile.read_info(self.wav_path)
+
+    def abort(self) -> None:
+        """Stop the decoder (if still running) and remove the session's files."""
+        with self._lock:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._pump.join()
+            if not self._closed:
+                self._closed = True
+                self._close_files()
+        self.discard()
+
+    def discard(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _close_files(self) -> None:
+        self._writer.close()
+        self._raw.close()
+        self._log.close()
+
+
+_sessions: dict[str, CaptureSession] = {}
+_sessions_lock = threading.Lock()
+_reaper: Optional[threading.Thread] = None
+
+
+def reap(max_idle: float = IDLE_TIMEOUT_SECONDS) -> int:
+    """Abort sessions idle for more than ``max_idle`` seconds; returns how many."""
+    cutoff = time.monotonic() - max_idle
+    with _sessions_lock:
+        stale = [session for session in _sessions.values() if session.last_active < cutoff]
+        for session in stale:
+            del _sessions[session.id]
+    for session in stale:
+        session.abort()
+    return len(stale)
+
+
+def _reap_forever() -> None:
+    while True:
+        time.sleep(IDLE_TIMEOUT_SECONDS / 4)
+        reap()
+
+
+def start(
+    root: Path, mode: str, fmt: wavfile.WavInfo, mime: str = "", ffmpeg: str = "ffmpeg", project_id: str = ""
+) -> CaptureSession:
+    global _reaper
+    session = CaptureSession(root, mode, fmt, suffix=suffix_for(mime), ffmpeg=ffmpeg, project_id=project_id)
+    with _sessions_lock:
+        _sessions[session.id] = session
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_forever, name="capture-reaper", daemon=True)
+            _reaper.start()
+    return session
+
+
+def get(session_id: str) -> Optional[CaptureSession]:
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+def pop(session_id: str) -> Optional[CaptureSession]:
+    with _sessions_lock:
+        return _sessions.pop(session_id, None)
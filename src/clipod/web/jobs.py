@@ -0,0 +1,208 @@
+"""Background jobs for long renders, with ffmpeg progress and cancellation.
+
+A job runs on a small managed thread pool. ffmpeg invocations go through
+:meth:`Job.run_ffmpeg`, which adds ``-progress pipe:1`` and turns the reported
+``out_time`` into a fraction and an ETA. Subscribers poll
+:meth:`Job.wait_for_change` (the SSE endpoint does), and :meth:`Job.cancel`
+kills the running subprocess.
+"""
+from __future__ import annotations
+
+import re
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from clipod import metrics
+
+MAX_WORKERS = 2
+# Finished jobs are kept this long so late subscribers still see the result.
+RETENTION_SECONDS = 3600.0
+TERMINAL = ("done", "failed", "cancelled")
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it was cancelled."""
+
+
+class Job:
+    def __init__(self, kind: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.progress: Optional[float] = None
+        self.eta: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.version = 0
+        self._changed = threading.Condition()
+        self._cancelled = threading.Event()
+        self._proc: Optional[subprocess.Popen] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": None if self.progress is None else round(self.progress, 4),
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def _update(self, **fields: Any) -> None:
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: float) -> int:
+        """Block until ``self.version`` differs from ``version`` (or timeout)."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+    def check_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def report(self, fraction: float) -> None:
+        """Record progress in ``[0, 1]`` and derive an ETA from elapsed time."""
+        self.check_cancelled()
+        fraction = min(1.0, max(0.0, fraction))
+        eta = None
+        if self.started and fraction > 0:
+            elapsed = time.time() - self.started
+            eta = elapsed * (1.0 - fraction) / fraction
+        self._update(progress=fraction, eta=eta)
+
+    def cancel(self) -> bool:
+        if self.status in TERMINAL:
+            return False
+        self._cancelled.set()
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        if self.status == "queued":
+            self._update(status="cancelled", finished=time.time())
+        return True
+
+    def run_ffmpeg(self, cmd: list[str], duration: Optional[float] = None) -> None:
+        """Run ffmpeg reporting progress; raises like ``subprocess.run(check=True)``.
+
+        ``duration`` is the expected output length in seconds; without it the
+        input ``Duration:`` line from ffmpeg's log is used.
+        """
+        self.check_cancelled()
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace"
+        )
+        self._proc = proc
+        total = [duration]
+        stderr_lines: list[str] = []
+
+        def read_stderr() -> None:
+            assert proc.stderr is not None
+            for line in proc.stderr:
+                stderr_lines.append(line)
+                if total[0] is None:
+                    match = _DURATION_RE.search(line)
+                    if match:
+                        hours, minutes, seconds = match.groups()
+                        total[0] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        reader = threading.Thread(target=read_stderr, daemon=True)
+        reader.start()
+        try:
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                key, _, value = line.strip().partition("=")
+                # out_time_us (and the misnamed out_time_ms) are microseconds.
+                if key in ("out_time_us", "out_time_ms") and total[0]:
+                    try:
+                        self.report(int(value) / 1_000_000 / total[0])
+                    except ValueError:
+                        pass
+                elif key == "progress" and value == "end":
+                    self.report(1.0)
+        except JobCancelled:
+            proc.kill()
+        finally:
+            returncode, cpu_seconds = metrics.wait(proc)
+            reader.join()
+            self._proc = None
+            metrics.registry.observe_ffmpeg(
+                self.kind, cmd, time.perf_counter() - started, cpu_seconds, returncode, "".join(stderr_lines)
+            )
+        self.check_cancelled()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd, stderr="".join(stderr_lines))
+
+
+class JobManager:
+    def __init__(self, max_workers: int = MAX_WORKERS) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clipod-job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, work: Callable[[Job], Optional[dict]]) -> Job:
+        """Queue ``work(job)``; its return value becomes ``job.result``.
+
+        Exceptions mark the job failed; ``RouteError``-like exceptions with a
+        ``message`` attribute contribute that message.
+        """
+        job = Job(kind)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[Job], Optional[dict]]) -> None:
+        if job.cancelled:
+            return
+        job._update(status="running", started=time.time())
+        try:
+            result = work(job)
+        except JobCancelled:
+            job._update(status="cancelled", finished=time.time(), eta=None)
+        except Exception as exc:  # surfaced to the client through the job status
+            message = getattr(exc, "message", None) or str(exc) or type(exc).__name__
+            status = "cancelled" if job.cancelled else "failed"
+            job._update(status=status, error=message, finished=time.time(), eta=None)
+        else:
+            job._update(status="done", result=result, progress=1.0, eta=0.0, finished=time.time())
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+manager = JobManager()
@@ -0,0 +1,275 @@
+"""Incremental multipart/form-data parser that streams file parts to disk."""
+from __future__ import annotations
+
+import email.message
+import email.utils
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Generator, Optional
+
+CHUNK_SIZE = 1 << 16
+_MAX_HEADER_BYTES = 16 * 1024
+
+
+class MultipartError(ValueError):
+    """Malformed multipart payload."""
+
+
+class PayloadTooLarge(MultipartError):
+    """A request body or part exceeded the configured limit."""
+
+
+@dataclass
+class FilePart:
+    name: str
+    filename: str
+    path: Path
+    size: int
+
+
+@dataclass
+class MultipartForm:
+    fields: dict[str, bytes] = field(default_factory=dict)
+    files: dict[str, FilePart] = field(default_factory=dict)
+
+    def field_text(self, name: str) -> Optional[str]:
+        value = self.fields.get(name)
+        return None if value is None else value.decode("utf-8", errors="replace")
+
+    def cleanup(self) -> None:
+        """Remove temp files that were not moved elsewhere by the caller."""
+        for part in self.files.values():
+            try:
+                part.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def boundary_from(content_type: str) -> bytes:
+    message = email.message.Message()
+    message["content-type"] = content_type
+    boundary = message.get_param("boundary")
+    if not boundary or not isinstance(boundary, str):
+        raise MultipartError("Missing multipart boundary")
+    return boundary.encode("latin-1")
+
+
+def _disposition(header_block: bytes) -> tuple[Optional[str], Optional[str]]:
+    message = email.message.Message()
+    for line in header_block.decode("utf-8", errors="replace").split("\r\n"):
+        key, sep, value = line.partition(":")
+        if sep:
+            message[key.strip()] = value.strip()
+    if message.get("content-disposition") is None:
+        return None, None
+    name = message.get_param("name", header="content-disposition")
+    filename = message.get_param("filename", header="content-disposition")
+    return (
+        email.utils.collapse_rfc2231_value(name) if name else None,
+        email.utils.collapse_rfc2231_value(filename) if filename is not None else None,
+    )
+
+
+class _Body:
+    """Reads at most ``remaining`` bytes from the socket in fixed-size chunks."""
+
+    def __init__(self, rfile: BinaryIO, length: int) -> None:
+        self.rfile = rfile
+        self.remaining = length
+
+    def read(self) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        chunk = self.rfile.read(min(CHUNK_SIZE, self.remaining))
+        if not chunk:
+            raise MultipartError("Request body ended early")
+        self.remaining -= len(chunk)
+        return chunk
+
+    def drain(self) -> None:
+        while self.remaining > 0 and self.read():
+            pass
+
+
+def _parse(
+    boundary: bytes,
+    upload_dir: Path,
+    max_file_bytes: int,
+    max_field_bytes: int,
+    form: MultipartForm,
+) -> Generator[None, bytes, None]:
+    """Parser coroutine: receives body chunks through ``send`` (``b""`` once the body ends)."""
+    delimiter = b"--" + boundary
+    separator = b"\r\n" + delimiter
+    buffer = b""
+
+    def fill(minimum: int) -> Generator[None, bytes, bool]:
+        nonlocal buffer
+        while len(buffer) < minimum:
+            chunk = yield
+            if not chunk:
+                return False
+            buffer += chunk
+        return True
+
+    # Skip the preamble up to the first delimiter.
+    while True:
+        index = buffer.find(delimiter)
+        if index >= 0:
+            buffer = buffer[index + len(delimiter) :]
+            break
+        buffer = buffer[-len(delimiter) :]
+        if not (yield from fill(len(buffer) + 1)):
+            raise MultipartError("No multipart fields found")
+    while True:
+        yield from fill(2)
+        if buffer.startswith(b"--"):
+            break
+        if not buffer.startswith(b"\r\n"):
+            raise MultipartError("Malformed multipart delimiter")
+        buffer = buffer[2:]
+        while True:
+            end = buffer.find(b"\r\n\r\n")
+            if end >= 0:
+                break
+            if len(buffer) > _MAX_HEADER_BYTES:
+                raise MultipartError("Multipart headers too large")
+            if not (yield from fill(len(buffer) + 1)):
+                raise MultipartError("Truncated multipart headers")
+        name, filename = _disposition(buffer[:end])
+        buffer = buffer[end + 4 :]
+        sink: Optional[BinaryIO] = None
+        part: Optional[FilePart] = None
+        value = bytearray()
+        if name and filename is not None:
+            upload_dir.mkdir(parents=True, exist_ok=True)
+            suffix = Path(filename).suffix if filename else ""
+            fd, temp_name = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=upload_dir)
+            sink = os.fdopen(fd, "wb")
+            part = FilePart(name=name, filename=filename, path=Path(temp_name), size=0)
+            previous = form.files.pop(name, None)
+            if previous is not None:
+                previous.path.unlink(missing_ok=True)
+            form.files[name] = part
+        try:
+            while True:
+                index = buffer.find(separator)
+                if index >= 0:
+                    data, buffer = buffer[:index], buffer[index + len(separator) :]
+                else:
+                    # Keep a tail that might hold the start of the separator.
+                    keep = len(separator) - 1
+                    data, buffer = buffer[:-keep] if len(buffer) > keep else b"", buffer[-keep:]
+                if data:
+                    if part is not None and sink is not None:
+                        part.size += len(data)
+                        if part.size > max_file_bytes:
+                            raise PayloadTooLarge(f"Upload exceeds {max_file_bytes} bytes")
+                        sink.write(data)
+                    elif name:
+                        value += data
+                        if len(value) > max_field_bytes:
+                            raise PayloadTooLarge(f"Field '{name}' exceeds {max_field_bytes} bytes")
+                if index >= 0:
+                    break
+                if not (yield from fill(len(buffer) + 1)):
+                    raise MultipartError("Truncated multipart body")
+        finally:
+            if sink is not None:
+                sink.close()
+        if part is None and name:
+            form.fields[name] = bytes(value)
+
+
+class Parser:
+    """Push-mode parser for callers that receive the body in chunks (the asyncio server).
+
+    ``feed`` each chunk as it arrives, then ``close`` to get the form. File
+    parts are written to temp files inside ``upload_dir`` as data arrives.
+    """
+
+    def __init__(
+        self,
+        content_type: str,
+        upload_dir: Path,
+        max_file_bytes: int,
+        max_field_bytes: int = 64 * 1024,
+    ) -> None:
+        self.form = MultipartForm()
+        self.done = False
+        self._steps = _parse(boundary_from(content_type), upload_dir, max_file_bytes, max_field_bytes, self.form)
+        next(self._steps)
+
+    def _send(self, chunk: bytes) -> None:
+        try:
+            self._steps.send(chunk)
+        except StopIteration:
+            self.done = True
+        except BaseException:
+            self.form.cleanup()
+            raise
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next body chunk; data after the closing delimiter is ignored."""
+        if chunk and not self.done:
+            self._send(chunk)
+
+    def close(self) -> MultipartForm:
+        """Finish at the end of the body and return the parsed form."""
+        while not self.done:
+            self._send(b"")
+        if not self.form.fields and not self.form.files:
+            raise MultipartError("No multipart fields found")
+        return self.form
+
+    def abort(self) -> None:
+        """Stop parsing and remove any temp files written so far."""
+        self._steps.close()
+        self.form.cleanup()
+
+
+def parse(
+    rfile: BinaryIO,
+    content_type: str,
+    content_length: int,
+    upload_dir: Path,
+    max_file_bytes: int,
+    max_field_bytes: int = 64 * 1024,
+) -> MultipartForm:
+    """Parse a multipart body without holding more than a few chunks in memory.
+
+    File parts (those with a ``filename``) are written to temp files inside
+    ``upload_dir``; other parts are kept as bytes up to ``max_field_bytes``.
+    """
+    parser = Parser(content_type, upload_dir, max_file_bytes, max_field_bytes)
+    body = _Body(rfile, content_length)
+    try:
+        while not parser.done:
+            chunk = body.read()
+            if not chunk:
+                break
+            parser.feed(chunk)
+        form = parser.close()
+    except BaseException:
+        parser.abort()
+        raise
+    body.drain()
+    return form
+
+
+def stream_to_file(rfile: BinaryIO, content_length: int, target: Path, max_bytes: int) -> int:
+    """Copy a raw request body into ``target`` chunk by chunk."""
+    if content_length > max_bytes:
+        raise PayloadTooLarge(f"Upload exceeds {max_bytes} bytes")
+    body = _Body(rfile, content_length)
+    written = 0
+    with open(target, "wb") as handle:
+        while True:
+            chunk = body.read()
+            if not chunk:
+                break
+            handle.write(chunk)
+            written += len(chunk)
+    return written
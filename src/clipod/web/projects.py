@@ -0,0 +1,214 @@
+"""Project workspaces: per-episode editor state with a read/write lock.
+
+Each project owns its audio file, edit list, selection, BGM layout and BGM
+directory. Requests read under ``project.lock.read()`` and mutate under
+``project.lock.write()``, so edits within a project are serialized while work
+on different projects runs in parallel.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from clipod import edl, fsutil
+
+DEFAULT_ID = "default"
+_ID_RE = re.compile(r"^[0-9a-f]{12}$")
+
+
+class RWLock:
+    """Shared readers, exclusive writer; waiting writers block new readers.
+
+    The writing thread may re-enter ``write()`` or take ``read()`` while it
+    holds the write side. Upgrading a read lock to a write lock deadlocks, so
+    callers release the read side first. ``acquire_read``/``release_read``
+    exist for holders that cannot use a ``with`` block (the asyncio server).
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._writer is None and not self._waiting_writers)
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        if self._writer == threading.get_ident():
+            # The writer reads its own state without a second acquire.
+            yield
+            return
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._waiting_writers += 1
+                try:
+                    self._cond.wait_for(lambda: self._writer is None and not self._readers)
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
+class Project:
+    def __init__(
+        self,
+        project_id: str,
+        root: Path,
+        auto_file: Path,
+        base_dir: Path,
+        selection_file: Path,
+        bgm_layout_file: Path,
+        bgm_dir: Path,
+        auto_file_ready: bool = True,
+        name: str = "",
+    ) -> None:
+        self.id = project_id
+        self.name = name or project_id
+        self.root = root
+        self.auto_file = auto_file
+        self.auto_file_ready = auto_file_ready
+        # Relative BGM paths in layouts resolve against base_dir.
+        self.base_dir = base_dir
+        self.selection_file = selection_file
+        self.bgm_layout_file = bgm_layout_file
+        self.bgm_dir = bgm_dir
+        self.lock = RWLock()
+        # Incremented on every edit of auto_file; used as the /api/auto validator.
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        # Edit decision list for auto_file; delete/punch/undo only touch this
+        # list and the flat WAV is rendered lazily when something reads it.
+        self._edit_list: Optional[edl.EditList] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "audio": self.auto_file.name if self.has_audio() else None,
+            "generation": self.generation,
+        }
+
+    def edit_list(self) -> edl.EditList:
+        """Edit list for auto_file, started from the current file on first edit.
+
+        Callers hold the write lock.
+        """
+        if self._edit_list is None or self._edit_list.audio != self.auto_file:
+            self._edit_list = edl.open_for(self.auto_file)
+            self.auto_file = self._edit_list.audio
+        return self._edit_list
+
+    def has_audio(self) -> bool:
+        # After an edit the flat WAV may not be rendered yet; the edit list counts.
+        return bool(self.auto_file) and (self.auto_file.exists() or edl.sidecar_path(self.auto_file).exists())
+
+    def has_edits(self) -> bool:
+        return bool(self.auto_file) and edl.sidecar_path(self.auto_file).exists()
+
+    def reset_edits(self) -> None:
+        with self.lock.write():
+            if self.auto_file:
+                edl.discard(self.auto_file)
+            self._edit_list = None
+
+    def render_pending(self) -> None:
+        if not self.has_edits():
+            return
+        with self.lock.write():
+            self.edit_list().ensure_rendered()
+
+    def bump_generation(self) -> None:
+        with self._generation_lock:
+            self.generation += 1
+
+
+class ProjectRegistry:
+    """The default project plus workspaces stored under ``root/<id>``."""
+
+    def __init__(self, root: Path, default: Project) -> None:
+        self.root = root
+        self.default = default
+        self._projects: dict[str, Project] = {DEFAULT_ID: default}
+        self._lock = threading.Lock()
+
+    def _workspace(self, project_id: str, name: str = "") -> Project:
+        root = self.root / project_id
+        return Project(
+            project_id,
+            root=root,
+            auto_file=root / "voice.wav",
+            base_dir=root,
+            selection_file=root / "selection.json",
+            bgm_layout_file=root / "bgm_layout.json",
+            bgm_dir=root / "bgm",
+            name=name,
+        )
+
+    def get(self, project_id: str) -> Optional[Project]:
+        """Look up a project, loading workspaces created by earlier runs."""
+        if not project_id:
+            return self.default
+        with self._lock:
+            project = self._projects.get(project_id)
+            if project is not None or not _ID_RE.match(project_id):
+                return project
+            try:
+                meta = json.loads((self.root / project_id / "project.json").read_text())
+            except (OSError, ValueError):
+                return None
+            project = self._workspace(project_id, str(meta.get("name", "")))
+            self._projects[project_id] = project
+            return project
+
+    def create(self, name: str = "") -> Project:
+        project_id = uuid.uuid4().hex[:12]
+        project = self._workspace(project_id, name)
+        project.root.mkdir(parents=True, exist_ok=True)
+        meta = {"id": project_id, "name": project.name, "created": time.time()}
+        fsutil.write_text(project.root / "project.json", json.dumps(meta, indent=2))
+        with self._lock:
+            self._projects[project_id] = project
+        return project
+
+    def list(self) -> list[Project]:
+        if self.root.is_dir():
+            for meta in self.root.glob("*/project.json"):
+                self.get(meta.parent.name)
+        with self._lock:
+            return list(self._projects.values())
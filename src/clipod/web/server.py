@@ -1,81 +1,55 @@
 from __future__ import annotations
 
+import email.utils
 import http.server
 import json
 import mimetypes
 import os
-import shutil
 import socketserver
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 from typing import Optional
 from urllib.parse import unquote, urlparse
 
+from clipod import analysis, edl, fsutil, metrics, peaks, selection, wavfile
 from clipod.bgm import LayoutError, mix_bgm
+from clipod.cache import RenderCache
+from clipod.edl import EdlError
+from clipod.paths import BGM_LAYOUT_FILE, SELECTION_FILE, WEB_ROOT
+from clipod.wavfile import WAVE_FORMAT_PCM, WavError, WavInfo
+from clipod.web import capture, jobs, multipart, projects
+from clipod.web.capture import CaptureError
 
 
-def _parse_multipart_form(content_type: str, payload: bytes) -> tuple[str, bytes]:
-    if "boundary=" not in content_type:
-        raise ValueError("Missing multipart boundary")
-    boundary = content_type.split("boundary=", 1)[1]
-    boundary_bytes = ("--" + boundary).encode("utf-8")
-    parts = payload.split(boundary_bytes)
-    for part in parts:
-        if b"Content-Disposition" not in part:
-            continue
-        header, _, body = part.partition(b"\r\n\r\n")
-        if b'name="file"' not in header:
-            continue
-        filename = "upload.wav"
-        for segment in header.split(b";"):
-            segment = segment.strip()
-            if segment.startswith(b"filename="):
-                raw = segment.split(b"=", 1)[1].strip().strip(b'"')
-                if raw:
-                    filename = raw.decode("utf-8", errors="replace")
-        body = body.rstrip(b"\r\n")
-        return filename, body
-    raise ValueError("No file field found")
-
-
-def _parse_multipart_fields(content_type: str, payload: bytes) -> dict[str, tuple[str | None, bytes]]:
-    if "boundary=" not in content_type:
-        raise ValueError("Missing multipart boundary")
-    boundary = content_type.split("boundary=", 1)[1]
-    boundary_bytes = ("--" + boundary).encode("utf-8")
-    parts = payload.split(boundary_bytes)
-    fields: dict[str, tuple[str | None, bytes]] = {}
-    for part in parts:
-        if b"Content-Disposition" not in part:
-            continue
-        header, _, body = part.partition(b"\r\n\r\n")
-        body = body.rstrip(b"\r\n")
-        name = None
-        filename = None
-        for segment in header.split(b";"):
-            segment = segment.strip()
-            if segment.startswith(b'name="'):
-                name = segment.split(b"=", 1)[1].strip().strip(b'"').decode("utf-8", errors="replace")
-            if segment.startswith(b"filename="):
-                raw = segment.split(b"=", 1)[1].strip().strip(b'"')
-                if raw:
-                    filename = raw.decode("utf-8", errors="replace")
-        if name:
-            fields[name] = (filename, body)
-    if not fields:
-        raise ValueError("No multipart fields found")
-    return fields
-
-WEB_ROOT = Path(__file__).parent
-SELECTION_FILE = WEB_ROOT / "selection.json"
-BGM_LAYOUT_FILE = WEB_ROOT / "bgm_layout.json"
 BGM_DIR = WEB_ROOT / "bgm"
 WORK_DIR = Path(os.path.join(tempfile.gettempdir(), "clipod"))
 os.makedirs(WORK_DIR, exist_ok=True)
-AUTO_FILE: Optional[Path] = WORK_DIR / "voice.wav"
-BACKUP_FILE: Optional[Path] = None
-AUTO_FILE_READY = True
+# Upload limits; file parts stream to WORK_DIR, plain fields stay in memory.
+MAX_UPLOAD_BYTES = 4 * 1024**3
+MAX_FIELD_BYTES = 64 * 1024
+# Browser recorders deliver Opus, which always decodes at 48 kHz.
+CAPTURE_SAMPLE_RATE = 48000
+JOB_KEEPALIVE_SECONDS = 15.0
+# Silences at least this long are offered as cut candidates in the editor.
+PAUSE_CANDIDATE_SECONDS = 1.5
+# Editor state lives in projects. The default project keeps the historical
+# paths; ``?project=<id>`` addresses workspaces under WORK_DIR/projects.
+PROJECTS = projects.ProjectRegistry(
+    WORK_DIR / "projects",
+    default=projects.Project(
+        projects.DEFAULT_ID,
+        root=WORK_DIR,
+        auto_file=WORK_DIR / "voice.wav",
+        base_dir=WEB_ROOT,
+        selection_file=SELECTION_FILE,
+        bgm_layout_file=BGM_LAYOUT_FILE,
+        bgm_dir=BGM_DIR,
+    ),
+)
+# Routes that do not belong to a project.
+_GLOBAL_ROUTES = ("/api/projects", "/api/jobs", "/api/record/chunk", "/api/record/stop")
 
 
 class RequestHandler(http.server.SimpleHTTPRequestHandler):
@@ -83,96 +57,270 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
         super().__init__(*args, directory=str(WEB_ROOT), **kwargs)
 
     def log_message(self, format: str, *args) -> None:  # noqa: A003
-        return  # quiet
+        return  # quiet; requests are recorded in metrics (and the trace log)
+
+    def setup(self) -> None:
+        super().setup()
+        self.wfile = _CountingWriter(self.wfile)
+
+    def handle_one_request(self) -> None:
+        self._status: Optional[int] = None
+        self.wfile.count = 0
+        started = time.perf_counter()
+        super().handle_one_request()
+        if self._status is None or not getattr(self, "command", None):
+            return
+        try:
+            bytes_in = max(0, int(self.headers.get("Content-Length", "0")))
+        except ValueError:
+            bytes_in = 0
+        metrics.registry.observe_request(
+            metrics.route_label(urlparse(self.path).path),
+            self.command,
+            self._status,
+            time.perf_counter() - started,
+            bytes_in,
+            self.wfile.count,
+        )
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code
+        super().send_response(code, message)
 
     def do_POST(self) -> None:  # noqa: N802
-        global BACKUP_FILE, AUTO_FILE_READY
         path = urlparse(self.path).path
+        project = PROJECTS.default
+        if not path.startswith(_GLOBAL_ROUTES):
+            project = self._project()
+            if project is None:
+                return
+        if path == "/api/projects":
+            content_length = int(self.headers.get("Content-Length", "0"))
+            payload = self.rfile.read(content_length)
+            try:
+                data = json.loads(payload or b"{}")
+                name = str(data.get("name", ""))
+            except Exception:
+                self.send_error(400, "Invalid JSON payload")
+                return
+            try:
+                created = PROJECTS.create(name)
+            except OSError as exc:
+                self.send_error(500, f"Failed to create project: {exc}")
+                return
+            self._send_json(created.to_dict(), status=201)
+            return
         if path == "/api/save":
             content_length = int(self.headers.get("Content-Length", "0"))
             payload = self.rfile.read(content_length)
             try:
                 data = json.loads(payload)
-                start = float(data["start"])
-                end = float(data["end"])
+                ranges = selection.parse(data)
                 file_name = str(data.get("file", ""))
+            except selection.SelectionError as exc:
+                self.send_error(400, str(exc))
+                return
             except Exception:
                 self.send_error(400, "Invalid JSON payload")
                 return
-            SELECTION_FILE.write_text(json.dumps({"start": start, "end": end, "file": file_name}, indent=2))
+            with project.lock.write():
+                if data.get("append"):
+                    # Build chapter lists one range at a time.
+                    try:
+                        ranges = selection.load(project.selection_file) + ranges
+                    except selection.SelectionError:
+                        pass
+                fsutil.write_text(
+                    project.selection_file, json.dumps(selection.to_dict(ranges, file_name), indent=2)
+                )
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
             self.wfile.write(b'{"status":"ok"}')
             return
         if path == "/api/upload":
-            global AUTO_FILE
             content_type = self.headers.get("Content-Type", "")
             if "multipart/form-data" not in content_type:
                 self.send_error(400, "Expected multipart/form-data")
                 return
-            if not AUTO_FILE:
+            if not project.auto_file:
                 self.send_error(500, "Auto file path not configured")
                 return
+            form = self._read_multipart(content_type)
+            if form is None:
+                return
+            upload = form.files.get("file")
+            if upload is None:
+                form.cleanup()
+                self.send_error(400, "No file field found")
+                return
+            if self._query_params().get("background") == "1":
+
+                def install(job: jobs.Job) -> dict:
+                    try:
+                        return _install_upload(project, upload, job)
+                    finally:
+                        form.cleanup()
+
+                self._send_job(jobs.manager.submit("upload", install))
+                return
+            try:
+                result = _install_upload(project, upload)
+            except RouteError as exc:
+                self.send_error(exc.code, exc.message)
+                return
+            finally:
+                form.cleanup()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(result).encode("utf-8"))
+            return
+        if path == "/api/record/start":
             content_length = int(self.headers.get("Content-Length", "0"))
             payload = self.rfile.read(content_length)
             try:
-                filename, data = _parse_multipart_form(content_type, payload)
-            except ValueError as exc:
-                self.send_error(400, str(exc))
+                data = json.loads(payload or b"{}")
+                mode = str(data.get("mode", "upload"))
+                mime = str(data.get("mime", ""))
+                channels = int(data.get("channels", 1))
+            except Exception:
+                self.send_error(400, "Invalid JSON payload")
+                return
+            if mode not in ("upload", "punch") or channels not in (1, 2):
+                self.send_error(400, "Invalid capture mode")
                 return
-            AUTO_FILE.parent.mkdir(parents=True, exist_ok=True)
-            file_path = AUTO_FILE
-            if filename:
-                suffix = Path(filename).suffix
-                if suffix and suffix != AUTO_FILE.suffix:
-                    file_path = AUTO_FILE.with_suffix(suffix)
-            if file_path.suffix.lower() != ".wav":
-                AUTO_FILE.parent.mkdir(parents=True, exist_ok=True)
-                temp_input = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_upload{file_path.suffix}")
+            if mode == "punch":
+                if not project.has_audio():
+                    self.send_error(404, "Auto audio not found")
+                    return
+                # Punch takes are decoded straight into the project format.
                 try:
-                    temp_input.write_bytes(data)
-                except OSError as exc:
-                    self.send_error(500, f"Failed to save upload: {exc}")
+                    fmt = _edit_format(project)
+                except RouteError as exc:
+                    self.send_error(exc.code, exc.message)
                     return
-                wav_path = AUTO_FILE.with_suffix(".wav")
-                cmd = [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(temp_input),
-                    str(wav_path),
-                ]
+            else:
+                fmt = WavInfo(WORK_DIR, CAPTURE_SAMPLE_RATE, channels, 2, WAVE_FORMAT_PCM, 0, 0)
+            try:
+                session = capture.start(WORK_DIR / "capture", mode, fmt, mime=mime, project_id=project.id)
+            except FileNotFoundError:
+                self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps({"status": "ok", "session": session.id}).encode("utf-8"))
+            return
+        if path == "/api/record/chunk":
+            params = self._query_params()
+            session = capture.get(params.get("session", ""))
+            content_length = int(self.headers.get("Content-Length", "0"))
+            if content_length > capture.MAX_CHUNK_BYTES:
+                self.close_connection = True
+                self.send_error(413, "Capture chunk too large")
+                return
+            chunk = self.rfile.read(content_length)
+            if session is None:
+                self.send_error(404, "Capture session not found")
+                return
+            try:
+                session.append(int(params.get("seq", "-1")), chunk)
+            except (CaptureError, ValueError) as exc:
+                self.send_error(409, str(exc))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(
+                json.dumps({"status": "ok", "decoded": round(session.decoded_seconds, 3)}).encode("utf-8")
+            )
+            return
+        if path == "/api/record/stop":
+            content_length = int(self.headers.get("Content-Length", "0"))
+            payload = self.rfile.read(content_length)
+            try:
+                data = json.loads(payload)
+                session_id = str(data["session"])
+                abort = bool(data.get("abort", False))
+            except Exception:
+                self.send_error(400, "Invalid JSON payload")
+                return
+            session = capture.pop(session_id)
+            if session is None:
+                self.send_error(404, "Capture session not found")
+                return
+            try:
+                # The take goes to the project it was recorded for.
+                project = _lookup_project(session.project_id)
+            except RouteError as exc:
+                session.abort()
+                self.send_error(exc.code, exc.message)
+                return
+            if abort:
+                session.abort()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"status":"ok"}')
+                return
+            if session.mode == "punch":
                 try:
-                    subprocess.run(cmd, check=True, capture_output=True, text=True)
-                except FileNotFoundError:
-                    self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
+                    start = float(data["start"])
+                    end = float(data.get("end", start))
+                except (KeyError, TypeError, ValueError):
+                    session.abort()
+                    self.send_error(400, "Invalid punch range")
                     return
-                except subprocess.CalledProcessError as exc:
-                    if exc.stderr:
-                        print("ffmpeg upload stderr:\n" + exc.stderr, flush=True)
-                    self.send_error(500, f"ffmpeg upload failed with exit code {exc.returncode}")
+                if start < 0 or end < start:
+                    session.abort()
+                    self.send_error(400, f"Invalid punch range: start={start}, end={end}")
                     return
-                finally:
-                    if temp_input.exists():
-                        temp_input.unlink()
-                file_path = wav_path
-            else:
+            try:
+                info = session.finish()
+            except (CaptureError, WavError) as exc:
+                session.abort()
+                self.send_error(500, f"Capture failed: {exc}")
+                return
+            except subprocess.CalledProcessError as exc:
+                session.abort()
+                self.send_error(500, f"ffmpeg capture failed with exit code {exc.returncode}")
+                return
+            if not info.frames:
+                session.discard()
+                self.send_error(400, "Empty recording")
+                return
+            if session.mode == "punch":
                 try:
-                    file_path.write_bytes(data)
-                except OSError as exc:
-                    self.send_error(500, f"Failed to save upload: {exc}")
+                    _apply_punch(project, session.wav_path, start, end)
+                except RouteError as exc:
+                    session.discard()
+                    self.send_error(exc.code, exc.message)
                     return
-            AUTO_FILE = file_path
-            AUTO_FILE_READY = True
-            os.sync()
+                file_path = project.auto_file
+            else:
+                with project.lock.write():
+                    project.reset_edits()
+                    file_path = project.auto_file.with_suffix(".wav")
+                    try:
+                        fsutil.install(session.wav_path, file_path)
+                    except OSError as exc:
+                        session.discard()
+                        self.send_error(500, f"Failed to save recording: {exc}")
+                        return
+                    project.auto_file = file_path
+                    project.auto_file_ready = True
+                    project.bump_generation()
+            session.discard()
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
-            self.wfile.write(json.dumps({"status": "ok", "file": filename, "path": str(file_path.name)}).encode("utf-8"))
+            self.wfile.write(
+                json.dumps({"status": "ok", "duration": info.duration, "path": file_path.name}).encode("utf-8")
+            )
             return
         if path == "/api/delete":
-            if not AUTO_FILE or not AUTO_FILE.exists():
+            if not project.has_audio():
                 self.send_error(404, "Auto audio not found")
                 return
             content_length = int(self.headers.get("Content-Length", "0"))
@@ -187,189 +335,131 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
             if start < 0 or end <= start:
                 self.send_error(400, f"Invalid delete range: start={start}, end={end}")
                 return
-            backup_path = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_backup{AUTO_FILE.suffix}")
-            temp_path = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_tmp{AUTO_FILE.suffix}")
-            try:
-                shutil.copy2(AUTO_FILE, backup_path)
-                BACKUP_FILE = backup_path
-                print(f"BEFORE DELETE: {AUTO_FILE.stat().st_size} bytes", flush=True)
-                filter_complex = (
-                    f"[0:a]atrim=0:{start},asetpts=PTS-STARTPTS[a];"
-                    f"[0:a]atrim={end},asetpts=PTS-STARTPTS[b];"
-                    "[a][b]concat=n=2:v=0:a=1[out]"
-                )
-                cmd = [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(AUTO_FILE),
-                    "-filter_complex",
-                    filter_complex,
-                    "-map",
-                    "[out]",
-                    str(temp_path),
-                ]
-                print(f"DELETE MAIN: {AUTO_FILE}", flush=True)
-                print(f"DELETE TMP: {temp_path}", flush=True)
-                print(f"FFMPEG CMD: {' '.join(cmd)}", flush=True)
-                result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-                print(f"DELETE RETURN CODE: {result.returncode}", flush=True)
-                if result.stderr:
-                    print(f"DELETE STDERR: {result.stderr}", flush=True)
-                if temp_path.exists():
-                    print(f"TMP FILE SIZE: {temp_path.stat().st_size} bytes", flush=True)
-                print(f"REPLACE BEFORE: {AUTO_FILE.exists()} -> {temp_path.exists()}", flush=True)
-                temp_path.replace(AUTO_FILE)
-                AUTO_FILE_READY = True
-                print(f"REPLACE AFTER: {AUTO_FILE.exists()} -> {temp_path.exists()}", flush=True)
-                print(f"DELETE REPLACED: {AUTO_FILE.exists()}", flush=True)
-                print(f"AFTER DELETE: {AUTO_FILE.stat().st_size} bytes", flush=True)
-                os.sync()
+            with project.lock.write():
                 try:
-                    with open(AUTO_FILE, "rb") as handle:
-                        os.fsync(handle.fileno())
-                except OSError:
-                    pass
-                os.sync()
-            except FileNotFoundError as exc:
-                self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
-                return
-            except subprocess.CalledProcessError as exc:
-                if exc.stderr:
-                    print(f"DELETE STDERR: {exc.stderr}", flush=True)
-                self.send_error(500, f"ffmpeg delete failed with exit code {exc.returncode}")
-                return
-            finally:
-                if temp_path.exists():
-                    temp_path.unlink()
+                    edit_list = project.edit_list()
+                    edit_list.delete(start, end)
+                    edit_list.save()
+                except EdlError as exc:
+                    self.send_error(400, str(exc))
+                    return
+                except FileNotFoundError:
+                    self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
+                    return
+                except subprocess.CalledProcessError as exc:
+                    self.send_error(500, f"ffmpeg import failed with exit code {exc.returncode}")
+                    return
+                project.bump_generation()
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
             self.wfile.write(b'{"status":"ok"}')
             return
         if path == "/api/punch":
-            if not AUTO_FILE or not AUTO_FILE.exists():
+            if not project.has_audio():
                 self.send_error(404, "Auto audio not found")
                 return
             content_type = self.headers.get("Content-Type", "")
             if "multipart/form-data" not in content_type:
                 self.send_error(400, "Expected multipart/form-data")
                 return
-            content_length = int(self.headers.get("Content-Length", "0"))
-            payload = self.rfile.read(content_length)
-            try:
-                fields = _parse_multipart_fields(content_type, payload)
-            except ValueError as exc:
-                self.send_error(400, str(exc))
-                return
-            if "file" not in fields or "start" not in fields or "end" not in fields:
-                self.send_error(400, "Missing punch fields")
+            form = self._read_multipart(content_type)
+            if form is None:
                 return
             try:
-                start = float(fields["start"][1].decode("utf-8"))
-                end = float(fields["end"][1].decode("utf-8"))
-            except ValueError:
-                self.send_error(400, "Invalid punch range")
-                return
-            print("=== PUNCH-IN REQUEST ===", flush=True)
-            print(f"start: {start}, end: {end}", flush=True)
-            if start < 0 or end < start:
-                self.send_error(400, f"Invalid punch range: start={start}, end={end}")
-                return
-            punch_data = fields["file"][1]
-            if not punch_data:
-                self.send_error(400, "Empty punch audio")
-                return
-            punch_path = AUTO_FILE.with_name("punch_tmp.wav")
-            temp_path = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_tmp{AUTO_FILE.suffix}")
-            backup_path = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_backup{AUTO_FILE.suffix}")
-            try:
-                shutil.copy2(AUTO_FILE, backup_path)
-                BACKUP_FILE = backup_path
-                punch_path.write_bytes(punch_data)
-                filter_complex = (
-                    f"[0:a]atrim=0:{start},asetpts=PTS-STARTPTS[a];"
-                    "[1:a]asetpts=PTS-STARTPTS[b];"
-                    f"[0:a]atrim={end},asetpts=PTS-STARTPTS[c];"
-                    "[a][b][c]concat=n=3:v=0:a=1[out]"
-                )
-                cmd = [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(AUTO_FILE),
-                    "-i",
-                    str(punch_path),
-                    "-filter_complex",
-                    filter_complex,
-                    "-map",
-                    "[out]",
-                    str(temp_path),
-                ]
-                print("PUNCH CMD:", " ".join(cmd), flush=True)
-                result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-                if result.stderr:
-                    print(f"PUNCH STDERR: {result.stderr}", flush=True)
-                temp_path.replace(AUTO_FILE)
-                AUTO_FILE_READY = True
-                os.sync()
-            except FileNotFoundError:
-                self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
-                return
-            except subprocess.CalledProcessError as exc:
-                if exc.stderr:
-                    print(f"PUNCH STDERR: {exc.stderr}", flush=True)
-                self.send_error(500, f"ffmpeg punch failed with exit code {exc.returncode}")
-                return
+                punch = form.files.get("file")
+                start_text = form.field_text("start")
+                end_text = form.field_text("end")
+                if punch is None or start_text is None or end_text is None:
+                    self.send_error(400, "Missing punch fields")
+                    return
+                try:
+                    start = float(start_text)
+                    end = float(end_text)
+                except ValueError:
+                    self.send_error(400, "Invalid punch range")
+                    return
+                if start < 0 or end < start:
+                    self.send_error(400, f"Invalid punch range: start={start}, end={end}")
+                    return
+                if not punch.size:
+                    self.send_error(400, "Empty punch audio")
+                    return
+                try:
+                    _apply_punch(project, punch.path, start, end)
+                except RouteError as exc:
+                    self.send_error(exc.code, exc.message)
+                    return
             finally:
-                if punch_path.exists():
-                    punch_path.unlink()
-                if temp_path.exists():
-                    temp_path.unlink()
+                form.cleanup()
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
             self.wfile.write(b'{"status":"ok"}')
             return
-        if path == "/api/undo":
-            if not AUTO_FILE or not AUTO_FILE.exists():
-                self.send_error(404, "Auto audio not found")
-                return
-            if not BACKUP_FILE or not BACKUP_FILE.exists():
-                self.send_error(404, "Backup not found")
-                return
-            try:
-                shutil.copy2(BACKUP_FILE, AUTO_FILE)
-            except OSError as exc:
-                self.send_error(500, f"Failed to restore backup: {exc}")
+        if path in ("/api/undo", "/api/redo"):
+            if not project.has_edits():
+                self.send_error(404, "Nothing to undo" if path == "/api/undo" else "Nothing to redo")
                 return
+            with project.lock.write():
+                try:
+                    edit_list = project.edit_list()
+                except EdlError as exc:
+                    self.send_error(500, str(exc))
+                    return
+                changed = edit_list.undo() if path == "/api/undo" else edit_list.redo()
+                if not changed:
+                    self.send_error(404, "Nothing to undo" if path == "/api/undo" else "Nothing to redo")
+                    return
+                edit_list.save()
+                project.bump_generation()
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
-            self.wfile.write(b'{"status":"ok"}')
+            self.wfile.write(
+                json.dumps(
+                    {"status": "ok", "undo": len(edit_list.undo_stack), "redo": len(edit_list.redo_stack)}
+                ).encode("utf-8")
+            )
             return
         if path == "/api/bgm/upload":
-            if not AUTO_FILE or not AUTO_FILE.exists():
+            if not project.auto_file or not project.auto_file.exists():
                 self.send_error(404, "Auto audio not found")
                 return
             content_length = int(self.headers.get("Content-Length", "0"))
-            payload = self.rfile.read(content_length)
             name = unquote(self.headers.get("X-File-Name", ""))
             if not name:
+                self.close_connection = True
                 self.send_error(400, "Missing X-File-Name header")
                 return
             safe_name = Path(name).name
             if not safe_name:
+                self.close_connection = True
                 self.send_error(400, "Invalid file name")
                 return
-            BGM_DIR.mkdir(parents=True, exist_ok=True)
-            target = BGM_DIR / safe_name
+            project.bgm_dir.mkdir(parents=True, exist_ok=True)
+            target = project.bgm_dir / safe_name
+            temp_target = project.bgm_dir / f".{safe_name}.upload"
             try:
-                target.write_bytes(payload)
+                # Stream without the lock; only the swap excludes readers.
+                multipart.stream_to_file(self.rfile, content_length, temp_target, MAX_UPLOAD_BYTES)
+                with project.lock.write():
+                    fsutil.install(temp_target, target)
+            except multipart.PayloadTooLarge as exc:
+                self.close_connection = True
+                self.send_error(413, str(exc))
+                return
+            except multipart.MultipartError as exc:
+                self.close_connection = True
+                self.send_error(400, str(exc))
+                return
             except OSError as exc:
                 self.send_error(500, f"Failed to save BGM file: {exc}")
                 return
-            rel_path = target.relative_to(WEB_ROOT)
+            finally:
+                if temp_target.exists():
+                    temp_target.unlink()
+            rel_path = target.relative_to(project.base_dir)
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
@@ -383,133 +473,583 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
             except json.JSONDecodeError:
                 self.send_error(400, "Invalid JSON payload")
                 return
-            BGM_LAYOUT_FILE.write_text(json.dumps(data, indent=2))
+            with project.lock.write():
+                fsutil.write_text(project.bgm_layout_file, json.dumps(data, indent=2))
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
             self.wfile.write(b'{"status":"ok"}')
             return
         if path == "/api/mix":
-            if not AUTO_FILE or not AUTO_FILE.exists():
-                self.send_error(404, "Auto audio not found")
-                return
             content_length = int(self.headers.get("Content-Length", "0"))
             payload = self.rfile.read(content_length)
             try:
                 data = json.loads(payload)
-                output_name = str(data.get("output", "mixed.wav"))
+                if not isinstance(data, dict):
+                    raise ValueError("Expected a JSON object")
             except Exception:
                 self.send_error(400, "Invalid JSON payload")
                 return
-            use_bgm = bool(data.get("use_bgm", True))
-            if use_bgm:
-                try:
-                    layout = json.loads(BGM_LAYOUT_FILE.read_text())
-                except Exception:
-                    layout = {"segments": []}
-            else:
-                layout = {"segments": []}
-            output_path = AUTO_FILE.with_name(Path(output_name).name)
-            main_path = AUTO_FILE
-            cleanup_path: Optional[Path] = None
-            if main_path.suffix.lower() != ".wav":
-                wav_input = AUTO_FILE.with_name(f"{AUTO_FILE.stem}_export.wav")
-                cmd = [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(AUTO_FILE),
-                    str(wav_input),
-                ]
-                try:
-                    subprocess.run(cmd, check=True, capture_output=True, text=True)
-                except FileNotFoundError:
-                    self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
-                    return
-                except subprocess.CalledProcessError as exc:
-                    if exc.stderr:
-                        print("ffmpeg convert stderr:\n" + exc.stderr, flush=True)
-                    self.send_error(500, f"ffmpeg convert failed with exit code {exc.returncode}")
-                    return
-                main_path = wav_input
-                cleanup_path = wav_input
-            def log_command(cmd: list[str]) -> None:
-                print("ffmpeg mix command:", " ".join(cmd), flush=True)
-
-            try:
-                mix_bgm(
-                    main=main_path,
-                    layout=layout,
-                    output=output_path,
-                    base_dir=WEB_ROOT,
-                    log_command=log_command,
-                )
-            except LayoutError as exc:
-                self.send_error(400, str(exc))
-                return
-            except FileNotFoundError:
-                self.send_error(500, "ffmpeg not found. Ensure it is installed and on PATH.")
+            if data.get("background"):
+                self._send_job(jobs.manager.submit("mix", lambda job: _mix_audio(project, data, job)))
                 return
-            except subprocess.CalledProcessError as exc:
-                if exc.stderr:
-                    print("ffmpeg mix stderr:\n" + exc.stderr, flush=True)
-                self.send_error(500, f"ffmpeg mix failed with exit code {exc.returncode}")
+            try:
+                result = _mix_audio(project, data)
+            except RouteError as exc:
+                self.send_error(exc.code, exc.message)
                 return
-            if cleanup_path and cleanup_path.exists():
-                try:
-                    cleanup_path.unlink()
-                except OSError:
-                    pass
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.end_headers()
-            self.wfile.write(json.dumps({"status": "ok", "output": str(output_path.name)}).encode("utf-8"))
+            self.wfile.write(json.dumps(result).encode("utf-8"))
+            return
+        if path.startswith("/api/jobs/") and path.endswith("/cancel"):
+            job = jobs.manager.get(path[len("/api/jobs/") : -len("/cancel")])
+            if job is None:
+                self.send_error(404, "Job not found")
+                return
+            job.cancel()
+            self._send_json(job.to_dict())
             return
         if path != "/api/save":
             self.send_error(404, "Not Found")
             return
 
+    def _read_multipart(self, content_type: str) -> Optional[multipart.MultipartForm]:
+        content_length = int(self.headers.get("Content-Length", "0"))
+        try:
+            return multipart.parse(
+                self.rfile,
+                content_type,
+                content_length,
+                upload_dir=WORK_DIR,
+                max_file_bytes=MAX_UPLOAD_BYTES,
+                max_field_bytes=MAX_FIELD_BYTES,
+            )
+        except multipart.PayloadTooLarge as exc:
+            # The rest of the body is unread; do not reuse the connection.
+            self.close_connection = True
+            self.send_error(413, str(exc))
+        except multipart.MultipartError as exc:
+            self.close_connection = True
+            self.send_error(400, str(exc))
+        return None
+
+    def _project(self) -> Optional[projects.Project]:
+        project_id = self._query_params().get("project") or self.headers.get("X-Clipod-Project", "")
+        try:
+            return _lookup_project(project_id)
+        except RouteError as exc:
+            # A POST body may still be unread; do not reuse the connection.
+            self.close_connection = True
+            self.send_error(exc.code, exc.message)
+            return None
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_job(self, job: jobs.Job) -> None:
+        self._send_json({"status": "accepted", "job": job.id, "events": f"/api/jobs/{job.id}/events"}, status=202)
+
+    def _send_job_events(self, job: jobs.Job) -> None:
+        """Stream job status as Server-Sent Events until the job finishes."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        version = -1
+        try:
+            while True:
+                current = job.version
+                if current != version:
+                    version = current
+                    state = job.to_dict()
+                    self.wfile.write(f"event: status\ndata: {json.dumps(state)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if state["status"] in jobs.TERMINAL:
+                        return
+                elif job.wait_for_change(version, timeout=JOB_KEEPALIVE_SECONDS) == version:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _query_params(self) -> dict[str, str]:
+        query = urlparse(self.path).query
+        return {key: unquote(value) for key, value in (item.split("=", 1) for item in query.split("&") if "=" in item)}
+
+    def _resolve_auto_target(self) -> Optional[tuple[projects.Project, Path]]:
+        project = self._project()
+        if project is None:
+            return None
+        try:
+            return project, _auto_target(project, self._query_params().get("file", ""))
+        except RouteError as exc:
+            self.send_error(exc.code, exc.message)
+            return None
+
     def do_GET(self) -> None:  # noqa: N802
         path = urlparse(self.path).path
-        if path == "/api/auto":
-            query = urlparse(self.path).query
-            target = AUTO_FILE
-            base_dir = AUTO_FILE.parent if AUTO_FILE else WEB_ROOT
-            if query:
-                params = dict(item.split("=", 1) for item in query.split("&") if "=" in item)
-                file_name = unquote(params.get("file", ""))
-                if file_name:
-                    target = (base_dir / Path(file_name).name).resolve()
-                    if base_dir not in target.parents and target != base_dir:
-                        self.send_error(400, "Invalid file path")
-                        return
-            if not AUTO_FILE_READY or not target or not target.exists():
-                self.send_error(404, "Auto audio not found")
+        if path == "/api/peaks":
+            resolved = self._resolve_auto_target()
+            if resolved is None:
                 return
-            ctype, _ = mimetypes.guess_type(str(target))
             try:
-                target.touch()
-                with open(target, "rb", buffering=0) as handle:
-                    data = handle.read()
-            except Exception:
-                self.send_error(500, "Failed to read audio file")
+                data = _peaks_body(*resolved, self._query_params())
+            except RouteError as exc:
+                self.send_error(exc.code, exc.message)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if path == "/api/silences":
+            resolved = self._resolve_auto_target()
+            if resolved is None:
+                return
+            try:
+                data = _silences_body(*resolved, self._query_params())
+            except RouteError as exc:
+                self.send_error(exc.code, exc.message)
                 return
             self.send_response(200)
-            self.send_header("Content-Type", ctype or "application/octet-stream")
+            self.send_header("Content-Type", "application/json")
             self.send_header("Cache-Control", "no-store")
             self.send_header("Content-Length", str(len(data)))
             self.end_headers()
             self.wfile.write(data)
             return
+        if path == "/api/auto":
+            resolved = self._resolve_auto_target()
+            if resolved is None:
+                return
+            self._send_audio_file(*resolved)
+            return
+        if path == "/api/metrics":
+            data = metrics.registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if path == "/api/projects":
+            self._send_json({"projects": [project.to_dict() for project in PROJECTS.list()]})
+            return
+        if path == "/api/jobs":
+            self._send_json({"jobs": [job.to_dict() for job in jobs.manager.list()]})
+            return
+        if path.startswith("/api/jobs/"):
+            job_id, _, tail = path[len("/api/jobs/") :].partition("/")
+            job = jobs.manager.get(job_id)
+            if job is None or tail not in ("", "events"):
+                self.send_error(404, "Job not found")
+                return
+            if tail == "events":
+                self._send_job_events(job)
+            else:
+                self._send_json(job.to_dict())
+            return
         super().do_GET()
 
+    def _send_audio_file(self, project: projects.Project, target: Path) -> None:
+        try:
+            handle = open(target, "rb")
+        except OSError:
+            self.send_error(500, "Failed to read audio file")
+            return
+        with handle:
+            status, headers, offset, count = _plan_audio_response(
+                project, target, os.fstat(handle.fileno()), self.headers
+            )
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command == "HEAD" or count == 0:
+                return
+            try:
+                # socket.sendfile uses os.sendfile where available (zero-copy).
+                self.wfile.count += self.connection.sendfile(handle, offset, count)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        if urlparse(self.path).path == "/api/auto":
+            resolved = self._resolve_auto_target()
+            if resolved is not None:
+                self._send_audio_file(*resolved)
+            return
+        super().do_HEAD()
+
+
+class RouteError(Exception):
+    """An HTTP error raised by route helpers shared by both server front ends."""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _lookup_project(project_id: str) -> projects.Project:
+    """Project for a ``?project=`` / ``X-Clipod-Project`` id (default when empty)."""
+    project = PROJECTS.get(project_id.strip())
+    if project is None:
+        raise RouteError(404, "Project not found")
+    return project
+
+
+def _auto_target(project: projects.Project, file_name: str = "") -> Path:
+    """Resolve ``/api/auto?file=...`` (rendering pending edits for the main file)."""
+    target = project.auto_file
+    base_dir = project.auto_file.parent if project.auto_file else project.root
+    if not file_name:
+        try:
+            project.render_pending()
+        except (EdlError, OSError) as exc:
+            raise RouteError(500, f"Failed to render edits: {exc}") from exc
+        target = project.auto_file
+    if file_name:
+        target = (base_dir / Path(file_name).name).resolve()
+        if base_dir not in target.parents and target != base_dir:
+            raise RouteError(400, "Invalid file path")
+    if not project.auto_file_ready or not target or not target.exists():
+        raise RouteError(404, "Auto audio not found")
+    return target
+
+
+def _peaks_body(project: projects.Project, target: Path, params: dict[str, str]) -> bytes:
+    with project.lock.read():
+        try:
+            pyramid = peaks.load(target)
+        except WavError as exc:
+            raise RouteError(415, str(exc)) from exc
+        try:
+            if "level" in params:
+                body = pyramid.tiles(
+                    int(params["level"]),
+                    int(params.get("tile", "0")),
+                    int(params.get("count", "1")),
+                )
+            else:
+                body = pyramid.describe()
+        except ValueError as exc:
+            raise RouteError(400, str(exc)) from exc
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def _silences_body(project: projects.Project, target: Path, params: dict[str, str]) -> bytes:
+    """Speech/silence intervals plus pauses of at least ``min_pause`` seconds."""
+    try:
+        threshold = float(params["threshold"]) if params.get("threshold") else None
+        min_silence = float(params.get("min_silence", analysis.MIN_SILENCE_SECONDS))
+        min_pause = float(params.get("min_pause", PAUSE_CANDIDATE_SECONDS))
+    except ValueError as exc:
+        raise RouteError(400, "Invalid silence parameters") from exc
+    with project.lock.read():
+        try:
+            result = analysis.analyze(target, threshold_db=threshold, min_silence=min_silence)
+        except WavError as exc:
+            raise RouteError(415, str(exc)) from exc
+    return json.dumps(result.to_dict(min_pause=min_pause), separators=(",", ":")).encode("utf-8")
+
+
+def _plan_audio_response(
+    project: projects.Project, target: Path, stat: os.stat_result, headers
+) -> tuple[int, list[tuple[str, str]], int, int]:
+    """Status, headers and the byte span to send for a conditional/range GET."""
+    ctype, _ = mimetypes.guess_type(str(target))
+    size = stat.st_size
+    etag = _audio_etag(project, target, stat)
+    last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+    if _not_modified(headers, etag, stat.st_mtime):
+        return 304, [("ETag", etag), ("Last-Modified", last_modified), ("Cache-Control", "no-cache")], 0, 0
+    byte_range: Optional[tuple[int, int]] = None
+    range_header = headers.get("Range")
+    if_range = headers.get("If-Range")
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = _parse_byte_range(range_header, size)
+        except ValueError:
+            return 416, [("Content-Range", f"bytes */{size}"), ("Content-Length", "0")], 0, 0
+    response: list[tuple[str, str]] = []
+    if byte_range is None:
+        status, offset, count = 200, 0, size
+    else:
+        status, offset, count = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+        response.append(("Content-Range", f"bytes {byte_range[0]}-{byte_range[1]}/{size}"))
+    response.extend(
+        [
+            ("Content-Type", ctype or "application/octet-stream"),
+            ("Accept-Ranges", "bytes"),
+            ("ETag", etag),
+            ("Last-Modified", last_modified),
+            ("Cache-Control", "no-cache"),
+            ("Content-Length", str(count)),
+        ]
+    )
+    return status, response, offset, count
+
+
+class _CountingWriter:
+    """Response stream wrapper that counts bytes written for metrics."""
+
+    def __init__(self, stream) -> None:
+        self._stream = stream
+        self.count = 0
+
+    def write(self, data: bytes) -> int:
+        self.count += len(data)
+        return self._stream.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+def _run_quiet(cmd: list[str], label: str = "ffmpeg") -> None:
+    metrics.run(cmd, label, check=True, capture_output=True, text=True)
+
+
+def _edit_format(project: projects.Project) -> WavInfo:
+    """The project's edit-list format, which punch takes are decoded into.
+
+    An existing edit list is only read. Starting one imports the audio as its
+    first take, so that still takes the write lock.
+    """
+    try:
+        with project.lock.read():
+            if project.has_edits():
+                return edl.EditList.load(project.auto_file).info
+        with project.lock.write():
+            return project.edit_list().info
+    except (EdlError, OSError, subprocess.CalledProcessError) as exc:
+        raise RouteError(500, f"Failed to open edit list: {exc}") from exc
+
+
+def _apply_punch(project: projects.Project, source: Path, start: float, end: float) -> None:
+    """Replace ``[start, end)`` of the project's edit list with the audio in ``source``."""
+    with project.lock.write():
+        try:
+            edit_list = project.edit_list()
+            take, info = edl.import_take(source, edit_list.takes, fmt=edit_list.info)
+            edit_list.replace(start, end, take, info.frames)
+            edit_list.save()
+        except EdlError as exc:
+            raise RouteError(400, str(exc)) from exc
+        except FileNotFoundError as exc:
+            raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise RouteError(500, f"ffmpeg punch failed with exit code {exc.returncode}") from exc
+        project.bump_generation()
+
+
+def _upload_path(auto_file: Path, filename: str) -> Path:
+    """Where an upload named ``filename`` lands; anything but WAV is converted next to it."""
+    suffix = Path(filename).suffix
+    if suffix and suffix != auto_file.suffix:
+        return auto_file.with_suffix(suffix)
+    return auto_file
+
+
+def _install_upload(project: projects.Project, upload: multipart.FilePart, job: Optional[jobs.Job] = None) -> dict:
+    """Make an uploaded file the project's audio, converting it to WAV if needed."""
+    with project.lock.write():
+        file_path = _install_upload_locked(project, upload, job)
+    return {"status": "ok", "file": upload.filename or "upload.wav", "path": str(file_path.name)}
+
+
+def _install_upload_locked(project: projects.Project, upload: multipart.FilePart, job: Optional[jobs.Job]) -> Path:
+    runner = job.run_ffmpeg if job is not None else (lambda cmd: _run_quiet(cmd, "upload"))
+    filename = upload.filename or "upload.wav"
+    auto_file = project.auto_file
+    auto_file.parent.mkdir(parents=True, exist_ok=True)
+    # A new upload starts a new edit history; old takes are dropped.
+    project.reset_edits()
+    file_path = _upload_path(auto_file, filename)
+    if file_path.suffix.lower() != ".wav":
+        wav_path = auto_file.with_suffix(".wav")
+        try:
+            with fsutil.atomic_path(wav_path) as tmp_path:
+                cmd = [
+                    "ffmpeg",
+                    "-y",
+                    "-i",
+                    str(upload.path),
+                    str(tmp_path),
+                ]
+                runner(cmd)
+        except FileNotFoundError as exc:
+            raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise RouteError(500, f"ffmpeg upload failed with exit code {exc.returncode}") from exc
+        file_path = wav_path
+    else:
+        try:
+            fsutil.install(upload.path, file_path)
+        except OSError as exc:
+            raise RouteError(500, f"Failed to save upload: {exc}") from exc
+    project.auto_file = file_path
+    project.auto_file_ready = True
+    project.bump_generation()
+    return file_path
+
+
+def _mix_audio(project: projects.Project, data: dict, job: Optional[jobs.Job] = None) -> dict:
+    """Render pending edits and mix the project's audio per the ``/api/mix`` payload.
+
+    The mix holds the project's read lock: edits wait for it, while other
+    projects render in parallel.
+    """
+    try:
+        project.render_pending()
+    except (EdlError, OSError) as exc:
+        raise RouteError(500, f"Failed to render edits: {exc}") from exc
+    with project.lock.read():
+        return _mix_rendered(project, data, job)
+
+
+def _mix_rendered(project: projects.Project, data: dict, job: Optional[jobs.Job]) -> dict:
+    auto_file = project.auto_file
+    if not auto_file or not auto_file.exists():
+        raise RouteError(404, "Auto audio not found")
+    output_name = str(data.get("output", "mixed.wav"))
+    engine = str(data.get("engine", "ffmpeg"))
+    layout = _mix_layout(project, bool(data.get("use_bgm", True)))
+    output_path = auto_file.with_name(Path(output_name).name)
+    main_path = auto_file
+    cleanup_path: Optional[Path] = None
+    runner = job.run_ffmpeg if job is not None else (lambda cmd: _run_quiet(cmd, "convert"))
+    try:
+        if main_path.suffix.lower() != ".wav":
+            wav_input = auto_file.with_name(f"{auto_file.stem}_export.wav")
+            cleanup_path = wav_input
+            cmd = [
+                "ffmpeg",
+                "-y",
+                "-i",
+                str(auto_file),
+                str(wav_input),
+            ]
+            try:
+                runner(cmd)
+            except FileNotFoundError as exc:
+                raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+            except subprocess.CalledProcessError as exc:
+                raise RouteError(500, f"ffmpeg convert failed with exit code {exc.returncode}") from exc
+            main_path = wav_input
+
+        duration: Optional[float] = None
+        if job is not None:
+            info = wavfile.probe(main_path)
+            # amix uses duration=first, so the output is as long as the voice.
+            duration = info.duration if info is not None else None
+
+        def _mix_runner(cmd: list[str]) -> None:
+            job.run_ffmpeg(cmd, duration)
+
+        mix_runner = _mix_runner if job is not None else None
+        try:
+            cached = mix_bgm(
+                main=main_path,
+                layout=layout,
+                output=output_path,
+                base_dir=project.base_dir,
+                engine=engine,
+                render_cache=RenderCache.default(),
+                runner=mix_runner,
+                progress=job.report if job is not None else None,
+            )
+        except LayoutError as exc:
+            raise RouteError(400, str(exc)) from exc
+        except FileNotFoundError as exc:
+            raise RouteError(500, "ffmpeg not found. Ensure it is installed and on PATH.") from exc
+        except subprocess.CalledProcessError as exc:
+            raise RouteError(500, f"ffmpeg mix failed with exit code {exc.returncode}") from exc
+        except OSError as exc:
+            raise RouteError(500, f"Failed to mix audio: {exc}") from exc
+    finally:
+        if cleanup_path and cleanup_path.exists():
+            try:
+                cleanup_path.unlink()
+            except OSError:
+                pass
+    return {"status": "ok", "output": str(output_path.name), "cached": cached}
+
+
+def _mix_layout(project: projects.Project, use_bgm: bool) -> dict:
+    if use_bgm:
+        try:
+            return json.loads(project.bgm_layout_file.read_text())
+        except Exception:
+            pass
+    return {"segments": []}
+
+
+def _audio_etag(project: projects.Project, target: Path, stat: os.stat_result) -> str:
+    if project.auto_file and target.resolve() == project.auto_file.resolve():
+        return f'"g{project.generation}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _not_modified(headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+    return False
+
+
+def _parse_byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive offsets.
+
+    Returns ``None`` for headers we do not serve partially (multiple ranges or
+    other units), and raises ``ValueError`` when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError("Empty suffix range")
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError as exc:
+        raise ValueError("Invalid range") from exc
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
 
 def main() -> None:
     port = 8000
     handler = RequestHandler
     with socketserver.TCPServer(("", port), handler) as httpd:
         print(f"WORK_DIR: {WORK_DIR}")
-        print(f"AUTO_FILE: {AUTO_FILE}")
+        print(f"AUTO_FILE: {PROJECTS.default.auto_file}")
         print(f"Serving on http://localhost:{port}")
         httpd.serve_forever()
 
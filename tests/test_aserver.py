@@ -0,0 +1,67 @@
+"""Bridged routes of the asyncio server answer even when they fail before reading the body."""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import socket
+import threading
+
+import pytest
+
+from clipod.web import aserver, projects
+
+
+@pytest.fixture(scope="module")
+def port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        free = probe.getsockname()[1]
+    ready = threading.Event()
+
+    async def run() -> None:
+        started = asyncio.Event()
+        task = asyncio.ensure_future(aserver.serve("127.0.0.1", free, ready=started))
+        await started.wait()
+        ready.set()
+        await task
+
+    threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+    assert ready.wait(5)
+    return free
+
+
+def _post(port: int, path: str, body: bytes) -> int:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_bridged_early_error_with_body(port):
+    assert _post(port, "/api/redo", b"{}") == 404
+
+
+@pytest.mark.parametrize("attempt", range(10))
+def test_bridged_early_error_with_large_body(port, attempt):
+    assert _post(port, "/api/delete?project=missing", b"x" * 200_000) == 404
+
+
+def test_cancelled_read_acquire_releases_lock():
+    lock = projects.RWLock()
+
+    async def scenario() -> None:
+        with lock.write():
+            waiter = asyncio.ensure_future(aserver._acquire_read(lock))
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        # The worker thread gets the read side only now; give it back time to hand it over.
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (lock.write().__enter__(), acquired.set()), daemon=True).start()
+    assert acquired.wait(2)
@@ -0,0 +1,92 @@
+"""Punch-in routes of the threaded web server: record/stop takes and the edit-list format."""
+from __future__ import annotations
+
+import http.client
+import http.server
+import json
+import threading
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from clipod.web import capture, projects, server
+
+
+class _Session:
+    mode = "punch"
+    project_id = ""
+
+    def __init__(self, wav_path: Path) -> None:
+        self.wav_path = wav_path
+        self.discarded = False
+
+    def finish(self):
+        return SimpleNamespace(frames=48000, duration=1.0)
+
+    def abort(self) -> None:
+        self.discarded = True
+
+    def discard(self) -> None:
+        self.discarded = True
+
+
+@pytest.fixture
+def port():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), server.RequestHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    session = _Session(tmp_path / "take.wav")
+    monkeypatch.setattr(capture, "pop", lambda session_id: session if session_id == "s1" else None)
+    return session
+
+
+def _stop(port: int, payload: dict) -> int:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("POST", "/api/record/stop", body=json.dumps(payload))
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_record_stop_applies_punch(port, session, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, "_apply_punch", lambda *args: calls.append(args))
+    assert _stop(port, {"session": "s1", "start": 1.5, "end": 2.0}) == 200
+    assert calls == [(server.PROJECTS.default, session.wav_path, 1.5, 2.0)]
+    assert session.discarded
+
+
+def test_record_stop_punch_error_discards_take(port, session, monkeypatch):
+    def fail(*args):
+        raise server.RouteError(500, "ffmpeg punch failed with exit code 1")
+
+    monkeypatch.setattr(server, "_apply_punch", fail)
+    assert _stop(port, {"session": "s1", "start": 1.5}) == 500
+    assert session.discarded
+
+
+def test_edit_format_shares_the_lock_with_readers(tmp_path):
+    audio = tmp_path / "voice.wav"
+    with wave.open(str(audio), "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(48000)
+        handle.writeframes(b"\0\0" * 4800)
+    project = projects.Project("p", tmp_path, audio, tmp_path, tmp_path / "sel.json", tmp_path / "bgm.json", tmp_path)
+    with project.lock.write():
+        project.edit_list()
+    result = []
+    with project.lock.read():
+        reader = threading.Thread(target=lambda: result.append(server._edit_format(project)), daemon=True)
+        reader.start()
+        reader.join(2)
+    assert result and (result[0].sample_rate, result[0].channels) == (48000, 1)